@@ -0,0 +1,93 @@
+"""
+Matching throughput of GitIgnoreMatcher against the previous per-pattern
+fnmatch loop.
+
+    python benchmarks/bench_ignore.py [--paths 120000]
+"""
+import argparse
+import fnmatch
+import os
+import random
+import tempfile
+import time
+
+from pr_assistant.ignore import DEFAULT_IGNORE_PATTERNS, GitIgnoreMatcher
+
+GITIGNORE = """
+*.log
+*.tmp
+*.swp
+*.o
+*.so
+*.egg-info/
+build/
+dist/
+/coverage
+.mypy_cache/
+.pytest_cache/
+node_modules/
+**/generated/**
+docs/_build/
+!docs/_build/keep.txt
+*.min.js
+/.idea
+.vscode/
+target/
+tmp/
+"""
+
+WORDS = ["src", "lib", "pkg", "core", "utils", "api", "models", "tests", "docs", "vendor", "node_modules", "build"]
+EXTENSIONS = [".py", ".js", ".ts", ".md", ".log", ".min.js", ".json", ".so", ".txt"]
+
+
+def legacy_is_ignored(rel_path, patterns):
+    """The fnmatch loop CodebaseReader used before the compiled matcher."""
+    for pattern in patterns:
+        if fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(os.path.basename(rel_path), pattern):
+            return True
+        if pattern.endswith("/") and rel_path.startswith(pattern.rstrip("/")):
+            return True
+    return False
+
+
+def make_paths(count, seed=0):
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        depth = rng.randint(1, 6)
+        parts = [rng.choice(WORDS) for _ in range(depth - 1)]
+        parts.append(f"file{rng.randint(0, 999)}{rng.choice(EXTENSIONS)}")
+        paths.append("/".join(parts))
+    return paths
+
+
+def bench(label, fn, paths):
+    start = time.perf_counter()
+    hits = sum(1 for p in paths if fn(p))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {len(paths) / elapsed:>12,.0f} paths/s  ({elapsed:.3f}s, {hits} ignored)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paths", type=int, default=120_000)
+    args = parser.parse_args()
+
+    paths = make_paths(args.paths)
+    with tempfile.TemporaryDirectory() as root:
+        with open(os.path.join(root, ".gitignore"), "w") as f:
+            f.write(GITIGNORE)
+        matcher = GitIgnoreMatcher(root)
+        patterns = DEFAULT_IGNORE_PATTERNS + [l for l in GITIGNORE.splitlines() if l and not l.startswith("#")]
+
+        print(f"{len(paths):,} paths, {len(matcher.root_rules.patterns)} patterns")
+        legacy = bench("fnmatch", lambda p: legacy_is_ignored(p, patterns), paths)
+        bench("compiled", matcher.match, paths)
+        # Second pass: every directory's .gitignore lookup is already memoized.
+        compiled = bench("warm", matcher.match, paths)
+        print(f"speedup    {legacy / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Throughput and correctness of RateLimiter under concurrent processes.
+Every process hammers the same usage database; the number of allowed
+requests must equal the limit exactly.
+
+    python benchmarks/bench_rate_limiter.py [--processes 16] [--attempts 200] [--limit 1000]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from pr_assistant.rate_limiter import RateLimiter
+
+
+def worker(storage_path, limit, attempts, start_event, results):
+    limiter = RateLimiter(max_requests_per_hour=limit, storage_path=storage_path)
+    start_event.wait()
+    results.put(sum(limiter.check_limit() for _ in range(attempts)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage_path = os.path.join(tmp, "usage.db")
+        RateLimiter(storage_path=storage_path)
+        start_event = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=worker, args=(storage_path, args.limit, args.attempts, start_event, results))
+            for _ in range(args.processes)
+        ]
+        for p in procs:
+            p.start()
+
+        start = time.perf_counter()
+        start_event.set()
+        allowed = sum(results.get() for _ in procs)
+        elapsed = time.perf_counter() - start
+        for p in procs:
+            p.join()
+
+    total = args.processes * args.attempts
+    expected = min(total, args.limit)
+    print(f"{args.processes} processes, {total:,} checks in {elapsed:.3f}s ({total / elapsed:,.0f} checks/s)")
+    print(f"allowed {allowed} of limit {args.limit} -> {'OK' if allowed == expected else 'WRONG'}")
+    if allowed != expected:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Repository map: serial vs process-pool build, cached update and render latency.
+
+    python benchmarks/bench_repo_map.py [--files 3000] [--workers 0]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from pr_assistant.codebase import CodebaseReader
+from pr_assistant.repo_map import RepoMap
+
+WORDS = "database query cache session user token render widget parse stream request retry config schema".split()
+
+
+def make_repo(root: Path, files: int):
+    rng = random.Random(0)
+    for i in range(files):
+        package = root / f"pkg{i % 40}"
+        package.mkdir(exist_ok=True)
+        lines = [f"from pkg{rng.randrange(40)} import module_{rng.randrange(files)}\n"]
+        for j in range(20):
+            a, b = rng.choice(WORDS), rng.choice(WORDS)
+            lines.append(f"class {a.title()}{b.title()}{j}(Base):")
+            for k in range(5):
+                lines.append(f"    def {b}_{k}(self, {a}: int, limit: int = 10) -> list:\n        return [{a}] * limit")
+        (package / f"module_{i}.py").write_text("\n".join(lines))
+
+
+def build(root: Path, parallel_threshold: int, workers: int) -> float:
+    cache = root / ".pr_assistant" / "repo_map.json"
+    if cache.exists():
+        cache.unlink()
+    start = time.perf_counter()
+    RepoMap(CodebaseReader(str(root)), max_workers=workers or None, parallel_threshold=parallel_threshold).update()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=0, help="process pool size (default: all cores)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_repo(root, args.files)
+        CodebaseReader(str(root)).get_file_structure()
+
+        serial = build(root, args.files + 1, args.workers)
+        print(f"build (serial):   {serial:.2f}s for {args.files} files")
+        pooled = build(root, 1, args.workers)
+        print(f"build (pool x{args.workers or os.cpu_count()}): {pooled:.2f}s ({serial / pooled:.1f}x)")
+
+        start = time.perf_counter()
+        repo_map = RepoMap(CodebaseReader(str(root)))
+        parsed = repo_map.update()
+        print(f"update: {(time.perf_counter() - start) * 1000:.0f}ms with nothing changed ({parsed} files parsed)")
+
+        start = time.perf_counter()
+        rendered = repo_map.render("speed up the database query cache", max_tokens=25_000)
+        print(f"render: {(time.perf_counter() - start) * 1000:.0f}ms, {len(rendered.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
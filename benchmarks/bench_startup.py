@@ -0,0 +1,51 @@
+"""
+CLI startup time: wall clock of `pr-assistant --help` and the slowest imports.
+
+    python benchmarks/bench_startup.py [--runs 10]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+CLI = "from pr_assistant.main import app; app()"
+
+
+def wall_ms(args, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], capture_output=True, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def slowest_imports(count):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CLI, "--help"], capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "cumulative" not in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    interpreter = wall_ms(["-c", "pass"], args.runs)
+    help_ms = wall_ms(["-c", CLI, "--help"], args.runs)
+    print(f"interpreter     {interpreter:7.1f} ms")
+    print(f"--help          {help_ms:7.1f} ms  ({help_ms - interpreter:.1f} ms over a bare interpreter)")
+    print("\nslowest imports (cumulative):")
+    for cumulative, name in slowest_imports(15):
+        print(f"  {cumulative / 1000:7.1f} ms {name}")
+
+
+if __name__ == "__main__":
+    main()
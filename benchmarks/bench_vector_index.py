@@ -0,0 +1,69 @@
+"""
+Semantic code index: full build, no-op and one-file updates, and top-k search latency.
+
+    python benchmarks/bench_vector_index.py [--files 2000] [--queries 50]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from pr_assistant.codebase import CodebaseReader
+from pr_assistant.vector_index import VectorIndex
+
+WORDS = (
+    "database query cache session user token render widget layout parse token stream "
+    "request response retry backoff config loader schema migration index vector search"
+).split()
+
+
+def make_repo(root: Path, files: int):
+    rng = random.Random(0)
+    for i in range(files):
+        package = root / f"pkg{i % 40}"
+        package.mkdir(exist_ok=True)
+        lines = []
+        for j in range(120):
+            a, b = rng.choice(WORDS), rng.choice(WORDS)
+            lines.append(f"def {a}_{b}_{j}(self):\n    return self.{b}.{a}()")
+        (package / f"module_{i}.py").write_text("\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_repo(root, args.files)
+
+        start = time.perf_counter()
+        index = VectorIndex(str(root))
+        index.update(CodebaseReader(str(root)))
+        print(f"build:  {time.perf_counter() - start:.2f}s for {args.files} files, {len(index)} chunks")
+
+        start = time.perf_counter()
+        index = VectorIndex(str(root))
+        embedded = index.update(CodebaseReader(str(root)))
+        print(f"update: {(time.perf_counter() - start) * 1000:.0f}ms with nothing changed ({embedded} files embedded)")
+
+        changed = root / "pkg0" / "module_0.py"
+        changed.write_text(changed.read_text() + "\n# edited\n")
+        start = time.perf_counter()
+        embedded = index.update(CodebaseReader(str(root)))
+        print(f"update: {(time.perf_counter() - start) * 1000:.0f}ms with one file changed ({embedded} files embedded)")
+
+        times = []
+        for i in range(args.queries):
+            query = f"{WORDS[i % len(WORDS)]} {WORDS[(i * 7) % len(WORDS)]} layer"
+            start = time.perf_counter()
+            index.search(query, k=8)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"search: {statistics.median(times):.2f}ms median over {args.queries} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,216 @@
 import json
 import os
-from typing import List, Dict, Any, Optional
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Iterator, TypeVar
+from pr_assistant.cache import ResponseCache, cache_key, DEFAULT_TTL_SECONDS, DEFAULT_MAX_BYTES
 from pr_assistant.config import ConfigManager
 from pr_assistant.codebase import CodebaseReader
-from pr_assistant.prompts import SYSTEM_PROMPT
-from pr_assistant.rate_limiter import RateLimiter
+from pr_assistant.context import ContextPacker, DEFAULT_TOKEN_BUDGET, estimate_tokens
+from pr_assistant.diff_chunks import chunk_diff, DEFAULT_CHUNK_TOKENS
+from pr_assistant.lazy import LazyImport
+from pr_assistant.json_stream import IncrementalArrayParser, iter_array_elements
+from pr_assistant.logger import get_logger
+from pr_assistant.prompts import PR_ANALYSIS_PROMPT, SYSTEM_PROMPT
+from pr_assistant.rate_limiter import (
+    RateLimiter,
+    retry_after_seconds,
+    shared_bucket,
+    DEFAULT_GEMINI_REQUESTS_PER_MINUTE,
+    DEFAULT_GEMINI_TOKENS_PER_MINUTE,
+)
+from pr_assistant.repo_map import RepoMap
+from pr_assistant.retry import retry_call
+from pr_assistant.vector_index import open_code_index, DEFAULT_TOP_K
+
+logger = get_logger(__name__)
+
+# The Gemini SDK takes most of a second to import, so load it only when an Agent is created.
+genai = LazyImport("google.generativeai")
+
+T = TypeVar("T")
 
 class Agent:
-    def __init__(self, config_manager: Optional[ConfigManager] = None):
+    MODEL_NAME = 'gemini-flash-latest'
+
+    def __init__(self, config_manager: Optional[ConfigManager] = None, use_cache: bool = True):
         self.config = config_manager or ConfigManager()
         self.api_key = self.config.get("gemini_api_key") or os.environ.get("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("Gemini API key not found. Set GEMINI_API_KEY env var or run init.")
         
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-flash-latest')
+        self.model = genai.GenerativeModel(self.MODEL_NAME)
         self.codebase = CodebaseReader()
+        code_index = open_code_index(self.codebase.root_dir) if self.config.get("code_index", True) else None
+        self.context_packer = ContextPacker(
+            self.codebase,
+            int(self.config.get("context_token_budget", DEFAULT_TOKEN_BUDGET)),
+            index=code_index,
+            top_k=int(self.config.get("code_index_top_k", DEFAULT_TOP_K)),
+            repo_map=RepoMap(self.codebase) if self.config.get("repo_map", True) else None,
+        )
+        self.review_chunk_tokens = int(self.config.get("review_chunk_tokens", DEFAULT_CHUNK_TOKENS))
         self.rate_limiter = RateLimiter()
+        rpm = float(self.config.get("gemini_requests_per_minute", DEFAULT_GEMINI_REQUESTS_PER_MINUTE))
+        tpm = float(self.config.get("gemini_tokens_per_minute", DEFAULT_GEMINI_TOKENS_PER_MINUTE))
+        self.request_bucket = shared_bucket("gemini_requests", rpm / 60, rpm)
+        self.token_bucket = shared_bucket("gemini_tokens", tpm / 60, tpm)
+        self.cache: Optional[ResponseCache] = None
+        if use_cache:
+            self.cache = ResponseCache(
+                ttl_seconds=float(self.config.get("cache_ttl_seconds", DEFAULT_TTL_SECONDS)),
+                max_bytes=int(self.config.get("cache_max_bytes", DEFAULT_MAX_BYTES)),
+            )
+        # Proposals are asked for again each run, so repeated runs do not return the same PRs.
+        self.cache_proposals = bool(self.config.get("cache_proposals", False))
 
-    def propose_prs(self, instruction: str, count: int = 1) -> List[Dict[str, Any]]:
+    def _call_model(self, prompt: str, call: Callable[[], T]) -> T:
         """
-        Analyzes codebase and proposes PRs based on instruction.
+        Runs a model call once the hourly limit and the Gemini request and
+        token buckets allow it, blocking for exactly as long as needed.
+        Rate-limit errors are retried after the delay Gemini asks for.
         """
-        if not self.rate_limiter.check_limit():
-            raise RuntimeError("Rate limit exceeded. Please try again later.")
+        self.rate_limiter.acquire()
+        tokens = estimate_tokens(prompt)
+
+        def attempt() -> T:
+            self.request_bucket.acquire()
+            self.token_bucket.acquire(tokens)
+            return call()
+
+        def on_retry(attempt_number: int, error: BaseException, delay: float):
+            # Pausing the bucket holds back every caller in the process, and
+            # the next attempt's acquire() does the actual waiting.
+            self.request_bucket.pause(delay)
+            logger.warning(f"Gemini request failed ({error}); retrying in {delay:.1f}s")
+
+        return retry_call(attempt, on_retry=on_retry, retry_after=retry_after_seconds, sleep=lambda delay: None)
+
+    def _record_usage(self, prompt: str, response: Any):
+        """Corrects the token bucket with the usage Gemini reports for a response."""
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None)
+        if isinstance(total, int):
+            self.token_bucket.adjust(total - estimate_tokens(prompt))
+
+    def _generate(
+        self, prompt: str, persona: str = "", cacheable: Callable[[str], bool] = bool, use_cache: bool = True,
+    ) -> str:
+        """
+        Returns the model's response text, serving repeated requests from the cache
+        unless use_cache is False. Cache hits never touch the rate limiter.
+        """
+        key = cache_key(self.MODEL_NAME, prompt, persona)
+        cache = self.cache if use_cache else None
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self._call_model(prompt, lambda: self.model.generate_content(prompt))
+        self._record_usage(prompt, response)
+        text = response.text
+        if cache and cacheable(text):
+            cache.set(key, text)
+        return text
+
+    def _generate_stream(
+        self, prompt: str, persona: str = "", cacheable: Callable[[str], bool] = bool, use_cache: bool = True,
+    ) -> Iterator[str]:
+        """Like _generate, but yields the response text chunk by chunk as it is generated."""
+        key = cache_key(self.MODEL_NAME, prompt, persona)
+        cache = self.cache if use_cache else None
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        parts = []
+        chunk = None
+        for chunk in self._call_model(prompt, lambda: self.model.generate_content(prompt, stream=True)):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts, e.g. a bare finish reason.
+                continue
+            parts.append(text)
+            yield text
+
+        # Usage metadata arrives with the final chunk.
+        self._record_usage(prompt, chunk)
+        text = "".join(parts)
+        if cache and cacheable(text):
+            cache.set(key, text)
 
-        context = self.codebase.get_file_structure()
+    @staticmethod
+    def _parse_array(text: str, key: str) -> Optional[List[Any]]:
+        content = text.replace("```json", "").replace("```", "").strip()
+        try:
+            return json.loads(content).get(key, [])
+        except (json.JSONDecodeError, AttributeError):
+            return None
+
+    @classmethod
+    def _parse_prs(cls, text: str) -> Optional[List[Dict[str, Any]]]:
+        return cls._parse_array(text, "prs")
+
+    def _propose_prompt(self, instruction: str, count: int) -> str:
+        context = self.context_packer.pack(instruction)
         
-        prompt = f"""
+        return f"""
         {SYSTEM_PROMPT}
         
         Instruction: {instruction}
         Create {count} distinct PRs.
         
-        Codebase Structure:
         {context}
         """
 
-        response = self.model.generate_content(prompt)
-        
-        content = response.text
-        content = content.replace("```json", "").replace("```", "").strip()
-        
-        try:
-            data = json.loads(content)
-            return data.get("prs", [])
-        except json.JSONDecodeError:
-            return []
+    def propose_prs(self, instruction: str, count: int = 1) -> List[Dict[str, Any]]:
+        """
+        Analyzes codebase and proposes PRs based on instruction.
+        """
+        prompt = self._propose_prompt(instruction, count)
+        text = self._generate(
+            prompt, cacheable=lambda t: self._parse_prs(t) is not None, use_cache=self.cache_proposals,
+        )
+        prs = self._parse_prs(text)
+        if prs is None:
+            # Keep whichever PRs were complete before the response broke off.
+            prs = IncrementalArrayParser("prs").feed(text)
+            logger.warning(f"Model returned malformed JSON; recovered {len(prs)} PRs")
+        return prs
+
+    def stream_prs(self, instruction: str, count: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        Like propose_prs, but streams the response and yields each PR as soon as
+        its JSON object is complete.
+        """
+        prompt = self._propose_prompt(instruction, count)
+        chunks = self._generate_stream(
+            prompt, cacheable=lambda t: self._parse_prs(t) is not None, use_cache=self.cache_proposals,
+        )
+        yield from iter_array_elements(chunks, "prs")
+
+    def triage_prs(self, sections: List[str]) -> List[Dict[str, Any]]:
+        """
+        Scores several PRs in one request. Each section describes one PR under a
+        "PR #<number>" heading. Returns one {number, summary, focus_score, reason}
+        dict per PR the model scored.
+        """
+        prompt = PR_ANALYSIS_PROMPT.format(count=len(sections), prs="\n\n".join(sections))
+        text = self._generate(prompt, cacheable=lambda t: self._parse_array(t, "results") is not None)
+        results = self._parse_array(text, "results")
+        if results is None:
+            results = IncrementalArrayParser("results").feed(text)
+            logger.warning(f"Model returned malformed JSON; recovered {len(results)} PR scores")
+        return results
 
     def review_pr(self, pr_details: dict, diff: str, persona: str = "Senior Software Engineer") -> str:
         """
         Reviews a PR based on the diff and persona.
         """
-        if not self.rate_limiter.check_limit():
-            raise RuntimeError("Rate limit exceeded. Please try again later.")
-
         prompt = f"""
         You are an expert code reviewer acting as a {persona}.
         
@@ -83,5 +238,75 @@ class Agent:
         {diff}
         """
         
-        response = self.model.generate_content(prompt)
-        return response.text
+        return self._generate(prompt, persona)
+
+    def review_pr_files(
+        self,
+        pr_details: dict,
+        files: List[Dict[str, Any]],
+        persona: str = "Senior Software Engineer",
+        concurrency: int = 4,
+    ) -> str:
+        """
+        Reviews a PR from its changed files (as returned by get_pr_files).
+        A diff that fits in one chunk gets a single review_pr call. Larger diffs
+        are split per file or hunk into chunks of review_chunk_tokens, the chunks
+        are reviewed concurrently, and a final pass merges their findings.
+        """
+        chunks = chunk_diff(files, self.review_chunk_tokens)
+        if len(chunks) <= 1:
+            return self.review_pr(pr_details, chunks[0] if chunks else "", persona)
+
+        def review_chunk(item):
+            index, chunk = item
+            return self._generate(self._chunk_review_prompt(pr_details, chunk, index + 1, len(chunks), persona), persona)
+
+        logger.info(f"Reviewing {len(chunks)} diff chunks with concurrency {concurrency}")
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            findings = list(pool.map(review_chunk, enumerate(chunks)))
+        return self._generate(self._merge_reviews_prompt(pr_details, findings, persona), persona)
+
+    def _chunk_review_prompt(self, pr_details: dict, chunk: str, part: int, parts: int, persona: str) -> str:
+        return f"""
+        You are an expert code reviewer acting as a {persona}.
+        
+        PR Title: {pr_details['title']}
+        PR Description: {pr_details['body']}
+        
+        This PR is too large to review at once. Below is part {part} of {parts} of its diff.
+        Review only this part for:
+        1. Bugs and potential runtime errors.
+        2. Code style and best practices (Pythonic code, etc.).
+        3. Performance improvements.
+        4. Security vulnerabilities.
+        5. Test coverage (if applicable).
+        
+        List concrete findings as bullet points, each naming the file it refers to.
+        Do not write an introduction or overall summary; the findings of all parts are merged later.
+        If this part has no issues, reply with "No issues found."
+        
+        Code Changes (Diff, part {part} of {parts}):
+        {chunk}
+        """
+
+    def _merge_reviews_prompt(self, pr_details: dict, findings: List[str], persona: str) -> str:
+        sections = "\n\n".join(f"### Part {i} of {len(findings)}\n{text}" for i, text in enumerate(findings, 1))
+        return f"""
+        You are an expert code reviewer acting as a {persona}.
+        
+        PR Title: {pr_details['title']}
+        PR Description: {pr_details['body']}
+        
+        The diff of this PR was reviewed in {len(findings)} parts. Merge the findings below into one review.
+        
+        IMPORTANT: Keep your review CONCISE.
+        - Use bullet points.
+        - Remove duplicates and findings that another part shows to be wrong.
+        - Order findings by impact, most critical first.
+        - Do not compliment the code excessively; just state the facts.
+        
+        Provide a summary of your findings and specific actionable feedback.
+        
+        Findings:
+        {sections}
+        """
@@ -0,0 +1,282 @@
+import asyncio
+import base64
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from pr_assistant.config import ConfigManager
+from pr_assistant.github_client import FILE_SEPARATOR, format_file_patch
+from pr_assistant.rate_limiter import (
+    TokenBucket,
+    observe_rate_limit_headers,
+    retry_after_seconds,
+    shared_bucket,
+    DEFAULT_GITHUB_REQUESTS_PER_HOUR,
+)
+from pr_assistant.repo_cache import DEFAULT_BASE_SHA_TTL_SECONDS, RepoMetadataCache
+from pr_assistant.retry import backoff_delay
+
+GITHUB_API_URL = "https://api.github.com"
+
+
+class GitHubAPIError(Exception):
+    def __init__(self, status_code: int, message: str, headers: Optional[dict] = None):
+        super().__init__(f"GitHub API error {status_code}: {message}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class ETagCache:
+    """
+    Thread-safe store of (etag, body) per URL for conditional GETs.
+    GitHub answers a matching If-None-Match with 304, which does not count
+    against the rate limit.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key: str, etag: str, body: Any):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (etag, body)
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+
+
+# Shared by every client in the process unless one is passed explicitly.
+shared_etag_cache = ETagCache()
+
+
+class AsyncGitHubClient:
+    """
+    Coroutine counterpart of GitHubClient.
+    All requests go through one pooled httpx.AsyncClient, GETs are
+    revalidated with ETags, and concurrent lookups of the same PR share a
+    single in-flight request. Requests draw from a token bucket kept in step
+    with GitHub's X-RateLimit headers, and rate-limited responses are retried
+    after the delay GitHub asks for.
+    """
+    def __init__(
+        self,
+        config_manager: Optional[ConfigManager] = None,
+        base_url: str = GITHUB_API_URL,
+        etag_cache: Optional[ETagCache] = None,
+        max_connections: int = 20,
+        rate_bucket: Optional[TokenBucket] = None,
+        max_rate_limit_retries: int = 3,
+        metadata: Optional[RepoMetadataCache] = None,
+    ):
+        self.config = config_manager or ConfigManager()
+        self.token = self.config.get("bot_github_token") or self.config.get("github_token")
+        if not self.token:
+            raise ValueError("GitHub token not found. Run 'pr-assistant init' first.")
+        self.repo_name = self.config.get("repo_name")
+        if not self.repo_name:
+            raise ValueError("Repository name not configured. Run 'pr-assistant init' first.")
+
+        self.etag_cache = etag_cache or shared_etag_cache
+        if rate_bucket is None:
+            per_hour = float(self.config.get("github_requests_per_hour", DEFAULT_GITHUB_REQUESTS_PER_HOUR))
+            rate_bucket = shared_bucket("github", per_hour / 3600, per_hour)
+        self.rate_bucket = rate_bucket
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+            },
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=30.0,
+        )
+        self._repo_path = f"/repos/{self.repo_name}"
+        self._pulls: Dict[int, "asyncio.Future"] = {}
+        self.metadata = metadata or RepoMetadataCache(
+            sha_ttl_seconds=self.config.get("base_sha_ttl_seconds", DEFAULT_BASE_SHA_TTL_SECONDS)
+        )
+        self._default_branch: Optional[str] = None
+
+    async def __aenter__(self) -> "AsyncGitHubClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _request(self, method: str, path: str, allow_404: bool = False, **kwargs) -> httpx.Response:
+        """
+        Sends a request, pacing it with the rate bucket and retrying rate limits.
+        Error responses raise GitHubAPIError; allow_404 returns a 404 to callers
+        that probe for a resource.
+        """
+        attempt = 0
+        while True:
+            wait = self.rate_bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            response = await self._client.request(method, path, **kwargs)
+            observe_rate_limit_headers(self.rate_bucket, response.headers)
+            if response.status_code < 400 or (allow_404 and response.status_code == 404):
+                return response
+
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            error = GitHubAPIError(response.status_code, message, dict(response.headers))
+            delay = retry_after_seconds(error)
+            rate_limited = response.status_code == 429 or (response.status_code == 403 and delay is not None)
+            if not rate_limited or attempt >= self.max_rate_limit_retries:
+                raise error
+            if delay is None:
+                delay = backoff_delay(attempt)
+            attempt += 1
+            self.rate_bucket.pause(delay)
+
+    async def _get_json(self, path: str, params: Optional[dict] = None) -> Any:
+        """GETs a JSON resource, revalidating any cached copy with If-None-Match."""
+        key = str(self._client.build_request("GET", path, params=params).url)
+        cached = self.etag_cache.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+
+        response = await self._request("GET", path, allow_404=True, params=params, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        if response.status_code == 404:
+            raise GitHubAPIError(404, "Not Found", dict(response.headers))
+
+        body = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            self.etag_cache.set(key, etag, body)
+        return body
+
+    async def _get_paginated(self, path: str, params: Optional[dict] = None) -> List[Any]:
+        params = dict(params or {}, per_page=100)
+        items, page = [], 1
+        while True:
+            batch = await self._get_json(path, dict(params, page=page))
+            items.extend(batch)
+            if len(batch) < params["per_page"]:
+                return items
+            page += 1
+
+    async def get_pull(self, pr_number: int) -> dict:
+        """Returns the raw PR payload; concurrent callers share one in-flight request."""
+        future = self._pulls.get(pr_number)
+        if future is None:
+            future = asyncio.ensure_future(self._get_json(f"{self._repo_path}/pulls/{pr_number}"))
+            self._pulls[pr_number] = future
+            future.add_done_callback(lambda _: self._pulls.pop(pr_number, None))
+        return await asyncio.shield(future)
+
+    async def get_default_branch(self) -> str:
+        """The repository's default branch, detected once and cached."""
+        if self._default_branch is None:
+            cached = self.metadata.get_repo(self.repo_name)
+            if cached:
+                self._default_branch = cached["default_branch"]
+            else:
+                repo = await self._get_json(self._repo_path)
+                self._default_branch = repo["default_branch"]
+                self.metadata.set_repo(self.repo_name, repo.get("id"), self._default_branch)
+        return self._default_branch
+
+    async def get_base_sha(self, branch: Optional[str] = None) -> str:
+        """Head SHA of branch (default: the default branch), reused for base_sha_ttl_seconds."""
+        branch = branch or await self.get_default_branch()
+        sha = self.metadata.get_sha(self.repo_name, branch)
+        if sha is None:
+            ref = await self._get_json(f"{self._repo_path}/git/ref/heads/{branch}")
+            sha = ref["object"]["sha"]
+            self.metadata.set_sha(self.repo_name, branch, sha)
+        return sha
+
+    async def create_pr(self, title: str, body: str, head: str, base: Optional[str] = None) -> str:
+        """Creates a PR against base (default: the default branch) and returns the HTML URL."""
+        response = await self._request(
+            "POST", f"{self._repo_path}/pulls",
+            json={"title": title, "body": body, "head": head, "base": base or await self.get_default_branch()},
+        )
+        return response.json()["html_url"]
+
+    async def list_prs(self, state: str = "open") -> List[dict]:
+        """Lists PRs and returns a simplified list of dicts."""
+        prs = await self._get_paginated(f"{self._repo_path}/pulls", {"state": state})
+        return [
+            {
+                "number": pr["number"],
+                "title": pr["title"],
+                "url": pr["html_url"],
+                "user": pr["user"]["login"],
+                "labels": [label["name"] for label in pr.get("labels", [])],
+                "created_at": pr["created_at"],
+            }
+            for pr in prs
+        ]
+
+    async def create_branch(self, branch_name: str, source_branch: Optional[str] = None):
+        """Creates a new branch from the source branch (default: the default branch)."""
+        await self._request(
+            "POST", f"{self._repo_path}/git/refs",
+            json={"ref": f"refs/heads/{branch_name}", "sha": await self.get_base_sha(source_branch)},
+        )
+
+    async def create_file(self, path: str, message: str, content: str, branch: str):
+        """Creates or updates a file in the repository."""
+        payload = {
+            "message": message,
+            "content": base64.b64encode(content.encode("utf-8")).decode("ascii"),
+            "branch": branch,
+        }
+        existing = await self._request(
+            "GET", f"{self._repo_path}/contents/{path}", allow_404=True, params={"ref": branch}
+        )
+        if existing.status_code == 200:
+            payload["sha"] = existing.json()["sha"]
+        await self._request("PUT", f"{self._repo_path}/contents/{path}", json=payload)
+
+    async def get_pr_details(self, pr_number: int) -> dict:
+        """Fetches PR title and body."""
+        pr = await self.get_pull(pr_number)
+        return {
+            "title": pr["title"],
+            "body": pr["body"],
+            "url": pr["html_url"],
+            "user": pr["user"]["login"],
+        }
+
+    async def get_pr_files(self, pr_number: int) -> List[dict]:
+        """Lists the PR's changed files. patch is None for binary or very large files."""
+        files = await self._get_paginated(f"{self._repo_path}/pulls/{pr_number}/files")
+        return [
+            {
+                "filename": f["filename"],
+                "status": f["status"],
+                "additions": f["additions"],
+                "deletions": f["deletions"],
+                "patch": f.get("patch"),
+            }
+            for f in files
+        ]
+
+    async def get_pr_diff(self, pr_number: int) -> str:
+        """Fetches the diff of the PR."""
+        return FILE_SEPARATOR.join(format_file_patch(**f) for f in await self.get_pr_files(pr_number))
+
+    async def get_pr(self, pr_number: int) -> Tuple[dict, str]:
+        """Fetches details and diff concurrently."""
+        details, diff = await asyncio.gather(self.get_pr_details(pr_number), self.get_pr_diff(pr_number))
+        return details, diff
+
+    async def post_comment(self, pr_number: int, body: str):
+        """Posts a comment on the PR."""
+        await self._request("POST", f"{self._repo_path}/issues/{pr_number}/comments", json={"body": body})
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def cache_key(model: str, prompt: str, persona: str = "") -> str:
+    """Hashes everything that determines a model response into a cache key."""
+    payload = json.dumps([model, persona, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of model responses.
+    Each entry is a JSON file named by the request hash. Reads touch the file's
+    mtime, and both expiry and eviction go by it: an entry expires ttl_seconds
+    after it was last used, and eviction by oldest mtime is least-recently-used.
+    """
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else Path.home() / ".pr_assistant" / "cache"
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response, or None if missing or expired."""
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_seconds:
+                self.delete(key)
+                return None
+            with open(path, "r") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return entry.get("response")
+
+    def set(self, key: str, response: str):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"created_at": time.time(), "response": response}, f)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def delete(self, key: str):
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def clear(self):
+        for path in self.cache_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    def _evict(self):
+        """Removes expired entries, then least-recently-used ones until under max_bytes."""
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        cutoff = time.time() - self.ttl_seconds
+        total = 0
+        live = []
+        for mtime, size, path in entries:
+            if mtime < cutoff:
+                path.unlink(missing_ok=True)
+            else:
+                live.append((mtime, size, path))
+                total += size
+
+        live.sort()
+        for _, size, path in live:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -1,65 +1,193 @@
 import os
-import fnmatch
-from typing import List, Dict
+import hashlib
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Iterator, Optional, Set, Tuple
+from pr_assistant.ignore import GitIgnoreMatcher
+from pr_assistant.snapshot import FileSnapshot, content_hash
+
+# Files larger than this are skipped by default when reading contents.
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+# A NUL byte in this many leading bytes marks a file as binary, as git does.
+BINARY_SNIFF_BYTES = 8000
 
 class CodebaseReader:
-    def __init__(self, root_dir: str = "."):
+    def __init__(self, root_dir: str = ".", use_snapshot: bool = True):
         self.root_dir = os.path.abspath(root_dir)
-        self.ignore_patterns = self._load_gitignore()
-
-    def _load_gitignore(self) -> List[str]:
-        ignore_path = os.path.join(self.root_dir, ".gitignore")
-        patterns = [".git", "__pycache__", "*.pyc", ".DS_Store", "venv", ".env"]
-        if os.path.exists(ignore_path):
-            with open(ignore_path, "r") as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith("#"):
-                        patterns.append(line)
-        return patterns
+        self.ignore_matcher = GitIgnoreMatcher(self.root_dir)
+        self.ignore_patterns = self.ignore_matcher.root_rules.patterns
+        self.snapshot: Optional[FileSnapshot] = FileSnapshot(self.root_dir) if use_snapshot else None
 
     def _is_ignored(self, path: str) -> bool:
-        rel_path = os.path.relpath(path, self.root_dir)
-        for pattern in self.ignore_patterns:
-            if fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(os.path.basename(path), pattern):
-                return True
-            if pattern.endswith("/") and rel_path.startswith(pattern.rstrip("/")):
-                return True
-        return False
+        rel_path = os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+        if rel_path == ".":
+            return False
+        return self.ignore_matcher.is_ignored(rel_path, os.path.isdir(path))
+
+    def _list_dir(self, full_dir: str, rel_dir: str = "") -> Tuple[List[str], List[str]]:
+        dirs, files = [], []
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        with os.scandir(full_dir) as entries:
+            for entry in entries:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if self.ignore_matcher.match(prefix + entry.name, is_dir):
+                    continue
+                if is_dir:
+                    dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+        return sorted(dirs), sorted(files)
+
+    def _ignore_key(self, rel_dir: str, parent_key: str) -> str:
+        rules = self.ignore_matcher.rules_for(rel_dir)
+        if rules is None:
+            return parent_key
+        return hashlib.sha1(f"{parent_key}:{rules.fingerprint}".encode()).hexdigest()
+
+    def walk(self) -> Iterator[Tuple[str, List[str], List[str]]]:
+        """
+        Yields (relative_dir, dirs, files) top-down for every non-ignored directory.
+        Only directories whose mtime changed since the last snapshot are re-listed.
+        """
+        seen = set()
+        # The ignore key chains the fingerprints of every .gitignore from the
+        # root down, so editing one invalidates the listings beneath it.
+        stack = [("", "")]
+        while stack:
+            rel_dir, parent_key = stack.pop()
+            full_dir = os.path.join(self.root_dir, rel_dir) if rel_dir else self.root_dir
+            try:
+                mtime_ns = os.stat(full_dir).st_mtime_ns
+            except OSError:
+                continue
+
+            ignore_key = self._ignore_key(rel_dir, parent_key)
+            listing = self.snapshot.get_listing(rel_dir, mtime_ns, ignore_key) if self.snapshot else None
+            if listing is None:
+                try:
+                    listing = self._list_dir(full_dir, rel_dir)
+                except OSError:
+                    continue
+                if self.snapshot:
+                    self.snapshot.set_listing(rel_dir, mtime_ns, ignore_key, *listing)
+
+            dirs, files = listing
+            seen.add(rel_dir)
+            yield rel_dir, dirs, files
+            stack.extend(
+                (f"{rel_dir}/{d}" if rel_dir else d, ignore_key) for d in reversed(dirs)
+            )
+
+        if self.snapshot:
+            self.snapshot.prune(seen)
+            self.snapshot.save()
 
     def get_file_structure(self) -> str:
         """Returns a string representation of the file tree."""
         structure = []
-        for root, dirs, files in os.walk(self.root_dir):
-            dirs[:] = [d for d in dirs if not self._is_ignored(os.path.join(root, d))]
-            
-            level = root.replace(self.root_dir, '').count(os.sep)
+        for rel_dir, _, files in self.walk():
+            level = rel_dir.count("/") + 1 if rel_dir else 0
             indent = ' ' * 4 * (level)
-            structure.append(f"{indent}{os.path.basename(root)}/")
+            structure.append(f"{indent}{os.path.basename(rel_dir or self.root_dir)}/")
             subindent = ' ' * 4 * (level + 1)
             for f in files:
-                if not self._is_ignored(os.path.join(root, f)):
-                    structure.append(f"{subindent}{f}")
+                structure.append(f"{subindent}{f}")
         return "\n".join(structure)
 
-    def read_files(self, extensions: List[str] = None) -> Dict[str, str]:
-        """Reads all non-ignored files, optionally filtering by extension."""
-        files_content = {}
-        for root, dirs, files in os.walk(self.root_dir):
-            dirs[:] = [d for d in dirs if not self._is_ignored(os.path.join(root, d))]
-            
+    def file_hash(self, relative_path: str) -> Optional[str]:
+        """Returns the content hash of a file, reusing the snapshot when it is unchanged."""
+        full_path = os.path.join(self.root_dir, relative_path)
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return None
+        if self.snapshot:
+            digest = self.snapshot.get_hash(relative_path, st.st_size, st.st_mtime_ns)
+            if digest:
+                return digest
+        try:
+            with open(full_path, "rb") as file_obj:
+                digest = content_hash(file_obj.read())
+        except OSError:
+            return None
+        if self.snapshot:
+            self.snapshot.set_hash(relative_path, st.st_size, st.st_mtime_ns, digest)
+        return digest
+
+    def iter_paths(self, extensions: Optional[List[str]] = None) -> Iterator[str]:
+        """Yields the relative path of every non-ignored file, without reading it."""
+        for rel_dir, _, files in self.walk():
             for f in files:
-                if self._is_ignored(os.path.join(root, f)):
-                    continue
-                
                 if extensions and not any(f.endswith(ext) for ext in extensions):
                     continue
+                yield f"{rel_dir}/{f}" if rel_dir else f
 
-                full_path = os.path.join(root, f)
-                try:
-                    with open(full_path, "r", encoding="utf-8") as file_obj:
-                        relative_path = os.path.relpath(full_path, self.root_dir).replace("\\", "/")
-                        files_content[relative_path] = file_obj.read()
-                except UnicodeDecodeError:
-                    pass
-        return files_content
+    def _read_text(self, relative_path: str, max_file_size: Optional[int]):
+        """Reads one file, returning None for binary, oversized, undecodable or vanished files."""
+        full_path = os.path.join(self.root_dir, relative_path)
+        try:
+            with open(full_path, "rb") as file_obj:
+                st = os.fstat(file_obj.fileno())
+                if max_file_size is not None and st.st_size > max_file_size:
+                    return None
+                head = file_obj.read(BINARY_SNIFF_BYTES)
+                if b"\0" in head:
+                    return None
+                data = head + file_obj.read()
+            content = data.decode("utf-8")
+        except (OSError, UnicodeDecodeError):
+            return None
+        return relative_path, content, st.st_size, st.st_mtime_ns, content_hash(data)
+
+    def read_file(self, relative_path: str, max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE) -> Optional[str]:
+        """Reads a single text file, or returns None if it is binary, too large or unreadable."""
+        result = self._read_text(relative_path, max_file_size)
+        return result[1] if result else None
+
+    def iter_files(
+        self,
+        extensions: Optional[List[str]] = None,
+        max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+        max_workers: Optional[int] = None,
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Yields (relative_path, content) for non-ignored text files as they finish reading.
+        Files are read on a thread pool with a bounded number in flight, so memory stays
+        proportional to the pool size rather than the repository. Order is not guaranteed.
+        """
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        max_in_flight = max_workers * 4
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending: Set[Future] = set()
+        paths = self.iter_paths(extensions)
+        try:
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_in_flight:
+                    relative_path = next(paths, None)
+                    if relative_path is None:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(self._read_text, relative_path, max_file_size))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result is None:
+                        continue
+                    relative_path, content, size, mtime_ns, digest = result
+                    if self.snapshot:
+                        self.snapshot.set_hash(relative_path, size, mtime_ns, digest)
+                    yield relative_path, content
+            if self.snapshot:
+                self.snapshot.save()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def read_files(
+        self,
+        extensions: Optional[List[str]] = None,
+        max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+    ) -> Dict[str, str]:
+        """Reads all non-ignored files, optionally filtering by extension."""
+        return dict(self.iter_files(extensions, max_file_size=max_file_size))
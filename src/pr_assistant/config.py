@@ -1,7 +1,63 @@
 import json
 import os
+import tempfile
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+
+# Parsed config files shared by every ConfigManager in the process, keyed by
+# path and validated against the file's stat, so each file is parsed once
+# until it changes.
+_file_cache: Dict[Path, Tuple[Optional[tuple], Dict[str, Any]]] = {}
+_file_cache_lock = threading.Lock()
+
+
+def _stat_key(path: Path) -> Optional[tuple]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    # Atomic replaces give the file a new inode, so this also catches rewrites
+    # that land within the same mtime tick.
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    """Returns the parsed JSON object in path ({} if missing or corrupt), reusing the last parse while the file is unchanged."""
+    key = _stat_key(path)
+    with _file_cache_lock:
+        cached = _file_cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    data: Dict[str, Any] = {}
+    if key is not None:
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            pass
+    with _file_cache_lock:
+        _file_cache[path] = (key, data)
+    return data
+
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    """Writes data to path atomically: a crash leaves either the old file or the new one, never a partial write."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    with _file_cache_lock:
+        _file_cache[path] = (_stat_key(path), dict(data))
 
 class ConfigManager:
     APP_NAME = "pr-assistant"
@@ -15,6 +71,7 @@ class ConfigManager:
 
         # Local config (Current working directory)
         self.local_config_path = Path.cwd() / f".{self.APP_NAME}.json"
+        self._merged_cache: Optional[Tuple[tuple, Dict[str, Any]]] = None
 
     def _ensure_global_config_dir(self):
         self.global_config_dir.mkdir(parents=True, exist_ok=True)
@@ -22,47 +79,28 @@ class ConfigManager:
     def exists(self) -> bool:
         return self.global_config_path.exists() or self.local_config_path.exists()
 
-    def load(self) -> Dict[str, Any]:
+    def _merged(self) -> Dict[str, Any]:
+        key = (_stat_key(self.global_config_path), _stat_key(self.local_config_path))
+        if self._merged_cache is not None and self._merged_cache[0] == key:
+            return self._merged_cache[1]
         config = {}
-        
-        if self.global_config_path.exists():
-            try:
-                with open(self.global_config_path, 'r') as f:
-                    config.update(json.load(f))
-            except json.JSONDecodeError:
-                pass
-
-        if self.local_config_path.exists():
-            try:
-                with open(self.local_config_path, 'r') as f:
-                    config.update(json.load(f))
-            except json.JSONDecodeError:
-                pass
-                
+        config.update(_read_json(self.global_config_path))
+        config.update(_read_json(self.local_config_path))
+        self._merged_cache = (key, config)
         return config
 
+    def load(self) -> Dict[str, Any]:
+        return dict(self._merged())
+
     def save(self, config: Dict[str, Any], local: bool = False):
         target_path = self.local_config_path if local else self.global_config_path
-        
-        with open(target_path, 'w') as f:
-            json.dump(config, f, indent=4)
+        _write_json(target_path, config)
 
     def get(self, key: str, default: Any = None) -> Any:
-        config = self.load()
-        return config.get(key, default)
+        return self._merged().get(key, default)
 
     def set(self, key: str, value: Any, local: bool = False):
         target_path = self.local_config_path if local else self.global_config_path
-        
-        current_file_config = {}
-        if target_path.exists():
-            try:
-                with open(target_path, 'r') as f:
-                    current_file_config = json.load(f)
-            except json.JSONDecodeError:
-                pass
-        
+        current_file_config = dict(_read_json(target_path))
         current_file_config[key] = value
-        
-        with open(target_path, 'w') as f:
-            json.dump(current_file_config, f, indent=4)
+        _write_json(target_path, current_file_config)
@@ -0,0 +1,261 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from pr_assistant.codebase import CodebaseReader
+from pr_assistant.logger import get_logger
+from pr_assistant.snapshot import SNAPSHOT_DIR
+
+logger = get_logger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 100_000
+# Rough average for code and English text; good enough to stay under the limit.
+CHARS_PER_TOKEN = 4
+# Share of the budget the file tree may use before it is truncated.
+TREE_BUDGET_SHARE = 0.25
+# Share of the budget used for code chunks retrieved from the vector index.
+INDEX_BUDGET_SHARE = 0.25
+
+STOPWORDS = {
+    "the", "and", "for", "with", "this", "that", "from", "into", "all", "any",
+    "add", "use", "make", "improve", "code", "quality", "please", "should", "some",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the token count of text without calling the model's tokenizer."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+_WORD_RE = re.compile(r"[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+")
+
+
+def extract_terms(text: str) -> List[str]:
+    """Splits text into lowercase search terms, breaking up snake_case and camelCase."""
+    words = _WORD_RE.findall(text)
+    terms = []
+    for word in words:
+        word = word.lower()
+        if len(word) >= 3 and word not in STOPWORDS and word not in terms:
+            terms.append(word)
+    return terms
+
+
+def count_terms(text: str) -> Dict[str, int]:
+    """Counts the words of text that extract_terms could produce, stopwords included."""
+    counts: Dict[str, int] = {}
+    for word, count in Counter(_WORD_RE.findall(text)).items():
+        word = word.lower()
+        if len(word) >= 3:
+            counts[word] = counts.get(word, 0) + count
+    return counts
+
+
+class TermStats:
+    """
+    Word counts and token estimates of every text file, cached in
+    .pr_assistant/term_stats.json and keyed by content hash like the
+    repository map. Only new and changed files are read, so ranking an
+    unchanged tree costs the snapshot's stat calls and one cache load.
+    """
+    VERSION = 1
+
+    def __init__(self, codebase: CodebaseReader, cache_path: Optional[str] = None):
+        self.codebase = codebase
+        self.cache_path = cache_path or os.path.join(codebase.root_dir, SNAPSHOT_DIR, "term_stats.json")
+        self.entries: Dict[str, dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("version") == self.VERSION:
+            self.entries = data.get("files", {})
+
+    def _save(self):
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({"version": self.VERSION, "files": self.entries}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # A read-only checkout simply reads changed files again next time.
+            pass
+
+    @staticmethod
+    def _entry(digest: str, content: Optional[str]) -> dict:
+        # Binary and oversized files are remembered too, so they are not read again.
+        if content is None:
+            return {"hash": digest, "tokens": None}
+        return {"hash": digest, "tokens": estimate_tokens(content), "terms": count_terms(content)}
+
+    def update(self) -> Dict[str, dict]:
+        """Refreshes the cache and returns {path: entry} for every readable text file."""
+        entries, stale = {}, []
+        for path in self.codebase.iter_paths():
+            digest = self.codebase.file_hash(path)
+            entry = self.entries.get(path)
+            if digest is not None and entry is not None and entry["hash"] == digest:
+                entries[path] = entry
+            elif digest is not None:
+                stale.append((path, digest))
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as pool:
+                contents = pool.map(self.codebase.read_file, [path for path, _ in stale])
+                for (path, digest), content in zip(stale, contents):
+                    entries[path] = self._entry(digest, content)
+
+        changed = bool(stale) or entries.keys() != self.entries.keys()
+        self.entries = entries
+        if self.codebase.snapshot:
+            self.codebase.snapshot.save()
+        if changed:
+            self._save()
+        return {path: entry for path, entry in entries.items() if entry["tokens"] is not None}
+
+
+class ContextPacker:
+    """
+    Builds the codebase context for a prompt within a token budget.
+    The repository map (or the plain file tree without one) comes first, then file contents in order of relevance to
+    the instruction until the budget is spent.
+    """
+    def __init__(
+        self,
+        codebase: CodebaseReader,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        index=None,
+        top_k: int = 8,
+        repo_map=None,
+    ):
+        self.codebase = codebase
+        self.token_budget = token_budget
+        # Optional RepoMap; lists each file's symbols in place of the bare tree.
+        self.repo_map = repo_map
+        # Optional VectorIndex; its most similar chunks are sent ahead of whole files.
+        self.index = index
+        self.top_k = top_k
+        # Loaded on first use, so commands that never pack context skip the cache file.
+        self.term_stats: Optional[TermStats] = None
+
+    def _truncate_tree(self, tree: str, max_tokens: int) -> str:
+        if estimate_tokens(tree) <= max_tokens:
+            return tree
+        lines = tree.splitlines()
+        kept, used = [], 0
+        for line in lines:
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        kept.append(f"... ({len(lines) - len(kept)} more entries)")
+        return "\n".join(kept)
+
+    def structure(self, instruction: str, max_tokens: int) -> str:
+        """The repository map ranked for the instruction, falling back to the file tree."""
+        if self.repo_map is not None:
+            try:
+                self.repo_map.update()
+                repo_map = self.repo_map.render(instruction, max_tokens)
+            except OSError as e:
+                logger.warning(f"Repository map unavailable: {e}")
+                repo_map = ""
+            if repo_map:
+                return repo_map
+        return self._truncate_tree(self.codebase.get_file_structure(), max_tokens)
+
+    def rank_files(self, instruction: str) -> List[Tuple[str, float, int]]:
+        """
+        Returns (path, score, tokens) for every readable file, most relevant first.
+        Scores come from cached per-file word counts, so only files that
+        changed since the last call are read.
+        """
+        if self.term_stats is None:
+            self.term_stats = TermStats(self.codebase)
+        terms = extract_terms(instruction)
+        stats: List[Tuple[str, Dict[str, int], Dict[str, int], int]] = []
+        doc_freq = {term: 0 for term in terms}
+
+        for path, entry in self.term_stats.update().items():
+            path_terms = set(extract_terms(path))
+            path_hits = {t: 1 for t in terms if t in path_terms or t in path.lower()}
+            content_hits = {}
+            for term in terms:
+                count = entry["terms"].get(term, 0)
+                if count:
+                    content_hits[term] = count
+                if count or term in path_hits:
+                    doc_freq[term] += 1
+            stats.append((path, path_hits, content_hits, entry["tokens"]))
+
+        total = len(stats)
+        ranked = []
+        for path, path_hits, content_hits, tokens in stats:
+            score = 0.0
+            for term in terms:
+                idf = math.log(1 + total / (1 + doc_freq[term]))
+                score += idf * (3 * path_hits.get(term, 0) + math.log1p(content_hits.get(term, 0)))
+            ranked.append((path, score, tokens))
+
+        # Relevant files first; among equals, smaller files pack the budget better.
+        ranked.sort(key=lambda item: (-item[1], item[2], item[0]))
+        return ranked
+
+    def relevant_chunks(self, instruction: str, max_tokens: int) -> str:
+        """Updates the vector index and returns its top chunks for the instruction, within max_tokens."""
+        try:
+            self.index.update(self.codebase)
+            hits = self.index.search(instruction, self.top_k)
+        except OSError as e:
+            logger.warning(f"Code index unavailable: {e}")
+            return ""
+        snippets, used = [], 0
+        for hit in hits:
+            content = self.codebase.read_file(hit.path)
+            if content is None:
+                continue
+            lines = content.splitlines()[hit.start_line - 1:hit.end_line]
+            snippet = f"--- {hit.path} (lines {hit.start_line}-{hit.end_line}) ---\n" + "\n".join(lines)
+            cost = estimate_tokens(snippet)
+            if used + cost > max_tokens:
+                continue
+            snippets.append(snippet)
+            used += cost
+        return "\n\n".join(snippets)
+
+    def pack(self, instruction: str, token_budget: Optional[int] = None) -> str:
+        """Returns the tree plus as many relevant file contents as fit in the budget."""
+        budget = token_budget or self.token_budget
+        tree = self.structure(instruction, int(budget * TREE_BUDGET_SHARE))
+        sections = [f"Codebase Structure:\n{tree}"]
+        remaining = budget - estimate_tokens(sections[0])
+
+        snippets = self.relevant_chunks(instruction, int(budget * INDEX_BUDGET_SHARE)) if self.index is not None else ""
+        if snippets:
+            sections.append(f"Relevant Code:\n{snippets}")
+            remaining -= estimate_tokens(sections[-1])
+
+        file_sections = []
+        for path, _, tokens in self.rank_files(instruction):
+            header = f"--- {path} ---\n"
+            cost = tokens + estimate_tokens(header)
+            if cost > remaining:
+                continue
+            content = self.codebase.read_file(path)
+            if content is None:
+                continue
+            file_sections.append(f"{header}{content}")
+            remaining -= cost
+
+        if file_sections:
+            sections.append("File Contents:\n" + "\n\n".join(file_sections))
+        return "\n\n".join(sections)
@@ -0,0 +1,71 @@
+import re
+from typing import Any, Dict, List
+from pr_assistant.context import CHARS_PER_TOKEN, estimate_tokens
+from pr_assistant.github_client import FILE_SEPARATOR, format_file_patch
+
+DEFAULT_CHUNK_TOKENS = 8000
+
+_HUNK_RE = re.compile(r"^@@", re.MULTILINE)
+# Room left in each file header for the " (part i of n)" suffix.
+_PART_SUFFIX_CHARS = 32
+
+
+def split_hunks(patch: str) -> List[str]:
+    """Splits a unified diff patch at its "@@" hunk headers."""
+    starts = [m.start() for m in _HUNK_RE.finditer(patch)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return [patch[a:b].rstrip("\n") for a, b in zip(starts, starts[1:] + [len(patch)])]
+
+
+def _pack(pieces: List[str], max_chars: int, separator: str = "\n") -> List[str]:
+    """Greedily joins pieces into groups of at most max_chars (a single oversized piece stays whole)."""
+    groups: List[str] = []
+    current: List[str] = []
+    size = 0
+    for piece in pieces:
+        added = len(piece) + (len(separator) if current else 0)
+        if current and size + added > max_chars:
+            groups.append(separator.join(current))
+            current, size = [], 0
+            added = len(piece)
+        current.append(piece)
+        size += added
+    if current:
+        groups.append(separator.join(current))
+    return groups
+
+
+def file_sections(file: Dict[str, Any], max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[str]:
+    """
+    Formats one changed file, split into parts of at most about max_tokens.
+    Parts break between hunks where possible and between lines otherwise.
+    """
+    text = format_file_patch(**file)
+    patch = file.get("patch")
+    if not patch or estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    header = format_file_patch(**dict(file, patch="-"))
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN - len(header) - _PART_SUFFIX_CHARS)
+    pieces = []
+    for hunk in split_hunks(patch):
+        if len(hunk) > max_chars:
+            pieces.extend(_pack(hunk.split("\n"), max_chars))
+        else:
+            pieces.append(hunk)
+    groups = _pack(pieces, max_chars)
+    return [
+        format_file_patch(**dict(file, filename=f"{file['filename']} (part {i} of {len(groups)})", patch=group))
+        for i, group in enumerate(groups, 1)
+    ]
+
+
+def chunk_diff(files: List[Dict[str, Any]], max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[str]:
+    """
+    Splits a PR's changed files into formatted diff chunks of about max_tokens each.
+    Small files are packed together whole, in order; a file too large for one
+    chunk is split into parts by file_sections.
+    """
+    sections = [section for file in files for section in file_sections(file, max_tokens)]
+    return _pack(sections, max_tokens * CHARS_PER_TOKEN, FILE_SEPARATOR)
@@ -1,45 +1,227 @@
-from github import Github, Auth
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
 from pr_assistant.config import ConfigManager
+from pr_assistant.lazy import LazyImport
+from pr_assistant.local_repo import LocalRepo
+from pr_assistant.rate_limiter import (
+    TokenBucket,
+    observe_rate_limit_headers,
+    shared_bucket,
+    DEFAULT_GITHUB_REQUESTS_PER_HOUR,
+)
+from pr_assistant.repo_cache import DEFAULT_BASE_SHA_TTL_SECONDS, RepoMetadataCache
+from pr_assistant.unified_diff import split_file_patches
+
+# PyGithub is imported on first use so commands that never talk to GitHub start fast.
+github = LazyImport("github")
+Github = LazyImport("github", "Github")
+Auth = LazyImport("github", "Auth")
+InputGitTreeElement = LazyImport("github", "InputGitTreeElement")
+
+# Largest page size the REST API allows.
+PER_PAGE = 100
+
+# Separates files in a formatted diff.
+FILE_SEPARATOR = "\n\n---\n\n"
+# GitHub omits the patch for binary files and for diffs that are too large.
+MISSING_PATCH = "(no textual diff: binary file or diff too large)"
+
+def format_file_patch(filename: str, status: str, additions: int, deletions: int, patch: Optional[str]) -> str:
+    """Formats one changed file the way review prompts expect it."""
+    return f"File: {filename}\nStatus: {status}\nChanges: +{additions} -{deletions}\n\nPatch:\n{patch or MISSING_PATCH}"
+
+# Everything a review needs in one round-trip; the files connection pages by cursor.
+PR_REVIEW_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      title
+      body
+      url
+      headRefOid
+      baseRefName
+      author { login }
+      files(first: 100, after: $after) {
+        nodes { path additions deletions changeType }
+        pageInfo { hasNextPage endCursor }
+      }
+    }
+  }
+}
+"""
+
+# GraphQL changeType values that differ from the REST files API status.
+_CHANGE_TYPE_STATUS = {"DELETED": "removed"}
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parses GitHub's ISO 8601 timestamps ("2024-01-01T00:00:00Z")."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def project_pr(data: Dict[str, Any]) -> dict:
+    """Picks the fields list_prs reports from a raw pull request payload."""
+    return {
+        "number": data["number"],
+        "title": data["title"],
+        "url": data["html_url"],
+        "user": (data.get("user") or {}).get("login"),
+        "labels": [label["name"] for label in data.get("labels") or []],
+        "created_at": parse_timestamp(data["created_at"]).isoformat(),
+        "head_sha": (data.get("head") or {}).get("sha"),
+    }
+
+
+def _pace_requests(requester, bucket: TokenBucket):
+    """
+    Takes a token from bucket before every HTTP request the requester sends and
+    syncs the bucket with the X-RateLimit-* headers of each response.
+    """
+    # Every call, including raw GraphQL and diff requests, goes through this
+    # method; PyGithub has no public hook that runs before a request.
+    request_raw = requester._Requester__requestRaw
+
+    def paced(*args, **kwargs):
+        bucket.acquire()
+        status, headers, output = request_raw(*args, **kwargs)
+        observe_rate_limit_headers(bucket, headers)
+        return status, headers, output
+
+    requester._Requester__requestRaw = paced
+
 
 class GitHubClient:
-    def __init__(self, config_manager: Optional[ConfigManager] = None):
+    def __init__(
+        self,
+        config_manager: Optional[ConfigManager] = None,
+        metadata: Optional[RepoMetadataCache] = None,
+        local_repo: Optional[LocalRepo] = None,
+        rate_bucket: Optional[TokenBucket] = None,
+    ):
         self.config = config_manager or ConfigManager()
         self.token = self.config.get("bot_github_token") or self.config.get("github_token")
         if not self.token:
             raise ValueError("GitHub token not found. Run 'pr-assistant init' first.")
         
         auth = Auth.Token(self.token)
-        self.gh = Github(auth=auth)
+        # lazy=True builds handles such as the repo without a request; objects are
+        # fetched only when a field that is not already known is read.
+        options = {"auth": auth, "lazy": True}
+        base_url = self.config.get("github_base_url")
+        if base_url:
+            options["base_url"] = base_url
+        self.gh = Github(**options)
+        if rate_bucket is None:
+            per_hour = float(self.config.get("github_requests_per_hour", DEFAULT_GITHUB_REQUESTS_PER_HOUR))
+            rate_bucket = shared_bucket("github", per_hour / 3600, per_hour)
+        self.rate_bucket = rate_bucket
+        _pace_requests(self.gh.requester, rate_bucket)
+        # "graphql" fetches PR details and files in two requests; "rest" uses the files API.
+        self.use_graphql = self.config.get("github_api", "graphql") == "graphql"
+        self._graphql_files: Dict[int, List[dict]] = {}
         self.repo_name = self.config.get("repo_name")
         if not self.repo_name:
              raise ValueError("Repository name not configured. Run 'pr-assistant init' first.")
         
+        # The repo itself is only fetched when the default branch is not cached.
         self.repo = self.gh.get_repo(self.repo_name)
+        self.metadata = metadata or RepoMetadataCache(
+            sha_ttl_seconds=self.config.get("base_sha_ttl_seconds", DEFAULT_BASE_SHA_TTL_SECONDS)
+        )
+        self._default_branch: Optional[str] = None
+        # With a local clone, commits and diffs go through git; PRs and comments still use the API.
+        self.local_repo = local_repo
+        self._pr_bases: Dict[int, str] = {}
+        self._pr_heads: Dict[int, Optional[str]] = {}
+        self._login: Optional[str] = None
+
+    @property
+    def default_branch(self) -> str:
+        """The repository's default branch, detected once and cached."""
+        if self._default_branch is None:
+            cached = self.metadata.get_repo(self.repo_name)
+            if cached:
+                self._default_branch = cached["default_branch"]
+            else:
+                self._default_branch = self.repo.default_branch
+                self.metadata.set_repo(self.repo_name, self.repo.id, self._default_branch)
+        return self._default_branch
 
-    def create_pr(self, title: str, body: str, head: str, base: str = "main") -> str:
-        """Creates a PR and returns the HTML URL."""
-        pr = self.repo.create_pull(title=title, body=body, head=head, base=base)
+    def get_base_sha(self, branch: Optional[str] = None) -> str:
+        """Head SHA of branch (default: the default branch), reused for base_sha_ttl_seconds."""
+        branch = branch or self.default_branch
+        sha = self.metadata.get_sha(self.repo_name, branch)
+        if sha is None:
+            sha = self.repo.get_branch(branch).commit.sha
+            self.metadata.set_sha(self.repo_name, branch, sha)
+        return sha
+
+    def create_pr(self, title: str, body: str, head: str, base: Optional[str] = None) -> str:
+        """Creates a PR against base (default: the default branch) and returns the HTML URL."""
+        pr = self.repo.create_pull(title=title, body=body, head=head, base=base or self.default_branch)
         return pr.html_url
 
+    def find_pr(self, head: str) -> Optional[str]:
+        """HTML URL of the open PR from branch head, if there is one."""
+        owner = self.repo_name.split("/")[0]
+        for pr in self.repo.get_pulls(state="open", head=f"{owner}:{head}"):
+            return pr.html_url
+        return None
+
+    def find_branch_commit(self, branch: str, message: str) -> Optional[str]:
+        """
+        SHA of the branch's head commit if that commit has the given message,
+        so a commit whose outcome was lost (e.g. in a crash) can be recognized.
+        """
+        try:
+            ref = self.repo.get_git_ref(f"heads/{branch}")
+        except github.GithubException as e:
+            if e.status == 404:
+                return None
+            raise
+        commit = self.repo.get_git_commit(ref.object.sha)
+        return commit.sha if commit.message == message else None
+
+    def iter_prs(
+        self,
+        state: str = "open",
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """
+        Yields PRs newest first, fetching one page of PER_PAGE at a time.
+        Fields are read straight from the list payload, so no per-PR requests
+        are made. Paging stops at limit PRs or at the first PR created before since.
+        """
+        if since is not None and since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        count = 0
+        page = 1
+        while limit is None or count < limit:
+            _, items = self.gh.requester.requestJsonAndCheck(
+                "GET",
+                f"/repos/{self.repo_name}/pulls",
+                parameters={"state": state, "sort": "created", "direction": "desc", "per_page": PER_PAGE, "page": page},
+            )
+            for item in items:
+                if since is not None and parse_timestamp(item["created_at"]) < since:
+                    return
+                yield project_pr(item)
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            if len(items) < PER_PAGE:
+                return
+            page += 1
+
     def list_prs(self, state: str = "open") -> List[dict]:
         """Lists PRs and returns a simplified list of dicts."""
-        prs = self.repo.get_pulls(state=state)
-        return [
-            {
-                "number": pr.number,
-                "title": pr.title,
-                "url": pr.html_url,
-                "user": pr.user.login,
-                "created_at": pr.created_at.isoformat()
-            }
-            for pr in prs
-        ]
+        return list(self.iter_prs(state))
 
-    def create_branch(self, branch_name: str, source_branch: str = "main"):
-        """Creates a new branch from the source branch."""
-        source = self.repo.get_branch(source_branch)
-        self.repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=source.commit.sha)
+    def create_branch(self, branch_name: str, source_branch: Optional[str] = None):
+        """Creates a new branch from the source branch (default: the default branch)."""
+        self.repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=self.get_base_sha(source_branch))
 
     def create_file(self, path: str, message: str, content: str, branch: str):
         """Creates or updates a file in the repository."""
@@ -49,24 +231,197 @@ class GitHubClient:
         except:
             self.repo.create_file(path, message, content, branch=branch)
 
+    def commit_files(
+        self,
+        branch: str,
+        files: List[Dict[str, str]],
+        message: str,
+        source_branch: Optional[str] = None,
+        max_workers: int = 8,
+    ) -> str:
+        """
+        Commits all files as a single commit using the Git Data API and returns its SHA.
+        With source_branch, the branch is created pointing straight at the new commit;
+        otherwise the existing branch is moved to it. Either way the ref changes once.
+        With a local clone, the commit is made there and pushed instead.
+        """
+        if self.local_repo is not None:
+            return self.local_repo.commit_files(branch, files, message, source_branch)
+        if source_branch:
+            parent_sha = self.get_base_sha(source_branch)
+            ref = None
+        else:
+            ref = self.repo.get_git_ref(f"heads/{branch}")
+            parent_sha = ref.object.sha
+        parent = self.repo.get_git_commit(parent_sha)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            blobs = list(pool.map(lambda f: self.repo.create_git_blob(f["content"], "utf-8"), files))
+
+        elements = [
+            InputGitTreeElement(f["path"], "100644", "blob", sha=blob.sha)
+            for f, blob in zip(files, blobs)
+        ]
+        tree = self.repo.create_git_tree(elements, parent.tree)
+        commit = self.repo.create_git_commit(message, tree, [parent])
+
+        if ref is None:
+            self.repo.create_git_ref(ref=f"refs/heads/{branch}", sha=commit.sha)
+        else:
+            ref.edit(commit.sha)
+            if self.metadata.get_sha(self.repo_name, branch) is not None:
+                self.metadata.set_sha(self.repo_name, branch, commit.sha)
+        return commit.sha
+
     def get_pr_details(self, pr_number: int) -> dict:
-        """Fetches PR title and body."""
-        pr = self.repo.get_pull(pr_number)
+        """
+        Fetches PR title and body.
+        With GraphQL, the same query returns the changed files, which are kept
+        for the next get_pr_files call on this PR. With a local clone, the PR
+        head is fetched into it so diffs can be computed locally.
+        """
+        if self.use_graphql:
+            pr = self._graphql_pr(pr_number)
+            self._graphql_files[pr_number] = pr["files"]
+            details = {
+                "title": pr["title"],
+                "body": pr["body"],
+                "url": pr["url"],
+                "user": (pr.get("author") or {}).get("login"),
+                "head_sha": pr["headRefOid"],
+                "base_branch": pr["baseRefName"]
+            }
+        else:
+            pr = self.repo.get_pull(pr_number)
+            details = {
+                "title": pr.title,
+                "body": pr.body,
+                "url": pr.html_url,
+                "user": pr.user.login,
+                "head_sha": pr.head.sha,
+                "base_branch": pr.base.ref
+            }
+        self._pr_bases[pr_number] = details["base_branch"]
+        self._pr_heads[pr_number] = details.get("head_sha")
+        if self.local_repo is not None:
+            self.local_repo.fetch_pull(pr_number, details["base_branch"], details.get("head_sha"))
+        return details
+
+    def _graphql_pr(self, pr_number: int) -> dict:
+        owner, name = self.repo_name.split("/", 1)
+        files: List[dict] = []
+        after = None
+        while True:
+            _, data = self.gh.requester.graphql_query(
+                PR_REVIEW_QUERY, {"owner": owner, "name": name, "number": pr_number, "after": after}
+            )
+            pr = data["data"]["repository"]["pullRequest"]
+            files.extend(pr["files"]["nodes"])
+            page_info = pr["files"]["pageInfo"]
+            if not page_info["hasNextPage"]:
+                return dict(pr, files=files)
+            after = page_info["endCursor"]
+
+    def _files_from_diff(self, pr_number: int, files: List[dict]) -> Optional[List[dict]]:
+        """Fills in patches for GraphQL file entries from one raw .diff download."""
+        status, _, diff = self.gh.requester.requestJson(
+            "GET", f"/repos/{self.repo_name}/pulls/{pr_number}", headers={"Accept": "application/vnd.github.diff"}
+        )
+        if status >= 400:
+            # e.g. 406 when the diff is too large to render.
+            return None
+        patches = split_file_patches(diff)
+        result = [
+            {
+                "filename": f["path"],
+                "status": _CHANGE_TYPE_STATUS.get(f["changeType"], f["changeType"].lower()),
+                "additions": f["additions"],
+                "deletions": f["deletions"],
+                "patch": patches.get(f["path"]),
+            }
+            for f in files
+        ]
+        if any(f["patch"] is None and (f["additions"] or f["deletions"]) for f in result):
+            # A text change whose patch was not found in the diff; the files API has it.
+            return None
+        return result
+
+    @staticmethod
+    def _file_info(file) -> dict:
         return {
-            "title": pr.title,
-            "body": pr.body,
-            "url": pr.html_url,
-            "user": pr.user.login
+            "filename": file.filename,
+            "status": file.status,
+            "additions": file.additions,
+            "deletions": file.deletions,
+            "patch": file.patch,
         }
 
+    def get_pr_files(self, pr_number: int) -> List[dict]:
+        """Lists the PR's changed files. patch is None for binary or very large files."""
+        graphql_files = self._graphql_files.pop(pr_number, None)
+        if self.local_repo is not None:
+            return self.local_repo.pr_files(
+                pr_number, self._pr_bases.get(pr_number) or self.default_branch, self._pr_heads.get(pr_number)
+            )
+        if graphql_files is not None:
+            files = self._files_from_diff(pr_number, graphql_files)
+            if files is not None:
+                return files
+        pr = self.repo.get_pull(pr_number)
+        return [self._file_info(file) for file in pr.get_files()]
+
     def get_pr_diff(self, pr_number: int) -> str:
         """Fetches the diff of the PR."""
+        return FILE_SEPARATOR.join(format_file_patch(**f) for f in self.get_pr_files(pr_number))
+
+    def compare_files(self, base_sha: str, head_sha: str) -> Optional[List[dict]]:
+        """
+        Lists the files changed between two commits, in get_pr_files format.
+        Returns None when base_sha is gone or no longer an ancestor of head_sha,
+        e.g. after a force-push.
+        """
+        if self.local_repo is not None:
+            return self.local_repo.compare_files(base_sha, head_sha)
+        try:
+            comparison = self.repo.compare(base_sha, head_sha)
+        except github.GithubException as e:
+            if e.status == 404:
+                return None
+            raise
+        if comparison.status not in ("ahead", "identical"):
+            return None
+        return [self._file_info(file) for file in comparison.files]
+
+    @property
+    def login(self) -> Optional[str]:
+        """The authenticated user's login, looked up once. None if the token cannot tell, e.g. an app token."""
+        if self._login is None:
+            try:
+                self._login = self.gh.get_user().login
+            except github.GithubException:
+                self._login = ""
+        return self._login or None
+
+    def find_comment(self, pr_number: int, *texts: str) -> Optional[dict]:
+        """
+        Returns the id and body of the latest PR comment by the authenticated
+        user that contains every one of texts, if any.
+        """
         pr = self.repo.get_pull(pr_number)
-        files_data = []
-        for file in pr.get_files():
-            files_data.append(f"File: {file.filename}\nStatus: {file.status}\nChanges: +{file.additions} -{file.deletions}\n\nPatch:\n{file.patch}")
-        
-        return "\n\n---\n\n".join(files_data)
+        login = self.login
+        found = None
+        for comment in pr.get_issue_comments():
+            body = comment.body or ""
+            if login and comment.user.login != login:
+                continue
+            if all(text in body for text in texts):
+                found = {"id": comment.id, "body": body}
+        return found
+
+    def update_comment(self, pr_number: int, comment_id: int, body: str):
+        """Replaces the body of an existing PR comment."""
+        pr = self.repo.get_pull(pr_number)
+        pr.get_issue_comment(comment_id).edit(body)
 
     def post_comment(self, pr_number: int, body: str):
         """Posts a comment on the PR."""
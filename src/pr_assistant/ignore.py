@@ -0,0 +1,204 @@
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_IGNORE_PATTERNS = [".git", "__pycache__", "*.pyc", ".DS_Store", "venv", ".env", ".pr_assistant"]
+
+
+def read_patterns(path: str) -> List[str]:
+    """Reads the raw lines of a gitignore-style file, or [] if it does not exist."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read().splitlines()
+    except OSError:
+        return []
+
+
+def translate_pattern(pattern: str) -> str:
+    """Translates a gitignore glob (without anchoring or negation) into a regex."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            j = i
+            while j < n and pattern[j] == "*":
+                j += 1
+            at_start = i == 0 or pattern[i - 1] == "/"
+            if j - i == 2 and at_start and j == n:
+                out.append(".*")
+            elif j - i == 2 and at_start and pattern[j] == "/":
+                out.append("(?:.*/)?")
+                j += 1
+            else:
+                out.append("[^/]*")
+            i = j
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 2 if pattern[j] == "\\" else 1
+            if j >= n:
+                out.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1:j].replace("[", "\\[")
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            out.append(f"(?!/)[{body}]")
+            i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """
+    The patterns of a single gitignore source, compiled into combined regexes.
+    Patterns without a slash match the basename, anchored ones the full path.
+    Alternatives are joined in reverse order, so the first alternative that
+    fully matches is the last matching pattern, as gitignore requires.
+    """
+    def __init__(self, lines: List[str], base: str = ""):
+        self.base = base
+        self.patterns: List[str] = []
+        self.fingerprint = hashlib.sha1("\n".join(lines).encode()).hexdigest()
+
+        parsed = []
+        for line in lines:
+            rule = self._parse(line)
+            if rule is not None:
+                self.patterns.append(line.strip())
+                parsed.append(rule)
+
+        self._negated = [rule[1] for rule in parsed]
+        self._compiled = {}
+        for is_dir in (True, False):
+            applicable = [(k, rule) for k, rule in enumerate(parsed) if is_dir or not rule[2]]
+            self._compiled[is_dir] = (
+                self._combine([(k, rule[0]) for k, rule in applicable if not rule[3]]),
+                self._combine([(k, rule[0]) for k, rule in applicable if rule[3]]),
+            )
+
+    def _parse(self, line: str):
+        if not line or line.startswith("#"):
+            return None
+        # Trailing spaces are ignored unless escaped with a backslash.
+        stripped = line.rstrip(" ")
+        if stripped.endswith("\\") and len(stripped) < len(line):
+            stripped += " "
+        line = stripped
+        if not line:
+            return None
+
+        is_negated = line.startswith("!")
+        if is_negated:
+            line = line[1:]
+        elif line.startswith("\\!") or line.startswith("\\#"):
+            line = line[1:]
+
+        is_dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+
+        anchored = "/" in line
+        regex = translate_pattern(line.lstrip("/"))
+        if anchored and self.base:
+            regex = re.escape(f"{self.base}/") + regex
+        return regex, is_negated, is_dir_only, anchored
+
+    @staticmethod
+    def _combine(indexed: List[Tuple[int, str]]) -> Optional["re.Pattern"]:
+        if not indexed:
+            return None
+        alternatives = [f"(?P<r{k}>{regex})" for k, regex in reversed(indexed)]
+        return re.compile("|".join(alternatives), re.DOTALL)
+
+    @staticmethod
+    def _rule_index(m: "re.Match[str]") -> int:
+        # Every alternative is a named group, so a match always has a last group.
+        assert m.lastgroup is not None
+        return int(m.lastgroup[1:])
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if re-included by a negation, None if no pattern matches."""
+        basename_regex, path_regex = self._compiled[is_dir]
+        index = -1
+        if basename_regex is not None:
+            m = basename_regex.fullmatch(rel_path.rpartition("/")[2])
+            if m is not None:
+                index = self._rule_index(m)
+        if path_regex is not None:
+            m = path_regex.fullmatch(rel_path)
+            if m is not None:
+                index = max(index, self._rule_index(m))
+        if index < 0:
+            return None
+        return not self._negated[index]
+
+
+class GitIgnoreMatcher:
+    """
+    Evaluates gitignore rules for paths relative to a repository root.
+    Built-in defaults, .git/info/exclude and the root .gitignore form the root
+    level; nested .gitignore files are loaded lazily per directory and take
+    precedence over their ancestors.
+    """
+    def __init__(self, root_dir: str, defaults: Optional[List[str]] = None):
+        self.root_dir = os.path.abspath(root_dir)
+        root_lines = list(DEFAULT_IGNORE_PATTERNS if defaults is None else defaults)
+        root_lines += read_patterns(os.path.join(self.root_dir, ".git", "info", "exclude"))
+        root_lines += read_patterns(os.path.join(self.root_dir, ".gitignore"))
+        self._rules: Dict[str, Optional[IgnoreRules]] = {"": IgnoreRules(root_lines)}
+        self._chains: Dict[str, Tuple[IgnoreRules, ...]] = {}
+
+    @property
+    def root_rules(self) -> IgnoreRules:
+        rules = self._rules[""]
+        assert rules is not None
+        return rules
+
+    def rules_for(self, rel_dir: str) -> Optional[IgnoreRules]:
+        """Returns the rules defined by the .gitignore in rel_dir, loading it on first use."""
+        if rel_dir not in self._rules:
+            lines = read_patterns(os.path.join(self.root_dir, rel_dir, ".gitignore"))
+            self._rules[rel_dir] = IgnoreRules(lines, base=rel_dir) if lines else None
+        return self._rules[rel_dir]
+
+    def _chain(self, rel_dir: str) -> Tuple[IgnoreRules, ...]:
+        """The rules that apply inside rel_dir, deepest first, memoized per directory."""
+        chain = self._chains.get(rel_dir)
+        if chain is None:
+            parent_chain = self._chain(rel_dir.rpartition("/")[0]) if rel_dir else ()
+            rules = self.rules_for(rel_dir)
+            chain = (rules,) + parent_chain if rules is not None else parent_chain
+            self._chains[rel_dir] = chain
+        return chain
+
+    def match(self, rel_path: str, is_dir: bool = False) -> bool:
+        """Matches a single path, assuming none of its parent directories are ignored."""
+        for rules in self._chain(rel_path.rpartition("/")[0]):
+            result = rules.match(rel_path, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        """Matches a path, treating it as ignored when any parent directory is ignored."""
+        parts = rel_path.strip("/").split("/")
+        for k in range(1, len(parts)):
+            if self.match("/".join(parts[:k]), is_dir=True):
+                return True
+        return self.match("/".join(parts), is_dir)
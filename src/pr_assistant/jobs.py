@@ -0,0 +1,387 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+from pr_assistant.lazy import LazyImport
+from pr_assistant.logger import get_logger
+from pr_assistant.rate_limiter import retry_after_seconds
+from pr_assistant.retry import backoff_delay, is_transient_error
+
+# Only needed for the host name that identifies a job's worker.
+socket = LazyImport("socket")
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+# A running job whose worker stops renewing its lease for this long is taken over.
+DEFAULT_LEASE_SECONDS = 15 * 60
+
+_JOB_COLUMNS = "id, kind, repo, key, payload, state, attempts, next_run_at, error, result, created_at, updated_at"
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    repo: Optional[str] = None
+    key: Optional[str] = None
+    state: str = PENDING
+    attempts: int = 0
+    next_run_at: float = 0.0
+    error: Optional[str] = None
+    result: Any = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    @classmethod
+    def from_row(cls, row) -> "Job":
+        (job_id, kind, repo, key, payload, state, attempts, next_run_at, error, result, created_at, updated_at) = row
+        return cls(
+            id=job_id, kind=kind, payload=json.loads(payload), repo=repo, key=key, state=state,
+            attempts=attempts, next_run_at=next_run_at, error=error,
+            result=json.loads(result) if result is not None else None,
+            created_at=created_at, updated_at=updated_at,
+        )
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """False only if owner is a process on this host that no longer exists."""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class JobQueue:
+    """
+    Durable queue of create and review jobs in a local SQLite database.
+    Each job records its steps (e.g. files committed, PR opened), so a job
+    that is run again after a failure or a crash skips the steps that
+    already finished. A step that started but was never recorded as done
+    is re-run with resumed=True, so it can first check whether its effect
+    already happened. Like the rate limiter's database, every state change
+    runs in a BEGIN IMMEDIATE transaction, so concurrent workers in
+    several processes never claim the same job.
+    """
+    def __init__(
+        self,
+        storage_path: Optional[Path] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.storage_path = Path(storage_path) if storage_path else Path.home() / ".pr_assistant" / "jobs.db"
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self._local = threading.local()
+        self._ensure_storage()
+
+    @property
+    def owner(self) -> str:
+        # Computed each time, so a forked worker claims jobs under its own PID.
+        return _owner()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # SQLite connections must not cross a fork, so each process opens its own.
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.storage_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _ensure_storage(self):
+        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, repo TEXT, key TEXT, payload TEXT NOT NULL, "
+            "state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_run_at REAL NOT NULL DEFAULT 0, "
+            "owner TEXT, lease_until REAL, error TEXT, result TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (repo, state)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS steps ("
+            "job_id INTEGER NOT NULL, name TEXT NOT NULL, state TEXT NOT NULL, result TEXT, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (job_id, name))"
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, job_id: int) -> Optional[Job]:
+        row = self._connect().execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def _reload(self, job_id: int) -> Job:
+        """Reads back a job this queue just wrote, which cannot be missing."""
+        job = self.get(job_id)
+        assert job is not None, f"job {job_id} vanished"
+        return job
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        key: Optional[str] = None,
+        repo: Optional[str] = None,
+        rerun_done: bool = False,
+    ) -> Job:
+        """
+        Adds a job, or returns the existing job with the same key so its
+        finished steps are not repeated. A failed job is queued again.
+        An unfinished job whose payload differs is reset to run the new
+        payload from its first step; one still held by a live worker raises
+        RuntimeError instead. A finished job is returned as is, unless
+        rerun_done asks for a new one.
+        """
+        now = self.clock()
+        # Round-tripped so the comparison sees what was stored.
+        payload = json.loads(json.dumps(payload))
+        with self._transaction() as conn:
+            if key is not None:
+                row = conn.execute(
+                    f"SELECT {_JOB_COLUMNS}, owner, lease_until FROM jobs WHERE key = ? ORDER BY id DESC LIMIT 1", (key,)
+                ).fetchone()
+                existing = Job.from_row(row[:-2]) if row else None
+                if existing is not None and existing.state == DONE:
+                    if not rerun_done:
+                        return existing
+                elif existing is not None and existing.payload == payload:
+                    if existing.state == FAILED:
+                        conn.execute(
+                            "UPDATE jobs SET state = ?, attempts = 0, next_run_at = 0, updated_at = ? WHERE id = ?",
+                            (PENDING, now, existing.id),
+                        )
+                    return self._reload(existing.id)
+                elif existing is not None:
+                    owner, lease_until = row[-2:]
+                    if existing.state == RUNNING and (lease_until or 0) > now and _owner_alive(owner):
+                        raise RuntimeError(f"job {existing.id} ({key}) is running with different input in {owner}")
+                    # Steps recorded for the old payload say nothing about the new one.
+                    conn.execute("DELETE FROM steps WHERE job_id = ?", (existing.id,))
+                    conn.execute(
+                        "UPDATE jobs SET kind = ?, repo = ?, payload = ?, state = ?, attempts = 0, next_run_at = 0, "
+                        "owner = NULL, lease_until = NULL, error = NULL, result = NULL, updated_at = ? WHERE id = ?",
+                        (kind, repo, json.dumps(payload), PENDING, now, existing.id),
+                    )
+                    return self._reload(existing.id)
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, repo, key, payload, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, repo, key, json.dumps(payload), PENDING, now, now),
+            )
+            job_id = cursor.lastrowid
+        assert job_id is not None
+        return self._reload(job_id)
+
+    def claim(self, job_id: int) -> Optional[Job]:
+        """
+        Marks a job as running by this process and counts the attempt.
+        Returns None if the job is finished or another live worker holds it.
+        """
+        now = self.clock()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT state, owner, lease_until FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            state, owner, lease_until = row
+            if state == RUNNING:
+                # Taken over only when its worker crashed or stopped renewing the lease.
+                if (lease_until or 0) > now and _owner_alive(owner):
+                    return None
+                logger.warning(f"Job {job_id} was abandoned by {owner}; resuming it")
+            elif state != PENDING:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, owner = ?, lease_until = ?, updated_at = ? "
+                "WHERE id = ?",
+                (RUNNING, self.owner, now + self.lease_seconds, now, job_id),
+            )
+        return self.get(job_id)
+
+    def step(self, job: Job, name: str, fn: Callable[[bool], T]) -> T:
+        """
+        Runs one step of a job at most once to completion and returns its
+        result, which must be JSON-serializable. A step recorded as done
+        returns its stored result. fn is passed resumed=True when an earlier
+        attempt started the step but did not record its outcome.
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT state, result FROM steps WHERE job_id = ? AND name = ?", (job.id, name)).fetchone()
+        if row is not None and row[0] == DONE:
+            return json.loads(row[1])
+        now = self.clock()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO steps (job_id, name, state, updated_at) VALUES (?, ?, ?, ?)",
+                (job.id, name, RUNNING, now),
+            )
+            # Each step renews the lease, so long jobs are not taken over mid-run.
+            conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (now + self.lease_seconds, job.id))
+        result = fn(row is not None)
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE steps SET state = ?, result = ?, updated_at = ? WHERE job_id = ? AND name = ?",
+                (DONE, json.dumps(result), self.clock(), job.id, name),
+            )
+        return result
+
+    def reset_step(self, job: Job, name: str):
+        """Forgets a step's result, so the step runs again."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM steps WHERE job_id = ? AND name = ?", (job.id, name))
+
+    def steps(self, job_id: int) -> Dict[str, str]:
+        """Step name to state, in the order the steps first ran."""
+        rows = self._connect().execute(
+            "SELECT name, state FROM steps WHERE job_id = ? ORDER BY rowid", (job_id,)
+        ).fetchall()
+        return dict(rows)
+
+    def _finish(self, job: Job, state: str, error: Optional[str] = None, result: Any = None, delay: float = 0.0):
+        now = self.clock()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, result = ?, next_run_at = ?, owner = NULL, lease_until = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (state, error, json.dumps(result) if result is not None else None, now + delay, now, job.id),
+            )
+
+    def complete(self, job: Job, result: Any = None):
+        self._finish(job, DONE, result=result)
+
+    def reschedule(self, job: Job, error: str, delay: float):
+        """Returns a job to the queue, to run again after delay seconds."""
+        self._finish(job, PENDING, error=error, delay=delay)
+
+    def fail(self, job: Job, error: str):
+        self._finish(job, FAILED, error=error)
+
+    def retry_failed(self, repo: Optional[str] = None) -> int:
+        """Queues every failed job again with a fresh attempt count; returns how many."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, next_run_at = 0, updated_at = ? "
+                "WHERE state = ? AND (? IS NULL OR repo = ?)",
+                (PENDING, self.clock(), FAILED, repo, repo),
+            )
+            return cursor.rowcount
+
+    def list_jobs(self, repo: Optional[str] = None, states: Optional[Iterable[str]] = None, limit: int = 50) -> List[Job]:
+        """Most recent jobs first."""
+        states = list(states or [PENDING, RUNNING, DONE, FAILED])
+        rows = self._connect().execute(
+            f"SELECT {_JOB_COLUMNS} FROM jobs WHERE (? IS NULL OR repo = ?) "
+            f"AND state IN ({', '.join('?' * len(states))}) ORDER BY id DESC LIMIT ?",
+            (repo, repo, *states, limit),
+        ).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+
+class JobContext:
+    """What a job handler gets: the job's payload and a way to run recorded steps."""
+    def __init__(self, queue: JobQueue, job: Job):
+        self.queue = queue
+        self.job = job
+
+    @property
+    def payload(self) -> Dict[str, Any]:
+        return self.job.payload
+
+    def step(self, name: str, fn: Callable[[bool], T]) -> T:
+        return self.queue.step(self.job, name, fn)
+
+    def done(self, name: str) -> bool:
+        return self.queue.steps(self.job.id).get(name) == DONE
+
+    def reset_step(self, name: str):
+        self.queue.reset_step(self.job, name)
+
+
+class JobRunner:
+    """
+    Runs queued jobs with the handler registered for their kind.
+    A transient failure (see retry.is_transient_error) puts the job back in
+    the queue after an exponential backoff with jitter, or after the delay
+    the API asked for; the next attempt resumes at the step that failed.
+    Other failures, or running out of attempts, mark the job failed, and
+    `pr-assistant jobs --resume` can pick it up later.
+    """
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, Callable[[JobContext], Any]],
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+    def run_job(self, job_id: int) -> Optional[Job]:
+        """Runs a job until it is done or failed, and returns it in that state."""
+        while True:
+            job = self.queue.get(job_id)
+            if job is None:
+                return None
+            wait = job.next_run_at - self.queue.clock()
+            if job.state == PENDING and wait > 0:
+                self.sleep(wait)
+            job = self.queue.claim(job_id)
+            if job is None:
+                return self.queue.get(job_id)
+            try:
+                handler = self.handlers[job.kind]
+                result = handler(JobContext(self.queue, job))
+            except Exception as e:
+                if job.attempts < self.max_attempts and is_transient_error(e):
+                    delay = retry_after_seconds(e)
+                    if delay is None:
+                        delay = backoff_delay(job.attempts - 1, self.base_delay, self.max_delay)
+                    logger.warning(f"Job {job.id} ({job.kind}) failed ({e}); retrying in {delay:.1f}s")
+                    self.queue.reschedule(job, str(e), delay)
+                    continue
+                logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+                self.queue.fail(job, str(e))
+            else:
+                self.queue.complete(job, result)
+            return self.queue.get(job_id)
+
+    def run(self, job_ids: Iterable[int], workers: int = 4) -> List[Optional[Job]]:
+        """Runs jobs concurrently and returns them in input order."""
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return list(pool.map(self.run_job, job_ids))
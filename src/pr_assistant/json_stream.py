@@ -0,0 +1,89 @@
+import json
+import re
+from typing import Any, Iterable, Iterator, List, Optional
+from pr_assistant.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class IncrementalArrayParser:
+    """
+    Extracts the elements of a JSON array from text that arrives in chunks.
+    The array is located by its key (e.g. "prs"), so markdown fences or prose
+    around the JSON are ignored. Each element is returned as soon as its
+    closing bracket arrives, and elements that parsed before a malformed or
+    truncated tail are kept.
+    """
+    def __init__(self, key: str):
+        self._start_re = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._buffer = ""
+        self._pos: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._element_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Adds a chunk of text and returns any elements completed by it."""
+        if self.done:
+            return []
+        self._buffer += chunk
+        if self._pos is None:
+            match = self._start_re.search(self._buffer)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        elements: List[Any] = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            c = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif c == "\\":
+                    self._escaped = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                if self._depth == 0:
+                    self._element_start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 0:
+                    # The closing bracket of the array itself.
+                    self.done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buffer[self._element_start:i + 1], elements)
+                    self._element_start = None
+            i += 1
+
+        # Keep only the unfinished element so the buffer stays small.
+        keep_from = i if self._element_start is None else self._element_start
+        self._buffer = buffer[keep_from:]
+        self._pos = i - keep_from
+        if self._element_start is not None:
+            self._element_start = 0
+        return elements
+
+    def _emit(self, text: str, elements: List[Any]):
+        try:
+            elements.append(json.loads(text))
+        except json.JSONDecodeError:
+            logger.warning("Skipping malformed element in streamed response")
+
+
+def iter_array_elements(chunks: Iterable[str], key: str) -> Iterator[Any]:
+    """
+    Yields the elements of the array under key as the chunks arrive.
+    The chunks are always consumed to the end, so the producer can finish up.
+    """
+    parser = IncrementalArrayParser(key)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
@@ -0,0 +1,32 @@
+import importlib
+from typing import Any, Optional
+
+
+class LazyImport:
+    """
+    Stands in for a module, or one attribute of it, and imports it on first use.
+    Keeps heavy SDKs out of CLI startup while call sites stay unchanged:
+    attribute access and calls are forwarded to the real object.
+    """
+    def __init__(self, module: str, attr: Optional[str] = None):
+        self._module = module
+        self._attr = attr
+        self._target: Any = None
+
+    def _resolve(self) -> Any:
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            self._target = getattr(target, self._attr) if self._attr else target
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__") or name in ("_module", "_attr", "_target"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        name = f"{self._module}.{self._attr}" if self._attr else self._module
+        return f"<lazy {name}>"
@@ -0,0 +1,154 @@
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional
+from pr_assistant.lazy import LazyImport
+from pr_assistant.unified_diff import split_file_patches
+
+# GitPython is imported on first use, like the GitHub SDK.
+git = LazyImport("git")
+
+# Local ref that PR heads are fetched into.
+PULL_REF_PREFIX = "refs/pr-assistant/pull/"
+
+# Commits and pushes run with the user's hooks and commit signing turned off,
+# under a fixed identity, so local git setup cannot break them.
+COMMIT_OPTIONS = (
+    "-c", "user.name=PR Assistant",
+    "-c", "user.email=pr-assistant@users.noreply.github.com",
+    "-c", "commit.gpgsign=false",
+)
+
+# git diff --name-status letters, mapped to the REST files API status.
+_STATUS = {"A": "added", "D": "removed", "M": "modified", "R": "renamed", "C": "copied", "T": "changed"}
+
+
+def _count_changes(patch: Optional[str]) -> Dict[str, int]:
+    """Counts added and removed lines in a patch that starts at its first hunk."""
+    additions = deletions = 0
+    for line in (patch or "").split("\n"):
+        if line.startswith("+"):
+            additions += 1
+        elif line.startswith("-"):
+            deletions += 1
+    return {"additions": additions, "deletions": deletions}
+
+
+class LocalRepo:
+    """
+    Commits and diffs through a local clone instead of the GitHub API.
+    Each commit is built in a temporary worktree, so PRs can be prepared in
+    parallel without touching the user's checkout, and each branch is
+    published with a single git push. Diffs come from git diff.
+    """
+    def __init__(self, path: str = ".", remote: str = "origin"):
+        self.repo = git.Repo(path, search_parent_directories=True)
+        # Keeps non-ASCII paths unquoted, so name-status and patch headers agree.
+        self.repo.git.set_persistent_git_options(c="core.quotepath=off")
+        self.remote = remote
+        # Worktree bookkeeping and fetches update shared files under .git.
+        self._lock = threading.Lock()
+
+    def fetch(self, *refspecs: str):
+        """Fetches refspecs from the remote in one round-trip."""
+        with self._lock:
+            self.repo.git.fetch(self.remote, *refspecs)
+
+    def base_sha(self, branch: str) -> str:
+        """Head SHA of the remote branch, fetched every time since others may push to it."""
+        ref = f"refs/remotes/{self.remote}/{branch}"
+        self.fetch(f"+refs/heads/{branch}:{ref}")
+        return self.repo.git.rev_parse(ref)
+
+    def commit_files(
+        self,
+        branch: str,
+        files: List[Dict[str, str]],
+        message: str,
+        source_branch: Optional[str] = None,
+    ) -> str:
+        """
+        Commits all files as a single commit and pushes it, returning its SHA.
+        With source_branch, branch is created from it; otherwise the existing
+        branch is extended. If the files change nothing, no commit is made and
+        the parent's SHA is returned.
+        """
+        parent = self.base_sha(source_branch or branch)
+        with tempfile.TemporaryDirectory(prefix="pr-assistant-") as tmp:
+            worktree = os.path.join(tmp, "worktree")
+            with self._lock:
+                self.repo.git.worktree("add", "--detach", worktree, parent)
+            try:
+                tree = git.Repo(worktree)
+                root = os.path.realpath(worktree)
+                for f in files:
+                    path = os.path.realpath(os.path.join(root, f["path"]))
+                    if not path.startswith(root + os.sep):
+                        raise ValueError(f"Refusing to write outside the repository: {f['path']}")
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "w", encoding="utf-8") as out:
+                        out.write(f["content"])
+                if files:
+                    tree.git.add("--", *[f["path"] for f in files])
+                if tree.is_dirty(index=True, working_tree=False):
+                    tree.git.execute(["git", *COMMIT_OPTIONS, "commit", "--no-verify", "-q", "-m", message])
+                sha = tree.head.commit.hexsha
+            finally:
+                with self._lock:
+                    self.repo.git.worktree("remove", "--force", worktree)
+        # An unchanged existing branch is already where it should be.
+        if sha != parent or source_branch:
+            self.repo.git.push("--no-verify", self.remote, f"{sha}:refs/heads/{branch}")
+        return sha
+
+    def _resolve(self, ref: str) -> Optional[str]:
+        try:
+            return self.repo.git.rev_parse("--verify", "--quiet", f"{ref}^{{commit}}")
+        except git.GitCommandError:
+            return None
+
+    def fetch_pull(self, pr_number: int, base_branch: str, head_sha: Optional[str] = None):
+        """
+        Fetches a PR's head and its base branch in one round-trip. Unlike
+        fetch, this runs every time, since both move as the PR is updated;
+        only a known head_sha that is already fetched skips it.
+        """
+        ref = f"{PULL_REF_PREFIX}{pr_number}"
+        if head_sha and self._resolve(ref) == head_sha:
+            return
+        with self._lock:
+            self.repo.git.fetch(
+                self.remote,
+                f"+refs/pull/{pr_number}/head:{ref}",
+                f"+refs/heads/{base_branch}:refs/remotes/{self.remote}/{base_branch}",
+            )
+
+    def diff_files(self, base: str, head: str) -> List[dict]:
+        """Lists changed files between base and head in the shape of GitHubClient.get_pr_files."""
+        names = self.repo.git.diff("--name-status", "-M", f"{base}...{head}")
+        patches = split_file_patches(self.repo.git.diff("-M", f"{base}...{head}"))
+        files = []
+        for line in names.splitlines():
+            fields = line.split("\t")
+            path = fields[-1]
+            patch = patches.get(path)
+            files.append(dict(
+                filename=path,
+                status=_STATUS.get(fields[0][0], "modified"),
+                **_count_changes(patch),
+                patch=patch,
+            ))
+        return files
+
+    def pr_files(self, pr_number: int, base_branch: str, head_sha: Optional[str] = None) -> List[dict]:
+        """A PR's changed files, diffed against the merge base like GitHub does."""
+        self.fetch_pull(pr_number, base_branch, head_sha)
+        return self.diff_files(f"refs/remotes/{self.remote}/{base_branch}", f"{PULL_REF_PREFIX}{pr_number}")
+
+    def compare_files(self, base_sha: str, head_sha: str) -> Optional[List[dict]]:
+        """Files changed from base_sha to head_sha, or None if base_sha is not an ancestor (e.g. after a force-push)."""
+        try:
+            self.repo.git.merge_base("--is-ancestor", base_sha, head_sha)
+        except git.GitCommandError:
+            return None
+        return self.diff_files(base_sha, head_sha)
@@ -1,15 +1,36 @@
+import json
+import os
 import typer
+from datetime import datetime
+from pathlib import Path
 from rich.console import Console
+from rich.live import Live
 from rich.table import Table
-from typing import Optional
+from typing import List, Optional
 from dataclasses import dataclass
 
 from pr_assistant.config import ConfigManager
 from pr_assistant.rate_limiter import RateLimiter
 from pr_assistant.agent import Agent
 from pr_assistant.github_client import GitHubClient
+from pr_assistant.local_repo import LocalRepo
+from pr_assistant.jobs import DONE, FAILED, PENDING, RUNNING, JobQueue, JobRunner
+from pr_assistant.pipeline import PRPipeline
+from pr_assistant.review import BatchReviewer, review_and_post, run_review_job
+from pr_assistant.cache import DEFAULT_TTL_SECONDS
+from pr_assistant.triage import (
+    Triager,
+    default_score_cache,
+    result_row,
+    DEFAULT_BATCH_TOKENS,
+    DEFAULT_PR_TOKENS,
+)
+from pr_assistant.lazy import LazyImport
 from pr_assistant.logger import setup_logging, get_logger
 
+# asyncio and urllib are only needed by `serve` and `replay-webhook`.
+webhook = LazyImport("pr_assistant.webhook")
+
 # Setup logger
 logger = get_logger(__name__)
 
@@ -87,7 +108,14 @@ def init(ctx: typer.Context):
 def create(
     ctx: typer.Context,
     count: int = typer.Argument(1, help="Number of PRs to create"),
-    instruction: str = typer.Option("Improve code quality", help="High-level instruction for the agent")
+    instruction: str = typer.Option("Improve code quality", help="High-level instruction for the agent"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always call the model, bypassing the response cache"),
+    concurrency: int = typer.Option(4, help="Number of PRs to create in parallel"),
+    retries: int = typer.Option(3, help="Retries per GitHub step on transient failures"),
+    base: Optional[str] = typer.Option(None, help="Branch to base the PRs on (default: the repository's default branch)"),
+    report: Optional[Path] = typer.Option(None, help="Write a JSON report of per-PR results to this file"),
+    stream: bool = typer.Option(False, help="Stream the model response and start creating each PR as soon as it is parsed"),
+    local: bool = typer.Option(False, "--local", help="Commit in the local git clone and push each branch instead of using the GitHub API")
 ):
     """
     Create X number of PRs based on agent analysis.
@@ -97,64 +125,86 @@ def create(
     
     try:
         # Initialize services with config from context
-        agent = Agent(ctx.obj.config)
-        gh_client = GitHubClient(ctx.obj.config)
+        agent = Agent(ctx.obj.config, use_cache=not no_cache)
+        gh_client = GitHubClient(ctx.obj.config, local_repo=LocalRepo() if local else None)
         
-        prs = agent.propose_prs(instruction, count)
-        
-        if not prs:
+        prs = agent.stream_prs(instruction, count) if stream else agent.propose_prs(instruction, count)
+
+        def announce(prs):
+            for pr_data in prs:
+                console.print(f"Preparing PR: [bold]{pr_data.get('title')}[/bold]")
+                yield pr_data
+
+        def on_result(result):
+            if result.status == "created":
+                console.print(f"[green]PR Created: {result.url}[/green]")
+            else:
+                console.print(f"[red]Failed to create PR {result.branch}: {result.error}[/red]")
+
+        pipeline = PRPipeline(
+            gh_client, concurrency=concurrency, max_attempts=retries + 1, base_branch=base, job_queue=JobQueue(),
+            job_options={"local": local},
+        )
+        results = pipeline.run(announce(prs), on_result=on_result)
+
+        if not results:
             console.print("[yellow]No PRs proposed by the agent.[/yellow]")
             return
+        _print_pr_results(console, results)
 
-        for pr_data in prs:
-            title = pr_data.get("title")
-            body = pr_data.get("body")
-            branch = pr_data.get("branch")
-            files = pr_data.get("files", [])
-
-            console.print(f"Preparing PR: [bold]{title}[/bold]")
-            logger.info(f"Creating branch: {branch}")
-            
-            try:
-                gh_client.create_branch(branch)
-            except Exception as e:
-                logger.error(f"Failed to create branch {branch}: {e}")
-                console.print(f"[red]Failed to create branch {branch}: {e}[/red]")
-                continue
-
-            for file_change in files:
-                path = file_change.get("path")
-                content = file_change.get("content")
-                gh_client.create_file(path, f"feat: {title}", content, branch)
-            
-            url = gh_client.create_pr(title, body, branch)
-            console.print(f"[green]PR Created: {url}[/green]")
+        if report:
+            report.write_text(json.dumps([r.to_dict() for r in results], indent=2))
+            console.print(f"Report written to {report}")
 
     except Exception as e:
         logger.exception("Error in create command")
         console.print(f"[bold red]Error:[/bold red] {e}")
 
+def _print_pr_results(console: Console, results):
+    table = Table(title="PR Creation Results")
+    table.add_column("Branch", style="cyan")
+    table.add_column("Status")
+    table.add_column("Attempts", justify="right")
+    table.add_column("Time", justify="right")
+    table.add_column("URL / Error", style="blue")
+
+    for r in results:
+        status = "[green]created[/green]" if r.status == "created" else f"[red]{r.status}[/red]"
+        table.add_row(r.branch, status, str(r.attempts), f"{r.duration:.1f}s", r.url or r.error or "")
+    console.print(table)
+
 @app.command()
-def list_prs(ctx: typer.Context, state: str = "open"):
+def list_prs(
+    ctx: typer.Context,
+    state: str = "open",
+    limit: Optional[int] = typer.Option(None, help="Show at most this many PRs"),
+    since: Optional[datetime] = typer.Option(None, help="Only show PRs created on or after this date (UTC)"),
+    as_json: bool = typer.Option(False, "--json", help="Print one JSON object per PR instead of a table"),
+):
     """
     List active PRs with details.
     """
     console = ctx.obj.console
-    console.print(f"[bold blue]Listing {state} PRs...[/bold blue]")
     try:
         gh_client = GitHubClient(ctx.obj.config)
-        prs = gh_client.list_prs(state)
-        
+        prs = gh_client.iter_prs(state, since=since, limit=limit)
+
+        if as_json:
+            for pr in prs:
+                typer.echo(json.dumps(pr))
+            return
+
+        console.print(f"[bold blue]Listing {state} PRs...[/bold blue]")
         table = Table(title="Active Pull Requests")
         table.add_column("Number", style="cyan")
         table.add_column("Title", style="magenta")
         table.add_column("Author", style="green")
         table.add_column("URL", style="blue")
 
-        for pr in prs:
-            table.add_row(str(pr["number"]), pr["title"], pr["user"], pr["url"])
-        
-        console.print(table)
+        # Rows appear as each page arrives instead of after the last one.
+        with Live(table, console=console, refresh_per_second=8):
+            for pr in prs:
+                table.add_row(str(pr["number"]), pr["title"], pr["user"], pr["url"])
 
     except Exception as e:
         logger.exception("Error listing PRs")
@@ -164,7 +214,12 @@ def list_prs(ctx: typer.Context, state: str = "open"):
 def review_pr(
     ctx: typer.Context,
     pr_number: int = typer.Argument(..., help="PR Number to review"),
-    persona: str = typer.Option("Senior Software Engineer", help="Persona to adopt for the review")
+    persona: str = typer.Option("Senior Software Engineer", help="Persona to adopt for the review"),
+    concurrency: int = typer.Option(4, help="Maximum number of diff chunks reviewed at once for large PRs"),
+    full: bool = typer.Option(False, "--full", help="Review the whole diff even if an earlier review exists"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always call the model, bypassing the response cache"),
+    local: bool = typer.Option(False, "--local", help="Compute the diff with git in the local clone instead of the GitHub API"),
+    retries: int = typer.Option(3, help="Retries on transient failures; each resumes at the step that failed")
 ):
     """
     Review a specific PR using AI.
@@ -173,27 +228,343 @@ def review_pr(
     console.print(f"[bold blue]Reviewing PR #{pr_number} as {persona}...[/bold blue]")
     
     try:
-        agent = Agent(ctx.obj.config)
-        gh_client = GitHubClient(ctx.obj.config)
+        agent = Agent(ctx.obj.config, use_cache=not no_cache)
+        gh_client = GitHubClient(ctx.obj.config, local_repo=LocalRepo() if local else None)
+        queue = JobQueue()
+        job = queue.enqueue(
+            "review",
+            {"pr_number": pr_number, "persona": persona, "incremental": not full,
+             "local": local, "no_cache": no_cache, "concurrency": concurrency},
+            key=f"review:{gh_client.repo_name}:{pr_number}:{persona}",
+            repo=gh_client.repo_name,
+            rerun_done=True,
+        )
+        runner = JobRunner(
+            queue, {"review": lambda job_ctx: run_review_job(agent, gh_client, job_ctx)},
+            max_attempts=retries + 1,
+        )
         
-        with console.status("Fetching PR details..."):
-            pr_details = gh_client.get_pr_details(pr_number)
-            diff = gh_client.get_pr_diff(pr_number)
+        with console.status("Fetching and analyzing code changes..."):
+            finished = runner.run_job(job.id)
+        # The job was just enqueued, so it exists.
+        assert finished is not None
+        job = finished
         
-        console.print(f"Title: [bold]{pr_details['title']}[/bold]")
+        if job.state == RUNNING:
+            console.print(f"[yellow]PR #{pr_number} is being reviewed by another process (job {job.id}).[/yellow]")
+            return
+        if job.state != DONE:
+            console.print(f"[bold red]Error:[/bold red] {job.error}")
+            console.print(f"Job {job.id} failed; run `pr-assistant jobs --resume` to retry from the failed step.")
+            return
         
-        with console.status("Analyzing code changes..."):
-            review = agent.review_pr(pr_details, diff, persona)
+        result = job.result
+        console.print(f"Title: [bold]{result['title']}[/bold]")
+        if result["status"] == "up to date":
+            console.print(f"[yellow]Already reviewed at {result['head_sha'][:7]}; no new commits to review.[/yellow]")
+            return
+        if result["base_sha"]:
+            console.print(f"Reviewing changes since {result['base_sha'][:7]}...")
         
         console.print(f"[bold green]Review Generated![/bold green]")
-        console.print(review)
+        console.print(result["review"])
         
-        gh_client.post_comment(pr_number, f"## AI Review ({persona})\n\n{review}")
-        console.print("[green]Review posted successfully![/green]")
+        if result["status"] == "updated":
+            console.print("[green]Review comment updated successfully![/green]")
+        else:
+            console.print("[green]Review posted successfully![/green]")
 
     except Exception as e:
         logger.exception("Error reviewing PR")
         console.print(f"[bold red]Error:[/bold red] {e}")
 
+@app.command()
+def review_batch(
+    ctx: typer.Context,
+    pr_numbers: Optional[List[int]] = typer.Argument(None, help="PR numbers to review (default: all PRs matching the filters)"),
+    state: str = typer.Option("open", help="PR state to select when no numbers are given"),
+    author: Optional[str] = typer.Option(None, help="Only review PRs opened by this user"),
+    label: Optional[str] = typer.Option(None, help="Only review PRs with this label"),
+    limit: Optional[int] = typer.Option(None, help="Review at most this many PRs"),
+    persona: str = typer.Option("Senior Software Engineer", help="Persona to adopt for the review"),
+    concurrency: int = typer.Option(4, help="Maximum number of concurrent model calls"),
+    fetch_workers: int = typer.Option(8, help="Number of concurrent GitHub fetches"),
+    dry_run: bool = typer.Option(False, help="Generate reviews without posting comments"),
+    full: bool = typer.Option(False, "--full", help="Review whole diffs even if earlier reviews exist"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always call the model, bypassing the response cache"),
+    local: bool = typer.Option(False, "--local", help="Compute diffs with git in the local clone instead of the GitHub API")
+):
+    """
+    Review many PRs concurrently.
+    """
+    console = ctx.obj.console
+    
+    try:
+        agent = Agent(ctx.obj.config, use_cache=not no_cache)
+        gh_client = GitHubClient(ctx.obj.config, local_repo=LocalRepo() if local else None)
+        
+        if not pr_numbers:
+            with console.status(f"Listing {state} PRs..."):
+                prs = gh_client.list_prs(state)
+            pr_numbers = [
+                pr["number"] for pr in prs
+                if (not author or pr["user"] == author) and (not label or label in pr.get("labels", []))
+            ]
+        if limit:
+            pr_numbers = pr_numbers[:limit]
+        if not pr_numbers:
+            console.print("[yellow]No PRs to review.[/yellow]")
+            return
+
+        console.print(f"[bold blue]Reviewing {len(pr_numbers)} PRs as {persona} (concurrency {concurrency})...[/bold blue]")
+
+        def report(result):
+            if result.status == "failed":
+                console.print(f"[red]PR #{result.pr_number} failed: {result.error}[/red]")
+            else:
+                console.print(f"[green]PR #{result.pr_number} {result.status}[/green] {result.title} ({result.duration:.1f}s)")
+
+        reviewer = BatchReviewer(
+            agent, gh_client, persona,
+            fetch_workers=fetch_workers, model_concurrency=concurrency, post_comments=not dry_run,
+            incremental=not full,
+        )
+        summary = reviewer.run(pr_numbers, on_result=report)
+
+        console.print(
+            f"[bold]Reviewed {len(summary.results)} PRs in {summary.elapsed:.1f}s "
+            f"({summary.per_minute:.1f} PRs/min): {len(summary.results) - summary.failed} succeeded, "
+            f"{summary.failed} failed.[/bold]"
+        )
+
+    except Exception as e:
+        logger.exception("Error in batch review")
+        console.print(f"[bold red]Error:[/bold red] {e}")
+
+@app.command()
+def triage(
+    ctx: typer.Context,
+    state: str = typer.Option("open", help="PR state to triage"),
+    limit: Optional[int] = typer.Option(None, help="Triage at most this many PRs, newest first"),
+    concurrency: int = typer.Option(4, help="Maximum number of concurrent model calls"),
+    fetch_workers: int = typer.Option(8, help="Number of concurrent GitHub fetches"),
+    as_json: bool = typer.Option(False, "--json", help="Print one JSON object per PR instead of a table"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Score every PR again, ignoring cached scores")
+):
+    """
+    Rank PRs by how urgently they need a review.
+    """
+    console = ctx.obj.console
+
+    try:
+        config = ctx.obj.config
+        agent = Agent(config, use_cache=not no_cache)
+        gh_client = GitHubClient(config)
+        score_cache = None
+        if not no_cache:
+            score_cache = default_score_cache(float(config.get("cache_ttl_seconds", DEFAULT_TTL_SECONDS)))
+
+        with console.status(f"Listing {state} PRs..."):
+            prs = list(gh_client.iter_prs(state, limit=limit))
+        if not prs:
+            console.print("[yellow]No PRs to triage.[/yellow]")
+            return
+
+        triager = Triager(
+            agent, gh_client, score_cache,
+            batch_tokens=int(config.get("triage_batch_tokens", DEFAULT_BATCH_TOKENS)),
+            pr_tokens=int(config.get("triage_pr_tokens", DEFAULT_PR_TOKENS)),
+            fetch_workers=fetch_workers, model_concurrency=concurrency,
+        )
+        with console.status(f"Scoring {len(prs)} PRs..."):
+            summary = triager.run(prs)
+
+        if as_json:
+            for result in summary.results:
+                typer.echo(json.dumps(result_row(result)))
+            return
+
+        table = Table(title="PR Triage")
+        table.add_column("Score", justify="right", style="bold")
+        table.add_column("Number", style="cyan")
+        table.add_column("Title", style="magenta")
+        table.add_column("Author", style="green")
+        table.add_column("Summary")
+        for r in summary.results:
+            score = str(r.focus_score) if r.focus_score is not None else "-"
+            table.add_row(score, str(r.number), r.title, r.user or "", r.summary or f"[red]{r.error or ''}[/red]")
+        console.print(table)
+        console.print(
+            f"[bold]Triaged {len(summary.results)} PRs in {summary.elapsed:.1f}s with {summary.model_calls} model calls "
+            f"({summary.cached} cached, {summary.failed} failed).[/bold]"
+        )
+
+    except Exception as e:
+        logger.exception("Error in triage")
+        console.print(f"[bold red]Error:[/bold red] {e}")
+
+def _job_target(job) -> str:
+    if job.kind == "create":
+        return job.payload.get("branch", "")
+    return f"PR #{job.payload.get('pr_number')}"
+
+@app.command()
+def jobs(
+    ctx: typer.Context,
+    resume: bool = typer.Option(False, "--resume", help="Run pending, interrupted and failed jobs of this repository"),
+    workers: int = typer.Option(4, help="Number of jobs resumed at once"),
+    retries: int = typer.Option(3, help="Retries per job on transient failures"),
+    limit: int = typer.Option(20, help="Number of recent jobs to list")
+):
+    """
+    List queued create and review jobs, or resume unfinished ones.
+    """
+    console = ctx.obj.console
+
+    try:
+        config = ctx.obj.config
+        queue = JobQueue()
+        repo_name = config.get("repo_name")
+
+        if resume:
+            gh_client = GitHubClient(config)
+            retried = queue.retry_failed(gh_client.repo_name)
+            pending = queue.list_jobs(gh_client.repo_name, states=[PENDING, RUNNING], limit=10_000)
+            if not pending:
+                console.print("[yellow]No unfinished jobs.[/yellow]")
+                return
+            # Each job runs with the --local and --no-cache settings it was started with.
+            clients = {False: gh_client}
+            for local in {bool(job.payload.get("local")) for job in pending} - {False}:
+                clients[local] = GitHubClient(config, local_repo=LocalRepo())
+            agents = {
+                no_cache: Agent(config, use_cache=not no_cache)
+                for no_cache in {bool(job.payload.get("no_cache")) for job in pending if job.kind == "review"}
+            }
+            handlers = {
+                "create": lambda job_ctx: PRPipeline(clients[bool(job_ctx.payload.get("local"))]).run_job(job_ctx),
+                "review": lambda job_ctx: run_review_job(
+                    agents[bool(job_ctx.payload.get("no_cache"))], clients[bool(job_ctx.payload.get("local"))], job_ctx
+                ),
+            }
+            runner = JobRunner(queue, handlers, max_attempts=retries + 1)
+            console.print(f"[bold blue]Resuming {len(pending)} jobs ({retried} previously failed)...[/bold blue]")
+            # Oldest first, so the queue drains in the order the work was requested.
+            results = runner.run([job.id for job in reversed(pending)], workers=workers)
+            for job in results:
+                if job is None:
+                    continue
+                if job.state == DONE:
+                    outcome = (job.result or {}).get("url") or (job.result or {}).get("status", "")
+                    console.print(f"[green]Job {job.id} ({job.kind} {_job_target(job)}) done[/green] {outcome}")
+                elif job.state == RUNNING:
+                    console.print(f"[yellow]Job {job.id} ({job.kind} {_job_target(job)}) is running in another process[/yellow]")
+                else:
+                    console.print(f"[red]Job {job.id} ({job.kind} {_job_target(job)}) failed: {job.error}[/red]")
+            return
+
+        recent = queue.list_jobs(repo_name, limit=limit)
+        if not recent:
+            console.print("[yellow]No jobs recorded.[/yellow]")
+            return
+        table = Table(title="Jobs")
+        table.add_column("ID", justify="right", style="cyan")
+        table.add_column("Kind")
+        table.add_column("Target", style="magenta")
+        table.add_column("State")
+        table.add_column("Attempts", justify="right")
+        table.add_column("Steps done")
+        table.add_column("Updated", style="blue")
+        table.add_column("Error", style="red")
+        colors = {DONE: "green", FAILED: "red", RUNNING: "yellow", PENDING: "white"}
+        for job in recent:
+            steps = [name for name, state in queue.steps(job.id).items() if state == DONE]
+            table.add_row(
+                str(job.id), job.kind, _job_target(job), f"[{colors[job.state]}]{job.state}[/{colors[job.state]}]",
+                str(job.attempts), ", ".join(steps), datetime.fromtimestamp(job.updated_at).strftime("%Y-%m-%d %H:%M"),
+                job.error if job.state != DONE else "",
+            )
+        console.print(table)
+
+    except Exception as e:
+        logger.exception("Error in jobs command")
+        console.print(f"[bold red]Error:[/bold red] {e}")
+
+def _webhook_secret(config: ConfigManager) -> Optional[str]:
+    return config.get("webhook_secret") or os.environ.get("GITHUB_WEBHOOK_SECRET")
+
+@app.command()
+def serve(
+    ctx: typer.Context,
+    host: str = typer.Option("127.0.0.1", help="Interface to listen on"),
+    port: int = typer.Option(8080, help="Port to listen on"),
+    path: str = typer.Option("/webhook", help="URL path GitHub delivers webhooks to"),
+    workers: int = typer.Option(4, help="Number of PRs reviewed at once"),
+    queue_size: int = typer.Option(100, help="Reviews that may wait for a worker before deliveries are refused"),
+    persona: str = typer.Option("Senior Software Engineer", help="Persona to adopt for the reviews"),
+    full: bool = typer.Option(False, "--full", help="Review whole diffs even if earlier reviews exist"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always call the model, bypassing the response cache"),
+    local: bool = typer.Option(False, "--local", help="Compute diffs with git in the local clone instead of the GitHub API")
+):
+    """
+    Review PRs as GitHub reports them, by serving a pull_request webhook.
+    """
+    console = ctx.obj.console
+
+    try:
+        config = ctx.obj.config
+        secret = _webhook_secret(config)
+        if not secret:
+            console.print("[bold red]Error:[/bold red] Set GITHUB_WEBHOOK_SECRET or the webhook_secret config key.")
+            return
+        # Created once; every event reuses the configured model and repository.
+        agent = Agent(config, use_cache=not no_cache)
+        gh_client = GitHubClient(config, local_repo=LocalRepo() if local else None)
+
+        def review(pr_number: int) -> str:
+            return review_and_post(agent, gh_client, pr_number, persona, incremental=not full, concurrency=1)
+
+        server = webhook.WebhookServer(review, secret, gh_client.repo_name, workers=workers, queue_size=queue_size, path=path)
+
+        def on_start():
+            console.print(f"[bold blue]Reviewing PRs of {gh_client.repo_name} from webhooks on http://{host}:{server.port}{path}[/bold blue]")
+
+        try:
+            server.run(host, port, on_start=on_start)
+        except KeyboardInterrupt:
+            stats = server.stats
+            console.print(
+                f"[bold]Stopped after {stats.received} deliveries: {stats.reviewed} reviewed, {stats.failed} failed, "
+                f"{stats.duplicates} duplicates.[/bold]"
+            )
+
+    except Exception as e:
+        logger.exception("Error in webhook server")
+        console.print(f"[bold red]Error:[/bold red] {e}")
+
+@app.command("replay-webhook")
+def replay_webhook_command(
+    ctx: typer.Context,
+    payload: Path = typer.Argument(..., help="JSON payload of a recorded delivery"),
+    url: str = typer.Option("http://127.0.0.1:8080/webhook", help="Webhook URL of a running `serve`"),
+    event: str = typer.Option("pull_request", help="Value of the X-GitHub-Event header"),
+    delivery: Optional[str] = typer.Option(None, help="Delivery ID to send (default: a new one); reuse one to test deduplication"),
+):
+    """
+    Send a recorded webhook payload to a local `serve`, signed like GitHub does.
+    """
+    console = ctx.obj.console
+    secret = _webhook_secret(ctx.obj.config)
+    if not secret:
+        console.print("[bold red]Error:[/bold red] Set GITHUB_WEBHOOK_SECRET or the webhook_secret config key.")
+        return
+    try:
+        status, response = webhook.replay_webhook(url, payload.read_bytes(), secret, event, delivery)
+        color = "green" if status < 300 else "red"
+        console.print(f"[{color}]{status}[/{color}] {response.get('status', '')}")
+    except Exception as e:
+        logger.exception("Error replaying webhook")
+        console.print(f"[bold red]Error:[/bold red] {e}")
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,177 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from pr_assistant.jobs import DONE, RUNNING, JobContext, JobQueue, JobRunner
+from pr_assistant.logger import get_logger
+from pr_assistant.rate_limiter import retry_after_seconds
+from pr_assistant.retry import retry_call
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class PRResult:
+    title: str
+    branch: str
+    status: str = "pending"
+    url: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    duration: float = 0.0
+    job_id: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class PRPipeline:
+    """
+    Creates proposed PRs concurrently.
+    Each PR runs its steps (commit files onto a new branch, open the PR) in
+    order, with independent PRs in parallel up to the concurrency cap.
+    Transient GitHub failures are retried with backoff per step, waiting
+    exactly as long as GitHub asks when it sends Retry-After.
+    With a job_queue, each PR is a durable job keyed by its branch: its
+    steps are recorded as they finish, so a PR that is created again after
+    a failure or a crash resumes where it stopped instead of starting over.
+    """
+    def __init__(
+        self,
+        gh_client,
+        concurrency: int = 4,
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        base_branch: Optional[str] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        job_queue: Optional[JobQueue] = None,
+        job_options: Optional[Dict[str, Any]] = None,
+    ):
+        self.gh_client = gh_client
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        # None means the repository's default branch, detected by the client.
+        self.base_branch = base_branch
+        self.sleep = sleep
+        self.job_queue = job_queue
+        # Stored in each job's payload, e.g. {"local": True}, so a resumed job is set up the same way.
+        self.job_options = job_options or {}
+        self.runner = None
+        if job_queue is not None:
+            self.runner = JobRunner(
+                job_queue, {"create": self.run_job}, max_attempts=max_attempts, base_delay=base_delay, sleep=sleep
+            )
+
+    def _step(self, result: PRResult, name: str, fn: Callable[[], Any]) -> Any:
+        def attempt():
+            result.attempts += 1
+            return fn()
+
+        def on_retry(attempt_number: int, error: BaseException, delay: float):
+            logger.warning(f"{name} for {result.branch} failed ({error}); retrying in {delay:.1f}s")
+
+        return retry_call(
+            attempt,
+            max_attempts=self.max_attempts,
+            base_delay=self.base_delay,
+            on_retry=on_retry,
+            sleep=self.sleep,
+            retry_after=retry_after_seconds,
+        )
+
+    def _commit(self, branch: str, files: List[Dict[str, str]], message: str, base: str, resumed: bool = False) -> str:
+        if resumed:
+            # The last attempt may have pushed the commit before it was interrupted.
+            sha = self.gh_client.find_branch_commit(branch, message)
+            if sha:
+                return sha
+        return self.gh_client.commit_files(branch, files, message, source_branch=base)
+
+    def _open_pr(self, title: str, body: str, branch: str, base: str, resumed: bool = False) -> str:
+        if resumed:
+            url = self.gh_client.find_pr(branch)
+            if url:
+                return url
+        return self.gh_client.create_pr(title, body, branch, base=base)
+
+    def run_job(self, ctx: JobContext) -> Dict[str, Any]:
+        """Handler for queued create jobs; retries are left to the job runner."""
+        p = ctx.payload
+        message = f"feat: {p['title']}"
+        sha = ctx.step("commit", lambda resumed: self._commit(p["branch"], p["files"], message, p["base"], resumed))
+        url = ctx.step("open PR", lambda resumed: self._open_pr(p["title"], p["body"], p["branch"], p["base"], resumed))
+        return {"sha": sha, "url": url}
+
+    def _create_queued(self, result: PRResult, pr_data: Dict[str, Any], base: str):
+        assert self.job_queue is not None and self.runner is not None
+        repo_name = self.gh_client.repo_name
+        job = self.job_queue.enqueue(
+            "create",
+            {"title": result.title, "body": pr_data.get("body"), "branch": result.branch,
+             "files": pr_data.get("files", []), "base": base, **self.job_options},
+            key=f"create:{repo_name}:{result.branch}",
+            repo=repo_name,
+        )
+        if job.state == DONE:
+            # The branch and its PR come from an earlier run; this one would create nothing.
+            raise RuntimeError(f"branch {result.branch} was already used by job {job.id}: {job.result['url']}")
+        finished = self.runner.run_job(job.id)
+        if finished is None:
+            raise RuntimeError(f"job {job.id} was removed while it ran")
+        job = finished
+        result.job_id = job.id
+        result.attempts = job.attempts
+        if job.state == DONE:
+            result.url = job.result["url"]
+            result.status = "created"
+        elif job.state == RUNNING:
+            raise RuntimeError(f"job {job.id} is being run by another process")
+        else:
+            raise RuntimeError(job.error or f"job {job.id} is {job.state}")
+
+    def create_one(self, pr_data: Dict[str, Any]) -> PRResult:
+        title = pr_data.get("title") or ""
+        body = pr_data.get("body") or ""
+        branch = pr_data.get("branch") or ""
+        files = pr_data.get("files", [])
+        result = PRResult(title=title, branch=branch)
+        started = time.perf_counter()
+        try:
+            base = self.base_branch or self.gh_client.default_branch
+            if self.job_queue is not None:
+                self._create_queued(result, pr_data, base)
+            else:
+                self._step(result, "commit", lambda: self._commit(branch, files, f"feat: {title}", base))
+                result.url = self._step(result, "open PR", lambda: self._open_pr(title, body, branch, base))
+                result.status = "created"
+        except Exception as e:
+            logger.error(f"Failed to create PR {branch}: {e}")
+            result.status = "failed"
+            result.error = str(e)
+        result.duration = time.perf_counter() - started
+        return result
+
+    def run(
+        self,
+        prs: Iterable[Dict[str, Any]],
+        on_result: Optional[Callable[[PRResult], None]] = None,
+    ) -> List[PRResult]:
+        """
+        Creates every PR and returns results in input order.
+        prs may be a generator; each PR is submitted as soon as it is produced.
+        on_result is called as each PR finishes, serialized across threads.
+        """
+        lock = threading.Lock()
+
+        def job(pr_data: Dict[str, Any]) -> PRResult:
+            result = self.create_one(pr_data)
+            if on_result:
+                with lock:
+                    on_result(result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(job, pr_data) for pr_data in prs]
+        return [f.result() for f in futures]
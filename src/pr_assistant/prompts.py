@@ -27,16 +27,22 @@ Output your response in JSON format with the following structure:
 }
 """
 
+# Filled in with str.format, so literal JSON braces are doubled.
 PR_ANALYSIS_PROMPT = """
-Analyze the following PR and provide a summary and a "focus score" (1-10) indicating how urgent/important it is for the user to review.
-PR Title: {title}
-PR Body: {body}
-Diff: {diff}
+Analyze each of the following {count} PRs and provide a summary and a "focus score" (1-10) indicating how urgent/important it is for the user to review.
+Score each PR on its own merits; do not compare PRs with each other.
 
-Output JSON:
-{
-    "summary": "One sentence summary",
-    "focus_score": 8,
-    "reason": "Why this score?"
-}
+{prs}
+
+Output JSON with one entry per PR, using the PR number shown in its heading:
+{{
+    "results": [
+        {{
+            "number": 12,
+            "summary": "One sentence summary",
+            "focus_score": 8,
+            "reason": "Why this score?"
+        }}
+    ]
+}}
 """
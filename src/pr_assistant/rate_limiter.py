@@ -1,56 +1,254 @@
+import os
+import re
 import time
 import json
+import sqlite3
+import threading
 from pathlib import Path
-from typing import Dict
-from datetime import datetime, timedelta
+from typing import Callable, Dict, Mapping, Optional
+from pr_assistant.logger import get_logger
+
+logger = get_logger(__name__)
+
+WINDOW_SECONDS = 3600
+
+# Default per-backend quotas; each can be overridden in config.
+DEFAULT_GEMINI_REQUESTS_PER_MINUTE = 15
+DEFAULT_GEMINI_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_GITHUB_REQUESTS_PER_HOUR = 5000
+
+# Gemini reports its retry delay in the error text rather than a header.
+_RETRY_IN_RE = re.compile(r"retry in ([\d.]+)s|retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
 
 class RateLimiter:
     """
     Simple client-side rate limiter to prevent abuse.
-    Tracks usage in a local JSON file.
+    Tracks usage in a local SQLite database in WAL mode. Every check runs in a
+    BEGIN IMMEDIATE transaction, which takes the database write lock, so
+    concurrent threads and processes never lose or double-count a request.
     """
-    def __init__(self, max_requests_per_hour: int = 50):
+    def __init__(self, max_requests_per_hour: int = 50, storage_path: Optional[Path] = None):
         self.max_requests = max_requests_per_hour
-        self.storage_path = Path.home() / ".pr_assistant" / "usage.json"
+        self.storage_path = Path(storage_path) if storage_path else Path.home() / ".pr_assistant" / "usage.db"
+        self._local = threading.local()
         self._ensure_storage()
 
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # SQLite connections must not cross a fork, so each process opens its own.
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.storage_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
     def _ensure_storage(self):
         if not self.storage_path.parent.exists():
             self.storage_path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.storage_path.exists():
-            self._save_usage({})
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS requests (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS requests_ts ON requests (ts)")
+        self._migrate_json_usage()
 
-    def _load_usage(self) -> Dict[str, float]:
+    def _migrate_json_usage(self):
+        """Imports the usage.json file written by earlier versions, then removes it."""
+        legacy_path = self.storage_path.with_name("usage.json")
+        if not legacy_path.exists():
+            return
         try:
-            with open(self.storage_path, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {}
-
-    def _save_usage(self, usage: Dict[str, float]):
-        with open(self.storage_path, 'w') as f:
-            json.dump(usage, f)
+            with open(legacy_path, 'r') as f:
+                usage = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            usage = {}
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT INTO requests (ts) VALUES (?)", [(float(ts),) for ts in usage.values()])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        legacy_path.unlink(missing_ok=True)
 
-    def _cleanup_old_requests(self, usage: Dict[str, float]) -> Dict[str, float]:
-        cutoff = time.time() - 3600
-        return {k: v for k, v in usage.items() if v > cutoff}
+    def _load_usage(self) -> Dict[str, float]:
+        rows = self._connect().execute("SELECT id, ts FROM requests").fetchall()
+        return {str(row_id): ts for row_id, ts in rows}
 
     def check_limit(self) -> bool:
         """
         Returns True if request is allowed, False otherwise.
         """
-        usage = self._load_usage()
-        usage = self._cleanup_old_requests(usage)
-        
-        if len(usage) >= self.max_requests:
-            return False
-        
-        request_id = str(time.time())
-        usage[request_id] = time.time()
-        self._save_usage(usage)
-        return True
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired rows are deleted as we go, so the table never holds more
+            # than max_requests rows and the count below stays constant-time.
+            conn.execute("DELETE FROM requests WHERE ts <= ?", (now - WINDOW_SECONDS,))
+            (count,) = conn.execute("SELECT COUNT(*) FROM requests").fetchone()
+            allowed = count < self.max_requests
+            if allowed:
+                conn.execute("INSERT INTO requests (ts) VALUES (?)", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def wait_time(self) -> float:
+        """Seconds until the oldest request in the window expires and frees a slot."""
+        (oldest,) = self._connect().execute("SELECT MIN(ts) FROM requests").fetchone()
+        if oldest is None:
+            return 0.0
+        return max(0.0, oldest + WINDOW_SECONDS - time.time())
+
+    def acquire(self, sleep: Callable[[float], None] = time.sleep) -> float:
+        """
+        Blocks until a request is allowed and records it.
+        Returns the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while not self.check_limit():
+            # Another process may take the freed slot first, so check again after waiting.
+            wait = max(self.wait_time(), 0.01)
+            logger.warning(f"Hourly request limit reached; waiting {wait:.0f}s")
+            sleep(wait)
+            waited += wait
+        return waited
 
     def get_remaining(self) -> int:
-        usage = self._load_usage()
-        usage = self._cleanup_old_requests(usage)
-        return max(0, self.max_requests - len(usage))
+        cutoff = time.time() - WINDOW_SECONDS
+        (count,) = self._connect().execute("SELECT COUNT(*) FROM requests WHERE ts > ?", (cutoff,)).fetchone()
+        return max(0, self.max_requests - count)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding up to capacity tokens, refilled at rate
+    tokens per second. Callers reserve tokens up front and then wait exactly
+    as long as the deficit takes to refill, so waiters are served in order.
+    The bucket can be paused or drained to follow quotas reported by a server.
+    """
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """Takes amount tokens, going into debt if needed, and returns the seconds to wait before using them."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self._paused_until - now, 0.0)
+
+    def acquire(self, amount: float = 1) -> float:
+        """Blocks until amount tokens are available. Returns the seconds waited."""
+        wait = self.reserve(amount)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def adjust(self, amount: float):
+        """Takes (or, when negative, returns) tokens without waiting, e.g. once the real cost is known."""
+        with self._lock:
+            self._refill(self._clock())
+            self.tokens -= amount
+
+    def pause(self, seconds: float):
+        """Holds back every caller for the given number of seconds, e.g. after a Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def sync(self, remaining: float, reset_in: Optional[float] = None, limit: Optional[float] = None):
+        """Aligns the bucket with a quota reported by the server."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if limit:
+                self.capacity = limit
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0 and reset_in:
+                self._paused_until = max(self._paused_until, now + reset_in)
+
+
+_shared_buckets: Dict[str, TokenBucket] = {}
+_shared_buckets_lock = threading.Lock()
+
+
+def shared_bucket(name: str, rate: float, capacity: float) -> TokenBucket:
+    """Returns the process-wide bucket called name, creating it on first use."""
+    with _shared_buckets_lock:
+        bucket = _shared_buckets.get(name)
+        if bucket is None:
+            bucket = _shared_buckets[name] = TokenBucket(rate, capacity)
+        return bucket
+
+
+def _lower_headers(headers: Optional[Mapping[str, str]]) -> Dict[str, str]:
+    return {k.lower(): v for k, v in (headers or {}).items()}
+
+
+def observe_rate_limit_headers(bucket: TokenBucket, headers: Optional[Mapping[str, str]]):
+    """Syncs a bucket with GitHub's X-RateLimit-* response headers, if present."""
+    headers = _lower_headers(headers)
+    try:
+        remaining = float(headers["x-ratelimit-remaining"])
+    except (KeyError, ValueError):
+        return
+    try:
+        reset_in = max(0.0, float(headers["x-ratelimit-reset"]) - time.time())
+    except (KeyError, ValueError):
+        reset_in = None
+    try:
+        limit = float(headers["x-ratelimit-limit"])
+    except (KeyError, ValueError):
+        limit = None
+    bucket.sync(remaining, reset_in, limit)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Returns how long the server asked us to wait before retrying, or None.
+    Reads Retry-After (seconds or HTTP date) and an exhausted X-RateLimit-Reset
+    from the error's headers, then falls back to Gemini's "retry in Ns" text.
+    """
+    headers = _lower_headers(getattr(error, "headers", None))
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            # Imported here because email.utils is slow to load and HTTP-date values are rare.
+            from email.utils import parsedate_to_datetime
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    if headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in headers:
+        try:
+            return max(0.0, float(headers["x-ratelimit-reset"]) - time.time())
+        except ValueError:
+            pass
+    match = _RETRY_IN_RE.search(str(error))
+    if match:
+        return float(match.group(1) or match.group(2))
+    return None
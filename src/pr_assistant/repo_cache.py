@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+# The default branch rarely changes, so it is detected about once a day.
+DEFAULT_REPO_TTL_SECONDS = 24 * 3600
+# Branch heads move, so base SHAs are only reused for a short while.
+DEFAULT_BASE_SHA_TTL_SECONDS = 60
+
+
+class RepoMetadataCache:
+    """
+    Remembers repository metadata between calls and between commands:
+    the repo id and default branch, and the head SHA of each base branch.
+    Entries are kept in one JSON file under ~/.pr_assistant, so every
+    command, and every PR of a batch, shares what was already fetched.
+    """
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        repo_ttl_seconds: float = DEFAULT_REPO_TTL_SECONDS,
+        sha_ttl_seconds: float = DEFAULT_BASE_SHA_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = Path(path) if path else Path.home() / ".pr_assistant" / "repos.json"
+        self.repo_ttl_seconds = repo_ttl_seconds
+        self.sha_ttl_seconds = sha_ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = self._read()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, repo_name: str, entry: dict):
+        """Re-reads the file and replaces only this repo's entry, so other processes' entries survive."""
+        data = self._read()
+        data[repo_name] = entry
+        self._data = data
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # The cache is an optimization; losing a write only costs a refetch.
+            pass
+
+    def _fresh(self, entry: Optional[dict], ttl: float) -> Optional[dict]:
+        """Returns entry if it was fetched within ttl seconds, else None."""
+        if entry and self._clock() - entry.get("fetched_at", 0) <= ttl:
+            return entry
+        return None
+
+    def get_repo(self, repo_name: str) -> Optional[dict]:
+        """Returns {"id", "default_branch"} if known and fresh."""
+        with self._lock:
+            entry = self._fresh(self._data.get(repo_name), self.repo_ttl_seconds)
+            if entry is None or "default_branch" not in entry:
+                return None
+            return {"id": entry.get("id"), "default_branch": entry["default_branch"]}
+
+    def set_repo(self, repo_name: str, repo_id: Optional[int], default_branch: str):
+        with self._lock:
+            entry = dict(self._read().get(repo_name) or {})
+            entry.update(id=repo_id, default_branch=default_branch, fetched_at=self._clock())
+            self._write(repo_name, entry)
+
+    def get_sha(self, repo_name: str, branch: str) -> Optional[str]:
+        """Returns the cached head SHA of branch if it was fetched within the TTL."""
+        with self._lock:
+            ref = self._fresh(((self._data.get(repo_name) or {}).get("branches") or {}).get(branch), self.sha_ttl_seconds)
+            return ref["sha"] if ref is not None else None
+
+    def set_sha(self, repo_name: str, branch: str, sha: Optional[str]):
+        """Records the head SHA of branch; None forgets it."""
+        with self._lock:
+            entry = dict(self._read().get(repo_name) or {})
+            branches = dict(entry.get("branches") or {})
+            if sha is None:
+                if branches.pop(branch, None) is None:
+                    return
+            else:
+                branches[branch] = {"sha": sha, "fetched_at": self._clock()}
+            entry["branches"] = branches
+            self._write(repo_name, entry)
@@ -0,0 +1,275 @@
+import ast
+import json
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from pr_assistant.codebase import CodebaseReader, BINARY_SNIFF_BYTES, DEFAULT_MAX_FILE_SIZE
+from pr_assistant.context import estimate_tokens, extract_terms
+from pr_assistant.lazy import LazyImport
+from pr_assistant.logger import get_logger
+from pr_assistant.snapshot import SNAPSHOT_DIR
+
+# Loads multiprocessing only when a map is built, not at CLI startup.
+ProcessPoolExecutor = LazyImport("concurrent.futures", "ProcessPoolExecutor")
+
+logger = get_logger(__name__)
+
+# Below this many files to parse, a process pool costs more than it saves.
+PARALLEL_THRESHOLD = 64
+# Long signatures (e.g. many defaults) are cut to keep the map compact.
+MAX_SIGNATURE_CHARS = 120
+
+_JS = [
+    r"^[ \t]*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s+\w+\s*\([^)]*\)",
+    r"^[ \t]*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+\w+(?:\s+extends\s+[\w.]+)?",
+    r"^[ \t]*(?:export\s+)?(?:const|let)\s+\w+\s*=\s*(?:async\s*)?\([^)]*\)\s*=>",
+    r"^[ \t]*(?:export\s+)?(?:interface|type|enum)\s+\w+",
+]
+_JVM = [
+    r"^[ \t]*(?:(?:public|private|protected|internal|static|final|abstract|sealed|data)\s+)*"
+    r"(?:class|interface|enum|record|object)\s+\w+",
+    r"^[ \t]*(?:public|private|protected|internal)\s+(?:[\w<>\[\],?]+\s+)+\w+\s*\([^)]*\)",
+    r"^[ \t]*(?:(?:public|private|protected|internal|override|suspend)\s+)*fun\s+[\w.]+\s*\([^)]*\)",
+]
+_C = [
+    r"^(?:[\w*&:<>]+[ \t]+)+[*&]*[\w:~]+\s*\([^;{)]*\)\s*(?:const\s*)?(?=\{|$)",
+    r"^[ \t]*(?:class|struct|namespace)\s+\w+",
+]
+# Line-based fallbacks for languages without a parser in the standard library.
+REGEX_SYMBOLS: Dict[str, List[str]] = {}
+for _extensions, _patterns in [
+    ((".js", ".jsx", ".mjs", ".ts", ".tsx"), _JS),
+    ((".go",), [r"^func\s+(?:\([^)]*\)\s*)?\w+\s*\([^)]*\)[^{\n]*", r"^type\s+\w+\s+(?:struct|interface)"]),
+    ((".rs",), [
+        r"^[ \t]*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?fn\s+\w+[^{;\n]*",
+        r"^[ \t]*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait)\s+\w+",
+        r"^[ \t]*impl\b[^{\n]*",
+    ]),
+    ((".java", ".kt", ".cs", ".scala"), _JVM),
+    ((".rb",), [r"^[ \t]*(?:class|module)\s+[\w:]+", r"^[ \t]*def\s+[\w.?!]+(?:\([^)]*\))?"]),
+    ((".c", ".h", ".cc", ".cpp", ".hpp"), _C),
+    # Python files that fail to parse, e.g. written for a newer grammar.
+    ((".py",), [r"^[ \t]*(?:async\s+)?def\s+\w+\s*\([^)]*\)", r"^[ \t]*class\s+\w+[^:\n]*"]),
+]:
+    for _ext in _extensions:
+        REGEX_SYMBOLS[_ext] = _patterns
+
+SUPPORTED_EXTENSIONS = set(REGEX_SYMBOLS)
+
+
+@lru_cache(maxsize=None)
+def _symbol_pattern(extension: str) -> "re.Pattern":
+    # Compiled on first use; compiling every language up front slows down CLI startup.
+    return re.compile("|".join(f"(?:{p})" for p in REGEX_SYMBOLS[extension]), re.MULTILINE)
+
+
+def _clip(signature: str) -> str:
+    signature = " ".join(signature.split())
+    return signature if len(signature) <= MAX_SIGNATURE_CHARS else signature[:MAX_SIGNATURE_CHARS - 3] + "..."
+
+
+def _function_signature(node) -> str:
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return _clip(f"{prefix} {node.name}({ast.unparse(node.args)}){returns}")
+
+
+def python_symbols(source: str) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Returns (symbol lines, defined names, imported names) of a Python module.
+    Classes list their methods one level deeper; nested functions are skipped.
+    """
+    tree = ast.parse(source)
+    lines, defines, imports = [], [], []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            lines.append(_function_signature(node))
+            defines.append(node.name)
+        elif isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(base) for base in node.bases + node.keywords)
+            lines.append(_clip(f"class {node.name}({bases})" if bases else f"class {node.name}"))
+            defines.append(node.name)
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    lines.append("  " + _function_signature(item))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            if isinstance(node, ast.ImportFrom) and node.module:
+                imports.append(node.module.split(".")[-1])
+            imports.extend(alias.name.split(".")[-1] for alias in node.names)
+    return lines, defines, imports
+
+
+def regex_symbols(source: str, extension: str) -> List[str]:
+    if extension not in REGEX_SYMBOLS:
+        return []
+    symbols = []
+    for match in _symbol_pattern(extension).finditer(source):
+        text = match.group(0)
+        indent = "  " if text[:1] in (" ", "\t") else ""
+        symbols.append(indent + _clip(text.strip().rstrip("{").strip()))
+    return symbols
+
+
+def parse_file(full_path: str) -> Optional[dict]:
+    """
+    Extracts the symbols of one source file; runs in a worker process.
+    Returns None for unreadable, binary or oversized files.
+    """
+    try:
+        with open(full_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size > DEFAULT_MAX_FILE_SIZE:
+                return None
+            data = f.read()
+        if b"\0" in data[:BINARY_SNIFF_BYTES]:
+            return None
+        source = data.decode("utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+
+    extension = os.path.splitext(full_path)[1].lower()
+    if extension == ".py":
+        try:
+            symbols, defines, imports = python_symbols(source)
+            return {"symbols": symbols, "defines": defines, "imports": sorted(set(imports))}
+        except (SyntaxError, ValueError):
+            pass
+    return {"symbols": regex_symbols(source, extension), "defines": [], "imports": []}
+
+
+class RepoMap:
+    """
+    Compact map of a repository: every file with the classes, functions and
+    signatures it defines. Symbols are cached per file and re-extracted only
+    when the file's content hash changes; changed files are parsed on a
+    process pool. render() ranks files by relevance to an instruction and
+    by how often other files import them, then fits the map to a budget.
+    """
+    VERSION = 1
+
+    def __init__(
+        self,
+        codebase: CodebaseReader,
+        cache_path: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        parallel_threshold: int = PARALLEL_THRESHOLD,
+    ):
+        self.codebase = codebase
+        self.cache_path = cache_path or os.path.join(codebase.root_dir, SNAPSHOT_DIR, "repo_map.json")
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+        self.paths: List[str] = []
+        self.entries: Dict[str, dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("version") == self.VERSION:
+            self.entries = data.get("files", {})
+
+    def _save(self):
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({"version": self.VERSION, "files": self.entries}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # A read-only checkout simply re-parses on the next run.
+            pass
+
+    def _parse_all(self, full_paths: List[str]) -> List[Optional[dict]]:
+        if len(full_paths) < self.parallel_threshold:
+            return [parse_file(path) for path in full_paths]
+        workers = self.max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(parse_file, full_paths, chunksize=max(1, len(full_paths) // (workers * 4))))
+
+    def update(self) -> int:
+        """Refreshes the cached symbols and returns the number of files parsed."""
+        self.paths = list(self.codebase.iter_paths())
+        entries, stale = {}, []
+        for path in self.paths:
+            if os.path.splitext(path)[1].lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            digest = self.codebase.file_hash(path)
+            entry = self.entries.get(path)
+            if digest is not None and entry is not None and entry.get("hash") == digest:
+                entries[path] = entry
+            elif digest is not None:
+                stale.append((path, digest))
+
+        parsed = self._parse_all([os.path.join(self.codebase.root_dir, path) for path, _ in stale])
+        for (path, digest), result in zip(stale, parsed):
+            if result is not None:
+                entries[path] = dict(result, hash=digest)
+
+        changed = bool(stale) or entries.keys() != self.entries.keys()
+        self.entries = entries
+        if self.codebase.snapshot:
+            self.codebase.snapshot.save()
+        if changed:
+            self._save()
+        return len(stale)
+
+    def rank(self, instruction: str = "") -> List[str]:
+        """Returns every path, most relevant first."""
+        if not self.paths:
+            self.update()
+        terms = extract_terms(instruction)
+        texts = {
+            path: (path + "\n" + "\n".join(self.entries.get(path, {}).get("symbols", []))).lower()
+            for path in self.paths
+        }
+        doc_freq = {term: sum(1 for text in texts.values() if term in text) for term in terms}
+        total = len(texts)
+
+        # How many other files import a name defined in (or the module name of) each file.
+        importers: Dict[str, int] = {}
+        for entry in self.entries.values():
+            for name in set(entry.get("imports", [])):
+                importers[name] = importers.get(name, 0) + 1
+
+        def score(path: str) -> Tuple[float, int, bool, int, str]:
+            text = texts[path]
+            path_lower = path.lower()
+            relevance = sum(
+                math.log(1 + total / (1 + doc_freq[term])) * (3 * (term in path_lower) + math.log1p(text.count(term)))
+                for term in terms
+            )
+            entry = self.entries.get(path, {})
+            stem = os.path.splitext(os.path.basename(path))[0]
+            names = set(entry.get("defines", [])) | {stem}
+            references = sum(importers.get(name, 0) for name in names)
+            return -relevance, -references, not entry.get("symbols"), path.count("/"), path
+
+        return sorted(self.paths, key=score)
+
+    def render(self, instruction: str = "", max_tokens: Optional[int] = None) -> str:
+        """
+        Returns the map, most relevant files first, within max_tokens.
+        From the first file whose symbols do not fit, files are listed by
+        path alone; when even paths no longer fit, the rest are counted.
+        """
+        blocks, used = [], 0
+        paths_only = False
+        ranked = self.rank(instruction)
+        for i, path in enumerate(ranked):
+            symbols = [] if paths_only else self.entries.get(path, {}).get("symbols", [])
+            block = path + ":\n" + "\n".join("  " + line for line in symbols) if symbols else path
+            cost = estimate_tokens(block) + 1
+            if max_tokens is not None and used + cost > max_tokens:
+                paths_only = True
+                block = path
+                cost = estimate_tokens(block) + 1
+                if used + cost > max_tokens:
+                    blocks.append(f"... ({len(ranked) - i} more files)")
+                    break
+            blocks.append(block)
+            used += cost
+        return "\n".join(blocks)
@@ -0,0 +1,63 @@
+import random
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: rate limits and server-side failures.
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    Returns True for errors that may succeed on retry.
+    Covers network failures and HTTP errors from PyGithub (status), the
+    async client (status_code) and Google API clients (code), including
+    GitHub's secondary rate limit.
+    """
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    code = getattr(exc, "code", None)
+    if status is None and isinstance(code, int):
+        status = code
+    if status in TRANSIENT_STATUSES:
+        return True
+    if status == 403:
+        return "rate limit" in str(exc).lower()
+    # Covers socket errors, timeouts and requests' ConnectionError/Timeout.
+    return status is None and isinstance(exc, OSError)
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 30.0) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base * 2^attempt)]."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_call(
+    fn: Callable[[], T],
+    max_attempts: int = 4,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    is_transient: Callable[[BaseException], bool] = is_transient_error,
+    on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    retry_after: Optional[Callable[[BaseException], Optional[float]]] = None,
+) -> T:
+    """
+    Calls fn, retrying transient failures with exponential backoff and jitter.
+    If retry_after returns a delay for an error (e.g. from a Retry-After
+    header), that exact delay is used instead of the backoff.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            attempt += 1
+            if attempt >= max_attempts or not is_transient(e):
+                raise
+            delay = retry_after(e) if retry_after else None
+            if delay is None:
+                delay = backoff_delay(attempt - 1, base_delay, max_delay)
+            if on_retry:
+                on_retry(attempt, e, delay)
+            sleep(delay)
@@ -0,0 +1,295 @@
+import queue
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from pr_assistant.jobs import JobContext
+from pr_assistant.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Hidden marker recording the head commit a posted review covers.
+REVIEW_MARKER_PREFIX = "<!-- pr-assistant:head="
+_REVIEW_MARKER_RE = re.compile(r"<!-- pr-assistant:head=([0-9a-fA-F]+) -->")
+
+
+def review_marker(head_sha: str) -> str:
+    return f"{REVIEW_MARKER_PREFIX}{head_sha} -->"
+
+
+def parse_review_marker(body: str) -> Optional[str]:
+    """Returns the head SHA recorded in a review comment, if any."""
+    matches = _REVIEW_MARKER_RE.findall(body or "")
+    return matches[-1] if matches else None
+
+
+def review_header(persona: str) -> str:
+    return f"## AI Review ({persona})\n"
+
+
+def format_review_comment(persona: str, review: str, head_sha: Optional[str] = None) -> str:
+    body = f"{review_header(persona)}\n{review}"
+    if head_sha:
+        body += f"\n\n{review_marker(head_sha)}"
+    return body
+
+
+def append_review_update(body: str, review: str, base_sha: str, head_sha: str) -> str:
+    """Extends a previous review comment with the review of commits base_sha..head_sha."""
+    body = _REVIEW_MARKER_RE.sub("", body).rstrip()
+    return f"{body}\n\n### Update ({base_sha[:7]}..{head_sha[:7]})\n\n{review}\n\n{review_marker(head_sha)}"
+
+
+@dataclass
+class ReviewTarget:
+    """
+    What to review for a PR: all of its files, or only the changes since the
+    head recorded in an earlier review comment (base_sha).
+    """
+    details: dict
+    files: List[dict] = field(default_factory=list)
+    head_sha: Optional[str] = None
+    previous: Optional[dict] = None
+    base_sha: Optional[str] = None
+
+    @property
+    def up_to_date(self) -> bool:
+        return self.base_sha is not None and self.base_sha == self.head_sha
+
+
+def fetch_review_target(
+    gh_client,
+    pr_number: int,
+    incremental: bool = True,
+    persona: str = "Senior Software Engineer",
+) -> ReviewTarget:
+    """
+    Fetches what needs reviewing. If an earlier review comment by the same
+    persona records a head that is still in the PR's history, only the
+    compare diff since that head is fetched; otherwise the whole PR is
+    reviewed again.
+    """
+    details = gh_client.get_pr_details(pr_number)
+    head_sha = details.get("head_sha")
+    previous = None
+    if incremental and head_sha:
+        previous = gh_client.find_comment(pr_number, review_header(persona), REVIEW_MARKER_PREFIX)
+    if previous:
+        base_sha = parse_review_marker(previous["body"])
+        if base_sha == head_sha:
+            return ReviewTarget(details, [], head_sha, previous, base_sha)
+        files = gh_client.compare_files(base_sha, head_sha) if base_sha else None
+        if files is not None:
+            return ReviewTarget(details, files, head_sha, previous, base_sha)
+    return ReviewTarget(details, gh_client.get_pr_files(pr_number), head_sha, previous)
+
+
+def review_target(agent, target: ReviewTarget, persona: str, concurrency: int = 4) -> str:
+    details = target.details
+    if target.base_sha:
+        note = (
+            f"(Re-review: commit {target.base_sha[:7]} was already reviewed; "
+            "only the changes pushed since then are shown.)"
+        )
+        details = dict(details, body=f"{details.get('body') or ''}\n\n{note}")
+    return agent.review_pr_files(details, target.files, persona, concurrency=concurrency)
+
+
+def post_review(gh_client, pr_number: int, target: ReviewTarget, persona: str, review: str) -> str:
+    """
+    Posts a review, or folds it into the earlier review comment.
+    Returns "posted" or "updated".
+    """
+    if target.previous is None:
+        gh_client.post_comment(pr_number, format_review_comment(persona, review, target.head_sha))
+        return "posted"
+    if target.base_sha and target.head_sha:
+        body = append_review_update(target.previous["body"], review, target.base_sha, target.head_sha)
+    else:
+        body = format_review_comment(persona, review, target.head_sha)
+    gh_client.update_comment(pr_number, target.previous["id"], body)
+    return "updated"
+
+
+def review_and_post(
+    agent,
+    gh_client,
+    pr_number: int,
+    persona: str = "Senior Software Engineer",
+    incremental: bool = True,
+    concurrency: int = 4,
+) -> str:
+    """Fetches, reviews and posts in one go. Returns "posted", "updated" or "up to date"."""
+    target = fetch_review_target(gh_client, pr_number, incremental, persona)
+    if target.up_to_date:
+        return "up to date"
+    review = review_target(agent, target, persona, concurrency=concurrency)
+    return post_review(gh_client, pr_number, target, persona, review)
+
+
+def run_review_job(agent, gh_client, ctx: JobContext, concurrency: int = 4) -> Dict[str, Any]:
+    """
+    Handler for queued review jobs. The review and the comment are separate
+    steps, so a retry after a failed post does not call the model again.
+    Returns the review state with the outcome in "status". A "concurrency"
+    in the payload overrides the default.
+    """
+    pr_number = ctx.payload["pr_number"]
+    persona = ctx.payload["persona"]
+    concurrency = ctx.payload.get("concurrency", concurrency)
+
+    def review(resumed: bool) -> Dict[str, Any]:
+        target = fetch_review_target(gh_client, pr_number, ctx.payload.get("incremental", True), persona)
+        return {
+            "title": target.details.get("title", ""),
+            "head_sha": target.head_sha,
+            "base_sha": target.base_sha,
+            "previous": target.previous,
+            "review": None if target.up_to_date else review_target(agent, target, persona, concurrency=concurrency),
+        }
+
+    recorded = ctx.done("review") and not ctx.done("comment")
+    state = ctx.step("review", review)
+    if recorded and state["review"] is not None:
+        # A review kept from an earlier attempt is only posted if the PR has no newer commits.
+        if gh_client.get_pr_details(pr_number).get("head_sha") != state["head_sha"]:
+            ctx.reset_step("review")
+            state = ctx.step("review", review)
+    if state["review"] is None:
+        return dict(state, status="up to date")
+
+    def comment(resumed: bool) -> str:
+        status = "posted" if state["previous"] is None else "updated"
+        # The last attempt may have posted before it was interrupted; its marker names this head.
+        marker = review_marker(state["head_sha"]) if state["head_sha"] else None
+        if resumed and marker and gh_client.find_comment(pr_number, review_header(persona), marker):
+            return status
+        target = ReviewTarget({}, [], state["head_sha"], state["previous"], state["base_sha"])
+        return post_review(gh_client, pr_number, target, persona, state["review"])
+
+    return dict(state, status=ctx.step("comment", comment))
+
+
+@dataclass
+class ReviewResult:
+    pr_number: int
+    title: str = ""
+    status: str = "pending"
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+@dataclass
+class BatchSummary:
+    results: List[ReviewResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def posted(self) -> int:
+        return sum(1 for r in self.results if r.status in ("posted", "updated"))
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for r in self.results if r.status == "failed")
+
+    @property
+    def per_minute(self) -> float:
+        return len(self.results) * 60 / self.elapsed if self.elapsed else 0.0
+
+
+class BatchReviewer:
+    """
+    Reviews many PRs at once.
+    Details and diffs are fetched on one pool while model calls run on a
+    smaller pool, so slow fetches never hold a model slot and the number of
+    in-flight model requests never exceeds model_concurrency. Each comment is
+    posted as soon as its review is ready. Large PRs are reviewed in chunks,
+    one chunk at a time within their model slot. PRs reviewed before are
+    re-reviewed incrementally unless incremental is False.
+    """
+    def __init__(
+        self,
+        agent,
+        gh_client,
+        persona: str = "Senior Software Engineer",
+        fetch_workers: int = 8,
+        model_concurrency: int = 4,
+        post_comments: bool = True,
+        incremental: bool = True,
+    ):
+        self.agent = agent
+        self.gh_client = gh_client
+        self.persona = persona
+        self.fetch_workers = fetch_workers
+        self.model_concurrency = model_concurrency
+        self.post_comments = post_comments
+        self.incremental = incremental
+
+    def _fetch(self, result: ReviewResult) -> ReviewTarget:
+        target = fetch_review_target(self.gh_client, result.pr_number, self.incremental, self.persona)
+        result.title = target.details.get("title", "")
+        return target
+
+    def _review(self, result: ReviewResult, target: ReviewTarget) -> str:
+        review = review_target(self.agent, target, self.persona, concurrency=1)
+        if not self.post_comments:
+            return "reviewed"
+        return post_review(self.gh_client, result.pr_number, target, self.persona, review)
+
+    def run(
+        self,
+        pr_numbers: Iterable[int],
+        on_result: Optional[Callable[[ReviewResult], None]] = None,
+    ) -> BatchSummary:
+        """Reviews every PR, calling on_result from this thread as each one finishes."""
+        start = time.perf_counter()
+        done: "queue.Queue[ReviewResult]" = queue.Queue()
+        fetch_pool = ThreadPoolExecutor(max_workers=self.fetch_workers)
+        review_pool = ThreadPoolExecutor(max_workers=self.model_concurrency)
+
+        def finish(result: ReviewResult, started: float, status: str = "", error: Optional[BaseException] = None):
+            if error is not None:
+                logger.error(f"Review of PR #{result.pr_number} failed: {error}")
+                result.status = "failed"
+                result.error = str(error)
+            else:
+                result.status = status
+            result.duration = time.perf_counter() - started
+            done.put(result)
+
+        def review_job(result: ReviewResult, target: ReviewTarget, started: float):
+            try:
+                status = self._review(result, target)
+            except Exception as e:
+                finish(result, started, error=e)
+            else:
+                finish(result, started, status)
+
+        def fetch_job(result: ReviewResult):
+            started = time.perf_counter()
+            try:
+                target = self._fetch(result)
+            except Exception as e:
+                finish(result, started, error=e)
+                return
+            if target.up_to_date:
+                # No new commits since the last review: nothing to send to the model.
+                finish(result, started, "up to date")
+                return
+            review_pool.submit(review_job, result, target, started)
+
+        results = [ReviewResult(pr_number=n) for n in pr_numbers]
+        try:
+            for result in results:
+                fetch_pool.submit(fetch_job, result)
+            for _ in results:
+                finished = done.get()
+                if on_result:
+                    on_result(finished)
+        finally:
+            fetch_pool.shutdown(wait=True)
+            review_pool.shutdown(wait=True)
+
+        return BatchSummary(results=results, elapsed=time.perf_counter() - start)
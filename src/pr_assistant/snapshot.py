@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import posixpath
+import time
+from typing import Dict, List, Optional, Tuple
+
+SNAPSHOT_DIR = ".pr_assistant"
+
+# Directories modified this recently are re-listed on the next scan, since a
+# change within the same mtime tick would otherwise go unnoticed.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class FileSnapshot:
+    """
+    Persistent index of a directory tree.
+    Stores the filtered listing of every directory keyed by its mtime, and
+    (size, mtime, content hash) for files that have been read.
+    """
+    VERSION = 2
+
+    def __init__(self, root_dir: str, path: Optional[str] = None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.path = path or os.path.join(self.root_dir, SNAPSHOT_DIR, "snapshot.json")
+        self.dirs: Dict[str, dict] = {}
+        self.files: Dict[str, List] = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("version") != self.VERSION:
+            self._dirty = True
+            return
+        self.dirs = data.get("dirs", {})
+        self.files = data.get("files", {})
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = {
+            "version": self.VERSION,
+            "dirs": self.dirs,
+            "files": self.files,
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError:
+            # A read-only checkout simply runs without a persisted snapshot.
+            pass
+
+    def get_listing(self, rel_dir: str, mtime_ns: int, ignore_key: str) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Returns the cached (dirs, files) of a directory if neither its mtime nor
+        the ignore rules that apply to it have changed.
+        """
+        entry = self.dirs.get(rel_dir)
+        if entry is None or entry["mtime"] != mtime_ns or entry["ignore"] != ignore_key:
+            return None
+        return entry["dirs"], entry["files"]
+
+    def set_listing(self, rel_dir: str, mtime_ns: int, ignore_key: str, dirs: List[str], files: List[str]):
+        if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+            mtime_ns = -1
+        entry = {"mtime": mtime_ns, "ignore": ignore_key, "dirs": dirs, "files": files}
+        if self.dirs.get(rel_dir) != entry:
+            self.dirs[rel_dir] = entry
+            self._dirty = True
+
+    def prune(self, seen_dirs: set):
+        """Drops entries for directories and files that are no longer in the tree."""
+        stale = [d for d in self.dirs if d not in seen_dirs]
+        for rel_dir in stale:
+            del self.dirs[rel_dir]
+        listed = {d: set(entry["files"]) for d, entry in self.dirs.items()}
+        stale_files = []
+        for rel_path in self.files:
+            parent, name = posixpath.split(rel_path)
+            if name not in listed.get(parent, ()):
+                stale_files.append(rel_path)
+        for rel_path in stale_files:
+            del self.files[rel_path]
+        if stale or stale_files:
+            self._dirty = True
+
+    def get_hash(self, rel_path: str, size: int, mtime_ns: int) -> Optional[str]:
+        """Returns the cached content hash if the file's size and mtime are unchanged."""
+        entry = self.files.get(rel_path)
+        if entry is None or entry[0] != size or entry[1] != mtime_ns:
+            return None
+        return entry[2]
+
+    def set_hash(self, rel_path: str, size: int, mtime_ns: int, digest: str):
+        if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+            mtime_ns = -1
+        entry = [size, mtime_ns, digest]
+        if self.files.get(rel_path) != entry:
+            self.files[rel_path] = entry
+            self._dirty = True
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
@@ -0,0 +1,211 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from pr_assistant.cache import ResponseCache, cache_key
+from pr_assistant.context import CHARS_PER_TOKEN, estimate_tokens
+from pr_assistant.diff_chunks import chunk_diff
+from pr_assistant.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Largest prompt sent for one batch of PRs, and the share of it one PR may take.
+DEFAULT_BATCH_TOKENS = 8000
+DEFAULT_PR_TOKENS = 1500
+# Caps the size of each response, which grows with the number of PRs scored.
+MAX_PRS_PER_BATCH = 20
+# PR descriptions are cut to this length; the diff says more about urgency.
+_BODY_CHARS = 1000
+
+
+def score_key(repo_name: str, pr_number: int, head_sha: str) -> str:
+    """Scores are cached per head commit, so a PR is scored again only after new pushes."""
+    return cache_key("triage", f"{repo_name}#{pr_number}", head_sha)
+
+
+@dataclass
+class TriageResult:
+    number: int
+    title: str = ""
+    url: str = ""
+    user: Optional[str] = None
+    head_sha: Optional[str] = None
+    summary: str = ""
+    focus_score: Optional[int] = None
+    reason: str = ""
+    cached: bool = False
+    error: Optional[str] = None
+    section: str = field(default="", repr=False)
+
+
+@dataclass
+class TriageSummary:
+    results: List[TriageResult] = field(default_factory=list)
+    model_calls: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def cached(self) -> int:
+        return sum(1 for r in self.results if r.cached)
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for r in self.results if r.error)
+
+
+def pack_batches(sections: List[str], max_tokens: int, max_items: int = MAX_PRS_PER_BATCH) -> List[List[int]]:
+    """Greedily groups section indexes, in order, into batches of at most max_tokens and max_items."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    size = 0
+    for i, section in enumerate(sections):
+        tokens = estimate_tokens(section)
+        if current and (size + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _parse_score(value: Any) -> Optional[int]:
+    try:
+        return max(1, min(10, int(round(float(value)))))
+    except (TypeError, ValueError):
+        return None
+
+
+class Triager:
+    """
+    Ranks PRs by how urgently they need a review.
+    Each PR is described by its title, description and a diff cut to
+    pr_tokens. Descriptions are packed several to a request up to
+    batch_tokens, and the requests run concurrently. Scores are cached per
+    head commit, so unchanged PRs cost neither a fetch nor a model call.
+    """
+    def __init__(
+        self,
+        agent,
+        gh_client,
+        score_cache: Optional[ResponseCache] = None,
+        batch_tokens: int = DEFAULT_BATCH_TOKENS,
+        pr_tokens: int = DEFAULT_PR_TOKENS,
+        fetch_workers: int = 8,
+        model_concurrency: int = 4,
+    ):
+        self.agent = agent
+        self.gh_client = gh_client
+        self.score_cache = score_cache
+        self.batch_tokens = batch_tokens
+        self.pr_tokens = pr_tokens
+        self.fetch_workers = fetch_workers
+        self.model_concurrency = model_concurrency
+
+    def _key(self, result: TriageResult) -> Optional[str]:
+        if not result.head_sha:
+            return None
+        return score_key(self.gh_client.repo_name, result.number, result.head_sha)
+
+    def _load_cached(self, result: TriageResult) -> bool:
+        key = self._key(result)
+        cached = self.score_cache.get(key) if key and self.score_cache is not None else None
+        if cached is None:
+            return False
+        score = json.loads(cached)
+        result.summary = score.get("summary", "")
+        result.focus_score = score.get("focus_score")
+        result.reason = score.get("reason", "")
+        result.cached = True
+        return True
+
+    def _describe(self, result: TriageResult):
+        details = self.gh_client.get_pr_details(result.number)
+        files = self.gh_client.get_pr_files(result.number)
+        result.head_sha = result.head_sha or details.get("head_sha")
+        chunks = chunk_diff(files, self.pr_tokens)
+        diff = chunks[0][:self.pr_tokens * CHARS_PER_TOKEN] if chunks else "(no changes)"
+        if len(chunks) > 1:
+            diff += f"\n\n(diff truncated; {len(chunks) - 1} more parts not shown)"
+        body = (details.get("body") or "")[:_BODY_CHARS]
+        result.section = (
+            f"## PR #{result.number}: {details.get('title') or result.title}\n"
+            f"Author: {details.get('user') or result.user}\n"
+            f"Description: {body}\n\n"
+            f"Diff:\n{diff}"
+        )
+
+    def _score(self, batch: List[TriageResult]):
+        try:
+            scores = self.agent.triage_prs([r.section for r in batch])
+        except Exception as e:
+            logger.error(f"Scoring PRs {[r.number for r in batch]} failed: {e}")
+            for result in batch:
+                result.error = str(e)
+            return
+        by_number: Dict[int, dict] = {}
+        for score in scores:
+            try:
+                by_number[int(score["number"])] = score
+            except (KeyError, TypeError, ValueError):
+                continue
+        for result in batch:
+            score = by_number.get(result.number)
+            if score is None:
+                result.error = "not scored by the model"
+                continue
+            result.summary = str(score.get("summary", ""))
+            result.focus_score = _parse_score(score.get("focus_score"))
+            result.reason = str(score.get("reason", ""))
+            key = self._key(result)
+            if key and self.score_cache is not None and result.focus_score is not None:
+                self.score_cache.set(key, json.dumps(
+                    {"summary": result.summary, "focus_score": result.focus_score, "reason": result.reason}
+                ))
+
+    def run(self, prs: Iterable[Dict[str, Any]]) -> TriageSummary:
+        """Scores every PR (as listed by list_prs) and returns them, highest focus score first."""
+        start = time.perf_counter()
+        results = [
+            TriageResult(number=pr["number"], title=pr.get("title", ""), url=pr.get("url", ""),
+                         user=pr.get("user"), head_sha=pr.get("head_sha"))
+            for pr in prs
+        ]
+        pending = [r for r in results if not self._load_cached(r)]
+
+        def describe(result: TriageResult) -> bool:
+            try:
+                self._describe(result)
+                return True
+            except Exception as e:
+                logger.error(f"Fetching PR #{result.number} failed: {e}")
+                result.error = str(e)
+                return False
+
+        with ThreadPoolExecutor(max_workers=max(1, self.fetch_workers)) as pool:
+            described = [r for r, ok in zip(pending, pool.map(describe, pending)) if ok]
+
+        batches = [
+            [described[i] for i in batch]
+            for batch in pack_batches([r.section for r in described], self.batch_tokens)
+        ]
+        logger.info(f"Scoring {len(described)} PRs in {len(batches)} requests")
+        with ThreadPoolExecutor(max_workers=max(1, self.model_concurrency)) as pool:
+            list(pool.map(self._score, batches))
+
+        results.sort(key=lambda r: (r.focus_score is None, -(r.focus_score or 0), r.number))
+        return TriageSummary(results=results, model_calls=len(batches), elapsed=time.perf_counter() - start)
+
+
+def default_score_cache(ttl_seconds: float) -> ResponseCache:
+    return ResponseCache(cache_dir=Path.home() / ".pr_assistant" / "triage", ttl_seconds=ttl_seconds)
+
+
+def result_row(result: TriageResult) -> Dict[str, Any]:
+    """A result without its prompt section, e.g. for JSON output."""
+    row = asdict(result)
+    row.pop("section")
+    return row
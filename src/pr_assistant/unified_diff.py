@@ -0,0 +1,81 @@
+import re
+from typing import Dict, Optional
+
+_FILE_HEADER_RE = re.compile(r"^diff --git ", re.MULTILINE)
+# Single-letter escapes git uses in quoted paths, besides \" and \\.
+_ESCAPES = {"a": "\a", "b": "\b", "t": "\t", "n": "\n", "v": "\v", "f": "\f", "r": "\r"}
+
+
+def _unquote(path: str) -> str:
+    """Undoes git's C-style quoting of paths with special or non-ASCII characters."""
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+    body = path[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(body):
+        c = body[i]
+        if c == "\\" and i + 1 < len(body):
+            escaped = body[i + 1]
+            if escaped in "01234567":
+                # Octal escapes are the raw UTF-8 bytes of the name.
+                out.append(int(body[i + 1:i + 4], 8))
+                i += 4
+                continue
+            out += _ESCAPES.get(escaped, escaped).encode("utf-8")
+            i += 2
+            continue
+        out += c.encode("utf-8")
+        i += 1
+    return out.decode("utf-8", "replace")
+
+
+def _header_path(value: str, prefix: str = "") -> str:
+    """
+    The path in a "---"/"+++"/"rename" value. Unquoted paths that contain a
+    space are followed by a tab, which is not part of the name.
+    """
+    if not value.startswith('"'):
+        value = value.partition("\t")[0]
+    value = _unquote(value)
+    return value[len(prefix):] if prefix and value.startswith(prefix) else value
+
+
+def _section_path(section: str) -> str:
+    header, _, rest = section.partition("\n")
+    old_path = None
+    for line in rest.split("\n"):
+        if line.startswith("@@"):
+            break
+        if line.startswith("--- ") and not line.startswith("--- /dev/null"):
+            old_path = _header_path(line[len("--- "):], "a/")
+        elif line.startswith("+++ "):
+            if line.startswith("+++ /dev/null"):
+                if old_path is not None:
+                    return old_path
+                continue
+            return _header_path(line[len("+++ "):], "b/")
+        elif line.startswith("rename to "):
+            return _header_path(line[len("rename to "):])
+    # Binary files have no "+++ b/" line. Their header reads
+    # "diff --git a/PATH b/PATH", where both halves name the same path.
+    names = header[len("diff --git "):]
+    if names.endswith('"'):
+        return _header_path(names[names.rindex(' "') + 1:], "b/")
+    length = (len(names) - len("a/ b/")) // 2
+    return names[len("a/") + length + len(" b/"):]
+
+
+def split_file_patches(diff: str) -> Dict[str, Optional[str]]:
+    """
+    Splits a raw unified diff (GitHub's .diff media type) into {path: patch}.
+    Each patch starts at the file's first "@@" hunk header, matching the
+    patch field of the REST files API, and is None for binary files.
+    """
+    patches: Dict[str, Optional[str]] = {}
+    starts = [m.start() for m in _FILE_HEADER_RE.finditer(diff)]
+    for a, b in zip(starts, starts[1:] + [len(diff)]):
+        section = diff[a:b]
+        hunks = section.find("\n@@")
+        patches[_section_path(section)] = section[hunks + 1:].rstrip("\n") if hunks != -1 else None
+    return patches
@@ -0,0 +1,272 @@
+import bisect
+import hashlib
+import importlib.util
+import json
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from pr_assistant.context import extract_terms
+from pr_assistant.lazy import LazyImport
+from pr_assistant.logger import get_logger
+from pr_assistant.snapshot import SNAPSHOT_DIR
+
+# NumPy is an optional dependency (pip install "pr-assistant-cli[index]").
+np = LazyImport("numpy")
+if TYPE_CHECKING:
+    import numpy
+
+logger = get_logger(__name__)
+
+DEFAULT_DIM = 512
+# Files are embedded in windows of this many lines.
+CHUNK_LINES = 40
+DEFAULT_TOP_K = 8
+
+
+def numpy_available() -> bool:
+    return importlib.util.find_spec("numpy") is not None
+
+
+class HashingEmbedder:
+    """
+    Deterministic offline embedder. Each search term of a text is hashed to
+    one of dim buckets with a random sign, and the vector is L2-normalized,
+    so texts sharing terms have a high cosine similarity.
+    Any object with name, dim and embed(texts) can be used instead.
+    """
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _bucket(self, term: str) -> Tuple[int, float]:
+        h = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+        return h % self.dim, 1.0 if h >> 63 else -1.0
+
+    def embed(self, texts: Sequence[str]) -> "numpy.ndarray":
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in extract_terms(text):
+                bucket, sign = self._bucket(term)
+                vectors[row, bucket] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+def chunk_lines(content: str, size: int = CHUNK_LINES) -> List[Tuple[int, int, str]]:
+    """Splits text into (first_line, last_line, text) windows of size lines, 1-based."""
+    lines = content.splitlines()
+    chunks = []
+    for start in range(0, len(lines), size):
+        text = "\n".join(lines[start:start + size])
+        if text.strip():
+            chunks.append((start + 1, min(start + size, len(lines)), text))
+    return chunks
+
+
+@dataclass
+class SearchHit:
+    path: str
+    start_line: int
+    end_line: int
+    score: float
+
+
+class VectorIndex:
+    """
+    Persistent vector index over chunks of a codebase's text files.
+    Vectors live in one raw float32 matrix that is memory-mapped for search,
+    so a query costs one matrix-vector product without loading the index.
+    Files are re-embedded only when their content hash changes; the hashes
+    come from the codebase snapshot, so unchanged files are not even read.
+    New vectors are appended to the matrix, and the rows they replace are
+    left unused until they outnumber the live rows and the matrix is
+    rewritten.
+    """
+    VERSION = 2
+
+    def __init__(self, root_dir: str, embedder=None, index_dir: Optional[str] = None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.embedder = embedder or HashingEmbedder()
+        self.index_dir = index_dir or os.path.join(self.root_dir, SNAPSHOT_DIR, "index")
+        self.vectors_path = os.path.join(self.index_dir, "vectors.f32")
+        self.meta_path = os.path.join(self.index_dir, "meta.json")
+        self.files: Dict[str, dict] = {}
+        # Rows in the matrix, including those no file refers to any more.
+        self.rows = 0
+        self._vectors: Optional["numpy.ndarray"] = None
+        self._row_starts: Optional[List[int]] = None
+        self._row_paths: List[str] = []
+        self._live_rows: Optional["numpy.ndarray"] = None
+        self._load_meta()
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        # An index built with another embedder or format is rebuilt from scratch.
+        if meta.get("version") == self.VERSION and meta.get("embedder") == self.embedder.name:
+            self.files = meta.get("files", {})
+            self.rows = meta.get("rows", 0)
+
+    def _load_vectors(self):
+        if self._vectors is None and self.files:
+            try:
+                if not self.rows:
+                    # An empty file cannot be mapped; every indexed file is binary or blank.
+                    vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+                else:
+                    # Rows past self.rows were appended by an update that never saved its metadata.
+                    vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.rows, self.embedder.dim))
+            except (OSError, ValueError):
+                vectors = None
+            # A file shorter than the metadata says is out of step; start over.
+            if vectors is None:
+                self.files = {}
+                self.rows = 0
+            else:
+                self._vectors = vectors
+        return self._vectors
+
+    def __len__(self) -> int:
+        return sum(len(entry["chunks"]) for entry in self.files.values())
+
+    def update(self, codebase) -> int:
+        """Brings the index in line with the codebase and returns the number of files embedded."""
+        self._load_vectors()
+        files: Dict[str, dict] = {}
+        parts = []
+        rows = self.rows
+        embedded = 0
+        for path in codebase.iter_paths():
+            digest = codebase.file_hash(path)
+            if digest is None:
+                continue
+            entry = self.files.get(path)
+            if entry is not None and entry["hash"] == digest:
+                files[path] = entry
+                continue
+
+            content = codebase.read_file(path)
+            # Binary and oversized files are remembered with no chunks, so they are not read again.
+            chunks = chunk_lines(content) if content is not None else []
+            if chunks:
+                parts.append(self.embedder.embed([f"{path}\n{text}" for _, _, text in chunks]))
+            files[path] = {"hash": digest, "start": rows, "chunks": [[a, b] for a, b, _ in chunks]}
+            rows += len(chunks)
+            embedded += 1
+
+        if codebase.snapshot:
+            # Keeps the hashes computed above, so the next update reads nothing.
+            codebase.snapshot.save()
+        if embedded or files.keys() != self.files.keys():
+            live = sum(len(entry["chunks"]) for entry in files.values())
+            if rows - live > live:
+                self._compact(files, parts, live)
+            else:
+                self._append(parts)
+                self._save_meta(files, rows)
+        return embedded
+
+    def _append(self, parts: list):
+        os.makedirs(self.index_dir, exist_ok=True)
+        # Our own map of the file is dropped before the file is resized.
+        self._vectors = None
+        mode = "r+b" if os.path.exists(self.vectors_path) else "wb"
+        with open(self.vectors_path, mode) as f:
+            f.truncate(self.rows * self.embedder.dim * 4)
+            f.seek(0, os.SEEK_END)
+            for part in parts:
+                f.write(np.ascontiguousarray(part, dtype=np.float32).tobytes())
+
+    def _compact(self, files: Dict[str, dict], parts: list, live: int):
+        """Rewrites the matrix with only the rows files refer to, in file order."""
+        old = self._vectors
+        new = np.concatenate(parts) if parts else None
+        moves = []
+        offset = 0
+        for path, entry in files.items():
+            count = len(entry["chunks"])
+            if count:
+                moves.append((entry["start"], offset, count))
+            files[path] = dict(entry, start=offset)
+            offset += count
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_vectors = f"{self.vectors_path}.tmp"
+        if live:
+            out = np.memmap(tmp_vectors, dtype=np.float32, mode="w+", shape=(live, self.embedder.dim))
+            for start, offset, count in moves:
+                # Rows before self.rows come from the old matrix, the rest from this update.
+                if start < self.rows:
+                    assert old is not None
+                    out[offset:offset + count] = old[start:start + count]
+                else:
+                    assert new is not None
+                    out[offset:offset + count] = new[start - self.rows:start - self.rows + count]
+            out.flush()
+            del out
+        else:
+            open(tmp_vectors, "wb").close()
+        # Vectors are replaced first; a reader holding the old map keeps its own copy.
+        os.replace(tmp_vectors, self.vectors_path)
+        self._save_meta(files, live)
+
+    def _save_meta(self, files: Dict[str, dict], rows: int):
+        tmp_meta = f"{self.meta_path}.tmp"
+        with open(tmp_meta, "w") as f:
+            json.dump(
+                {"version": self.VERSION, "embedder": self.embedder.name, "rows": rows, "files": files},
+                f, separators=(",", ":"),
+            )
+        os.replace(tmp_meta, self.meta_path)
+        self.files = files
+        self.rows = rows
+        self._vectors = None
+        self._row_starts = None
+        self._live_rows = None
+
+    def _locate(self, row: int) -> Tuple[str, List[int]]:
+        if self._row_starts is None:
+            located = sorted((entry["start"], path) for path, entry in self.files.items() if entry["chunks"])
+            self._row_starts = [start for start, _ in located]
+            self._row_paths = [path for _, path in located]
+        i = bisect.bisect_right(self._row_starts, row) - 1
+        path = self._row_paths[i]
+        return path, self.files[path]["chunks"][row - self._row_starts[i]]
+
+    def _live_mask(self):
+        if self._live_rows is None:
+            self._live_rows = np.zeros(self.rows, dtype=bool)
+            for entry in self.files.values():
+                self._live_rows[entry["start"]:entry["start"] + len(entry["chunks"])] = True
+        return self._live_rows
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K) -> List[SearchHit]:
+        """Returns the k chunks most similar to query by cosine similarity, best first."""
+        vectors = self._load_vectors()
+        if vectors is None or not len(vectors) or k <= 0:
+            return []
+        scores = vectors @ self.embedder.embed([query])[0]
+        if self.rows > len(self):
+            # Rows replaced by newer vectors never match.
+            scores[~self._live_mask()] = 0
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        hits = []
+        for row in top:
+            if scores[row] <= 0:
+                break
+            path, (start, end) = self._locate(int(row))
+            hits.append(SearchHit(path, start, end, float(scores[row])))
+        return hits
+
+
+def open_code_index(root_dir: str, embedder=None) -> Optional[VectorIndex]:
+    """Returns the index for root_dir, or None when NumPy is not installed."""
+    if not numpy_available():
+        logger.debug("NumPy is not installed; the semantic code index is disabled")
+        return None
+    return VectorIndex(root_dir, embedder)
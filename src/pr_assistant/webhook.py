@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib import request as urllib_request
+from urllib.error import HTTPError
+from pr_assistant.logger import get_logger
+
+logger = get_logger(__name__)
+
+# pull_request actions that change what there is to review.
+REVIEW_ACTIONS = {"opened", "reopened", "synchronize", "ready_for_review"}
+# GitHub caps webhook payloads at 25 MB.
+MAX_BODY_BYTES = 25 * 1024 * 1024
+# Delivery IDs remembered for deduplication; GitHub redelivers recent events only.
+DEFAULT_SEEN_DELIVERIES = 10_000
+# Seconds a client gets to send its whole request before it is answered 408.
+DEFAULT_READ_TIMEOUT = 10.0
+
+_REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 408: "Request Timeout", 413: "Payload Too Large", 503: "Service Unavailable",
+}
+
+
+def sign_payload(secret: str, body: bytes) -> str:
+    """The X-Hub-Signature-256 value GitHub sends for body."""
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    if not signature:
+        return False
+    return hmac.compare_digest(sign_payload(secret, body), signature)
+
+
+@dataclass
+class WebhookStats:
+    received: int = 0
+    duplicates: int = 0
+    queued: int = 0
+    coalesced: int = 0
+    reviewed: int = 0
+    failed: int = 0
+
+
+class WebhookServer:
+    """
+    Receives GitHub pull_request webhooks and reviews the PRs they name.
+    Signatures are checked against the shared secret, redelivered events
+    are recognized by their delivery ID, and an event for a PR that is
+    already waiting in the queue is folded into that job, since the review
+    reads the PR's latest head anyway. A PR is never reviewed twice at
+    once: an event for a PR under review makes its worker review it again
+    when the current review finishes. Reviews run on a fixed number of
+    workers, each calling review(pr_number) in a thread, so one warm Agent
+    and GitHubClient serve every event.
+    """
+    def __init__(
+        self,
+        review: Callable[[int], str],
+        secret: str,
+        repo_name: Optional[str] = None,
+        workers: int = 4,
+        queue_size: int = 100,
+        seen_deliveries: int = DEFAULT_SEEN_DELIVERIES,
+        path: str = "/webhook",
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+    ):
+        if not secret:
+            raise ValueError("A webhook secret is required to verify deliveries.")
+        self.review = review
+        self.secret = secret
+        self.repo_name = repo_name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.seen_deliveries = seen_deliveries
+        self.path = path
+        self.read_timeout = read_timeout
+        self.stats = WebhookStats()
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._pending: Set[int] = set()
+        # PRs being reviewed, and those of them that got new events meanwhile.
+        self._active: Set[int] = set()
+        self._rerun: Set[int] = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._server: Optional[asyncio.Server] = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None, "start() the server first"
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080):
+        """Starts listening (port 0 picks a free port) and starts the workers."""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="webhook-review")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        logger.info(f"Listening for webhooks on http://{host}:{self.port}{self.path}")
+
+    async def serve_forever(self):
+        assert self._server is not None, "start() the server first"
+        await self._server.serve_forever()
+
+    def run(self, host: str = "127.0.0.1", port: int = 8080, on_start: Optional[Callable[[], None]] = None):
+        """Serves until interrupted."""
+        async def main():
+            await self.start(host, port)
+            if on_start:
+                on_start()
+            try:
+                await self.serve_forever()
+            finally:
+                await self.close()
+
+        asyncio.run(main())
+
+    async def join(self):
+        """Waits until every queued review has finished."""
+        assert self._queue is not None, "start() the server first"
+        await self._queue.join()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        assert self._queue is not None
+        while True:
+            pr_number = await self._queue.get()
+            self._pending.discard(pr_number)
+            self._active.add(pr_number)
+            try:
+                while True:
+                    await self._review(loop, pr_number)
+                    # Events that arrived during the review need one more pass over the new head.
+                    if pr_number not in self._rerun:
+                        break
+                    self._rerun.discard(pr_number)
+            finally:
+                self._active.discard(pr_number)
+                self._queue.task_done()
+
+    async def _review(self, loop: asyncio.AbstractEventLoop, pr_number: int):
+        started = time.perf_counter()
+        try:
+            status = await loop.run_in_executor(self._executor, self.review, pr_number)
+            self.stats.reviewed += 1
+            logger.info(f"PR #{pr_number} {status} ({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            self.stats.failed += 1
+            logger.error(f"Review of PR #{pr_number} failed: {e}")
+
+    def _remember(self, delivery: str):
+        self._seen[delivery] = None
+        if len(self._seen) > self.seen_deliveries:
+            self._seen.popitem(last=False)
+
+    def handle(self, headers: Dict[str, str], body: bytes) -> Tuple[int, str]:
+        """Returns the (HTTP status, outcome) for one delivery, queueing a review if needed."""
+        if not verify_signature(self.secret, body, headers.get("x-hub-signature-256")):
+            return 401, "invalid signature"
+        self.stats.received += 1
+        delivery = headers.get("x-github-delivery")
+        if delivery and delivery in self._seen:
+            self.stats.duplicates += 1
+            return 200, "duplicate delivery"
+
+        event = headers.get("x-github-event")
+        if event == "ping":
+            return 200, "pong"
+        if event != "pull_request":
+            return 200, f"ignored {event} event"
+        try:
+            payload = json.loads(body)
+            action = payload["action"]
+            pr = payload["pull_request"]
+            pr_number = int(pr["number"])
+        except (ValueError, KeyError, TypeError):
+            return 400, "malformed pull_request payload"
+
+        repo_name = (payload.get("repository") or {}).get("full_name")
+        if self.repo_name and repo_name and repo_name.lower() != self.repo_name.lower():
+            return 200, f"ignored event for {repo_name}"
+        if action not in REVIEW_ACTIONS or pr.get("draft"):
+            outcome = "ignored draft" if pr.get("draft") else f"ignored {action} action"
+        elif pr_number in self._pending or pr_number in self._rerun:
+            self.stats.coalesced += 1
+            outcome = "already queued"
+        elif pr_number in self._active:
+            self._rerun.add(pr_number)
+            self.stats.queued += 1
+            outcome = "queued after current review"
+        else:
+            assert self._queue is not None, "start() the server first"
+            try:
+                self._queue.put_nowait(pr_number)
+            except asyncio.QueueFull:
+                # Not remembered, so GitHub's redelivery is accepted once there is room.
+                return 503, "queue full"
+            self._pending.add(pr_number)
+            self.stats.queued += 1
+            outcome = "queued"
+        if delivery:
+            self._remember(delivery)
+        return (202 if outcome.startswith("queued") else 200), outcome
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise OverflowError(length)
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], headers, body
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                # A client that stalls mid-request would otherwise hold this handler forever.
+                method, path, headers, body = await asyncio.wait_for(self._read_request(reader), self.read_timeout)
+            except asyncio.TimeoutError:
+                status, outcome = 408, "request timeout"
+            except OverflowError:
+                status, outcome = 413, "payload too large"
+            except (ValueError, asyncio.IncompleteReadError):
+                status, outcome = 400, "malformed request"
+            else:
+                if path != self.path:
+                    status, outcome = 404, "not found"
+                elif method != "POST":
+                    status, outcome = 405, "method not allowed"
+                else:
+                    status, outcome = self.handle(headers, body)
+                    logger.debug(f"Delivery {headers.get('x-github-delivery')}: {outcome}")
+            response = json.dumps({"status": outcome}).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(response)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + response
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def replay_webhook(
+    url: str,
+    body: bytes,
+    secret: str,
+    event: str = "pull_request",
+    delivery: Optional[str] = None,
+    timeout: float = 10.0,
+) -> Tuple[int, dict]:
+    """Signs and POSTs a recorded webhook payload like GitHub does; returns (status, response JSON)."""
+    req = urllib_request.Request(url, data=body, method="POST", headers={
+        "Content-Type": "application/json",
+        "User-Agent": "GitHub-Hookshot/pr-assistant-replay",
+        "X-GitHub-Event": event,
+        "X-GitHub-Delivery": delivery or str(uuid.uuid4()),
+        "X-Hub-Signature-256": sign_payload(secret, body),
+    })
+    try:
+        with urllib_request.urlopen(req, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b"{}")
+    except HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
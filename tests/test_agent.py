@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import MagicMock
 from pr_assistant.agent import Agent
+from pr_assistant.rate_limiter import TokenBucket
 
 @pytest.fixture
 def mock_genai(monkeypatch):
@@ -11,17 +12,25 @@ def mock_genai(monkeypatch):
 @pytest.fixture
 def mock_config(monkeypatch):
     mock_conf = MagicMock()
-    mock_conf.get.return_value = "dummy_key"
+    mock_conf.get.side_effect = lambda key, default=None: "dummy_key" if key == "gemini_api_key" else default
     monkeypatch.setattr("pr_assistant.agent.ConfigManager", lambda: mock_conf)
     return mock_conf
 
 @pytest.fixture
-def mock_codebase(monkeypatch):
+def mock_codebase(monkeypatch, tmp_path):
     mock_cb = MagicMock()
+    mock_cb.root_dir = str(tmp_path)
     mock_cb.get_file_structure.return_value = "file structure"
     monkeypatch.setattr("pr_assistant.agent.CodebaseReader", lambda: mock_cb)
     return mock_cb
 
+@pytest.fixture(autouse=True)
+def mock_cache(monkeypatch):
+    mock_rc = MagicMock()
+    mock_rc.get.return_value = None
+    monkeypatch.setattr("pr_assistant.agent.ResponseCache", lambda **kwargs: mock_rc)
+    return mock_rc
+
 @pytest.fixture
 def mock_rate_limiter(monkeypatch):
     mock_rl = MagicMock()
@@ -29,6 +38,17 @@ def mock_rate_limiter(monkeypatch):
     monkeypatch.setattr("pr_assistant.agent.RateLimiter", lambda: mock_rl)
     return mock_rl
 
+@pytest.fixture(autouse=True)
+def buckets(monkeypatch):
+    created = {}
+
+    def fake_shared_bucket(name, rate, capacity):
+        created[name] = TokenBucket(rate, capacity, sleep=MagicMock())
+        return created[name]
+
+    monkeypatch.setattr("pr_assistant.agent.shared_bucket", fake_shared_bucket)
+    return created
+
 def test_agent_init(mock_genai, mock_config, mock_codebase, mock_rate_limiter):
     agent = Agent()
     mock_genai.configure.assert_called_with(api_key="dummy_key")
@@ -47,14 +67,43 @@ def test_propose_prs_success(mock_genai, mock_config, mock_codebase, mock_rate_l
     
     assert len(prs) == 1
     assert prs[0]["title"] == "Test PR"
-    mock_rate_limiter.check_limit.assert_called()
+    mock_rate_limiter.acquire.assert_called()
 
-def test_propose_prs_rate_limited(mock_genai, mock_config, mock_codebase, mock_rate_limiter):
-    mock_rate_limiter.check_limit.return_value = False
+def test_propose_prs_waits_for_rate_limit(mock_genai, mock_config, mock_codebase, mock_rate_limiter):
+    calls = []
+    mock_rate_limiter.acquire.side_effect = lambda: calls.append("acquire")
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.side_effect = lambda prompt: calls.append("generate") or MagicMock(text='{"prs": []}')
     agent = Agent()
-    
-    with pytest.raises(RuntimeError, match="Rate limit exceeded"):
-        agent.propose_prs("instruction")
+
+    assert agent.propose_prs("instruction") == []
+    assert calls == ["acquire", "generate"]
+
+def test_gemini_429_retried_after_requested_delay(mock_genai, mock_config, mock_codebase, mock_rate_limiter, buckets):
+    class ResourceExhausted(Exception):
+        code = 429
+
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.side_effect = [
+        ResourceExhausted("Quota exceeded. Please retry in 12.5s."),
+        MagicMock(text="LGTM"),
+    ]
+    agent = Agent()
+
+    assert agent.review_pr({"title": "T", "body": "B"}, "diff") == "LGTM"
+    (wait,), _ = buckets["gemini_requests"]._sleep.call_args
+    assert wait == pytest.approx(12.5, abs=0.1)
+
+def test_token_bucket_charged_with_reported_usage(mock_genai, mock_config, mock_codebase, mock_rate_limiter, buckets):
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value = MagicMock(text="LGTM")
+    mock_model.generate_content.return_value.usage_metadata.total_token_count = 500_000
+    agent = Agent()
+
+    agent.review_pr({"title": "T", "body": "B"}, "diff")
+
+    # The 1M tokens/minute bucket started full, so about half is left.
+    assert 499_000 < buckets["gemini_tokens"].tokens < 500_100
 
 def test_propose_prs_json_error(mock_genai, mock_config, mock_codebase, mock_rate_limiter):
     agent = Agent()
@@ -66,3 +115,153 @@ def test_propose_prs_json_error(mock_genai, mock_config, mock_codebase, mock_rat
     
     prs = agent.propose_prs("instruction")
     assert prs == []
+
+def test_propose_prs_packs_context(mock_genai, mock_config, mock_codebase, mock_rate_limiter):
+    agent = Agent()
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value.text = '{"prs": []}'
+
+    agent.propose_prs("instruction")
+
+    prompt = mock_model.generate_content.call_args[0][0]
+    assert "Codebase Structure:\nfile structure" in prompt
+
+def test_cache_hit_skips_model_and_rate_limit(mock_genai, mock_config, mock_codebase, mock_rate_limiter, mock_cache):
+    agent = Agent()
+    mock_cache.get.return_value = "Cached review"
+
+    review = agent.review_pr({"title": "T", "body": "B"}, "diff")
+
+    assert review == "Cached review"
+    mock_genai.GenerativeModel.return_value.generate_content.assert_not_called()
+    mock_rate_limiter.check_limit.assert_not_called()
+
+def test_cache_miss_stores_response(mock_genai, mock_config, mock_codebase, mock_rate_limiter, mock_cache):
+    agent = Agent()
+    mock_genai.GenerativeModel.return_value.generate_content.return_value.text = "LGTM"
+
+    agent.review_pr({"title": "T", "body": "B"}, "diff", persona="Security Expert")
+
+    key = mock_cache.set.call_args[0][0]
+    assert mock_cache.set.call_args[0][1] == "LGTM"
+    assert mock_cache.get.call_args[0][0] == key
+
+def test_unparsable_prs_not_cached(mock_genai, mock_config, mock_codebase, mock_rate_limiter, mock_cache):
+    agent = Agent()
+    mock_genai.GenerativeModel.return_value.generate_content.return_value.text = "Not JSON"
+
+    assert agent.propose_prs("instruction") == []
+    mock_cache.set.assert_not_called()
+
+def test_agent_without_cache(mock_genai, mock_config, mock_codebase, mock_rate_limiter):
+    agent = Agent(use_cache=False)
+    assert agent.cache is None
+
+def test_propose_prs_recovers_truncated_response(mock_genai, mock_config, mock_codebase, mock_rate_limiter, mock_cache):
+    agent = Agent()
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value.text = '{"prs": [{"title": "Kept"}, {"title": "Lo'
+
+    assert agent.propose_prs("instruction") == [{"title": "Kept"}]
+    mock_cache.set.assert_not_called()
+
+def test_proposals_bypass_cache_by_default(mock_genai, mock_config, mock_codebase, mock_rate_limiter, mock_cache):
+    agent = Agent()
+    mock_cache.get.return_value = '{"prs": [{"title": "Cached"}]}'
+    mock_genai.GenerativeModel.return_value.generate_content.return_value.text = '{"prs": [{"title": "Fresh"}]}'
+
+    assert agent.propose_prs("instruction") == [{"title": "Fresh"}]
+    mock_cache.get.assert_not_called()
+    mock_cache.set.assert_not_called()
+
+def test_stream_prs(mock_genai, mock_config, mock_codebase, mock_rate_limiter, mock_cache):
+    agent = Agent()
+    agent.cache_proposals = True
+    mock_model = mock_genai.GenerativeModel.return_value
+    chunks = ['{"prs": [{"title": "One"}', ', {"title": "Two"}', "]}"]
+    mock_model.generate_content.return_value = [MagicMock(text=c) for c in chunks]
+
+    stream = agent.stream_prs("instruction", 2)
+    assert next(stream) == {"title": "One"}
+    mock_cache.set.assert_not_called()
+    assert list(stream) == [{"title": "Two"}]
+
+    assert mock_model.generate_content.call_args.kwargs["stream"] is True
+    mock_cache.set.assert_called_once()
+    assert mock_cache.set.call_args[0][1] == "".join(chunks)
+
+def test_stream_prs_from_cache(mock_genai, mock_config, mock_codebase, mock_rate_limiter, mock_cache):
+    agent = Agent()
+    agent.cache_proposals = True
+    mock_cache.get.return_value = '{"prs": [{"title": "Cached"}]}'
+
+    assert list(agent.stream_prs("instruction")) == [{"title": "Cached"}]
+    mock_genai.GenerativeModel.return_value.generate_content.assert_not_called()
+
+def test_review_pr_files_small_diff_single_call(mock_genai, mock_config, mock_codebase, mock_rate_limiter):
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value = MagicMock(text="LGTM")
+    agent = Agent()
+
+    files = [{"filename": "a.py", "status": "modified", "additions": 1, "deletions": 0, "patch": "@@ -1 +1 @@\n+x"}]
+    assert agent.review_pr_files({"title": "T", "body": "B"}, files) == "LGTM"
+    assert mock_model.generate_content.call_count == 1
+
+def test_review_pr_files_map_reduce(mock_genai, mock_config, mock_codebase, mock_rate_limiter):
+    import threading
+    import time
+
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+    prompts = []
+
+    def generate(prompt):
+        with lock:
+            prompts.append(prompt)
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.02)
+        with lock:
+            active["now"] -= 1
+        return MagicMock(text="merged" if "Merge the findings" in prompt else "- finding")
+
+    mock_genai.GenerativeModel.return_value.generate_content.side_effect = generate
+    agent = Agent()
+    agent.review_chunk_tokens = 200
+    files = [
+        {"filename": f"f{i}.py", "status": "modified", "additions": 20, "deletions": 0, "patch": "@@ -1 +1 @@\n" + "+x" * 300}
+        for i in range(6)
+    ]
+
+    review = agent.review_pr_files({"title": "T", "body": "B"}, files, concurrency=3)
+
+    assert review == "merged"
+    chunk_prompts = [p for p in prompts if "Below is part" in p]
+    assert len(chunk_prompts) >= 6
+    assert "Merge the findings" in prompts[-1]
+    assert active["max"] == 3
+
+def test_triage_prs_formats_prompt_and_parses_scores(mock_genai, mock_config, mock_codebase, mock_rate_limiter):
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value = MagicMock(
+        text='```json\n{"results": [{"number": 1, "summary": "s", "focus_score": 7, "reason": "r"}]}\n```'
+    )
+    agent = Agent()
+
+    results = agent.triage_prs(["## PR #1: One", "## PR #2: Two"])
+
+    assert results == [{"number": 1, "summary": "s", "focus_score": 7, "reason": "r"}]
+    prompt = mock_model.generate_content.call_args[0][0]
+    assert "following 2 PRs" in prompt
+    assert "## PR #1: One\n\n## PR #2: Two" in prompt
+    assert '"results": [' in prompt
+
+def test_triage_prs_recovers_truncated_response(mock_genai, mock_config, mock_codebase, mock_rate_limiter, mock_cache):
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value = MagicMock(
+        text='{"results": [{"number": 1, "focus_score": 3}, {"number": 2, "focus'
+    )
+    agent = Agent()
+
+    assert agent.triage_prs(["## PR #1", "## PR #2"]) == [{"number": 1, "focus_score": 3}]
+    mock_cache.set.assert_not_called()
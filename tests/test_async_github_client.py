@@ -0,0 +1,256 @@
+import asyncio
+import base64
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+import pytest
+from pr_assistant.async_github_client import AsyncGitHubClient, ETagCache, GitHubAPIError
+from pr_assistant.rate_limiter import TokenBucket
+
+PULL = {
+    "number": 7,
+    "title": "Add feature",
+    "body": "Details",
+    "html_url": "https://github.com/owner/repo/pull/7",
+    "user": {"login": "octocat"},
+    "labels": [{"name": "bug"}],
+    "created_at": "2024-01-01T00:00:00Z",
+}
+FILES = [{"filename": "a.py", "status": "modified", "additions": 1, "deletions": 0, "patch": "@@ -1 +1 @@"}]
+
+
+class MockGitHub:
+    """A tiny in-process GitHub REST API that records every request."""
+    def __init__(self):
+        self.requests = []
+        self.contents = {"existing.py": "old-sha"}
+        self.rate_limited = 0
+        self.rate_headers = {}
+        self.routes = [
+            ("GET", r"/repos/owner/repo$", lambda m, body: (200, {"id": 1, "default_branch": "develop"})),
+            ("GET", r"/repos/owner/repo/pulls/(\d+)$", self.get_pull),
+            ("GET", r"/repos/owner/repo/pulls/(\d+)/files$", lambda m, body: (200, FILES)),
+            ("GET", r"/repos/owner/repo/pulls$", lambda m, body: (200, [PULL])),
+            ("POST", r"/repos/owner/repo/pulls$", lambda m, body: (201, {"html_url": "https://github.com/owner/repo/pull/8"})),
+            ("GET", r"/repos/owner/repo/git/ref/heads/(.+)$", lambda m, body: (200, {"object": {"sha": "base-sha"}})),
+            ("POST", r"/repos/owner/repo/git/refs$", lambda m, body: (201, {"ref": body["ref"]})),
+            ("GET", r"/repos/owner/repo/contents/(.+)$", self.get_contents),
+            ("PUT", r"/repos/owner/repo/contents/(.+)$", lambda m, body: (201, {"content": {}})),
+            ("POST", r"/repos/owner/repo/issues/(\d+)/comments$", self.post_comment),
+        ]
+
+    def post_comment(self, match, body):
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return 429, {"message": "You have exceeded a secondary rate limit"}
+        return 201, {"id": 1}
+
+    def get_pull(self, match, body):
+        if match.group(1) != "7":
+            return 404, {"message": "Not Found"}
+        return 200, PULL
+
+    def get_contents(self, match, body):
+        sha = self.contents.get(match.group(1))
+        return (200, {"sha": sha}) if sha else (404, {"message": "Not Found"})
+
+    def handle(self, handler):
+        path = handler.path.split("?")[0]
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = json.loads(handler.rfile.read(length)) if length else None
+        self.requests.append((handler.command, handler.path, dict(handler.headers), body))
+
+        for method, pattern, route in self.routes:
+            match = re.match(pattern, path)
+            if method == handler.command and match:
+                status, payload = route(match, body)
+                break
+        else:
+            status, payload = 404, {"message": "Not Found"}
+
+        data = json.dumps(payload).encode()
+        etag = f'"{hash(data)}"'
+        if handler.command == "GET" and status == 200 and handler.headers.get("If-None-Match") == etag:
+            handler.send_response(304)
+            handler.send_header("ETag", etag)
+            handler.end_headers()
+            return
+        handler.send_response(status)
+        for name, value in self.rate_headers.items():
+            handler.send_header(name, value)
+        if status == 429:
+            handler.send_header("Retry-After", "0")
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        if handler.command == "GET":
+            handler.send_header("ETag", etag)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def count(self, method, path_prefix):
+        return sum(1 for m, p, _, _ in self.requests if m == method and p.startswith(path_prefix))
+
+
+@pytest.fixture
+def github_server():
+    api = MockGitHub()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        do_GET = do_POST = do_PUT = lambda self: api.handle(self)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    api.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield api
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    # Keeps the repository metadata cache out of the real home directory.
+    monkeypatch.setattr("pathlib.Path.home", lambda: tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def mock_config():
+    mock_conf = MagicMock()
+    mock_conf.get.side_effect = lambda k, default=None: "dummy_token" if k == "github_token" else ("owner/repo" if k == "repo_name" else default)
+    return mock_conf
+
+
+def run(client, coro_fn):
+    async def main():
+        async with client:
+            return await coro_fn(client)
+    return asyncio.run(main())
+
+
+def test_get_pr_details_and_diff(github_server, mock_config):
+    client = AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache())
+    details, diff = run(client, lambda c: c.get_pr(7))
+
+    assert details == {"title": "Add feature", "body": "Details", "url": PULL["html_url"], "user": "octocat"}
+    assert "File: a.py\nStatus: modified\nChanges: +1 -0" in diff
+    headers = github_server.requests[0][2]
+    assert headers["Authorization"] == "Bearer dummy_token"
+
+def test_concurrent_pull_lookups_share_one_request(github_server, mock_config):
+    client = AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache())
+
+    async def lookups(c):
+        return await asyncio.gather(*(c.get_pr_details(7) for _ in range(5)))
+
+    results = run(client, lookups)
+    assert len(results) == 5
+    assert github_server.count("GET", "/repos/owner/repo/pulls/7") == 1
+
+def test_etag_revalidation(github_server, mock_config):
+    cache = ETagCache()
+    run(AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=cache), lambda c: c.get_pr_details(7))
+    details = run(AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=cache), lambda c: c.get_pr_details(7))
+
+    assert details["title"] == "Add feature"
+    second = github_server.requests[-1][2]
+    assert "If-None-Match" in second
+
+def test_list_prs(github_server, mock_config):
+    client = AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache())
+    prs = run(client, lambda c: c.list_prs("open"))
+
+    assert prs == [{
+        "number": 7, "title": "Add feature", "url": PULL["html_url"], "user": "octocat",
+        "labels": ["bug"], "created_at": "2024-01-01T00:00:00Z",
+    }]
+
+def test_write_operations(github_server, mock_config):
+    client = AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache())
+
+    async def writes(c):
+        await c.create_branch("feature")
+        await c.create_file("new.py", "msg", "print(1)", "feature")
+        await c.create_file("existing.py", "msg", "print(2)", "feature")
+        await c.post_comment(7, "LGTM")
+        return await c.create_pr("Title", "Body", "feature")
+
+    url = run(client, writes)
+    assert url == "https://github.com/owner/repo/pull/8"
+
+    puts = [body for method, _, _, body in github_server.requests if method == "PUT"]
+    assert base64.b64decode(puts[0]["content"]) == b"print(1)"
+    assert "sha" not in puts[0]
+    assert puts[1]["sha"] == "old-sha"
+    refs = [body for method, path, _, body in github_server.requests if path.endswith("/git/refs")]
+    assert refs == [{"ref": "refs/heads/feature", "sha": "base-sha"}]
+    pulls = [body for method, path, _, body in github_server.requests if method == "POST" and path.endswith("/pulls")]
+    assert pulls[0]["base"] == "develop"
+    assert github_server.count("GET", "/repos/owner/repo/git/ref/heads/develop") == 1
+
+def test_default_branch_and_base_sha_shared_across_clients(github_server, mock_config):
+    async def branches(c):
+        await c.create_branch("one")
+        await c.create_branch("two")
+
+    run(AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache()), branches)
+    run(AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache()), branches)
+
+    assert sum(1 for m, p, _, _ in github_server.requests if p == "/repos/owner/repo") == 1
+    assert github_server.count("GET", "/repos/owner/repo/git/ref/heads/") == 1
+    assert github_server.count("POST", "/repos/owner/repo/git/refs") == 4
+
+def test_api_errors_raise(github_server, mock_config):
+    client = AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache())
+    with pytest.raises(GitHubAPIError) as exc:
+        run(client, lambda c: c.get_pr_details(99))
+    assert exc.value.status_code == 404
+
+def test_missing_resources_raise_on_writes(github_server, mock_config):
+    # Only reads are routed, so every POST and PUT gets a 404.
+    github_server.routes = [r for r in github_server.routes if r[0] == "GET"]
+
+    for write in (
+        lambda c: c.post_comment(99, "LGTM"),
+        lambda c: c.create_branch("feature"),
+        lambda c: c.create_pr("Title", "Body", "feature"),
+        lambda c: c.create_file("new.py", "msg", "print(1)", "feature"),
+    ):
+        with pytest.raises(GitHubAPIError) as exc:
+            run(AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache()), write)
+        assert exc.value.status_code == 404
+
+def test_rate_limited_request_retried_after_retry_after(github_server, mock_config):
+    github_server.rate_limited = 2
+    bucket = TokenBucket(rate=100, capacity=100)
+    client = AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache(), rate_bucket=bucket)
+
+    run(client, lambda c: c.post_comment(7, "hi"))
+
+    assert github_server.count("POST", "/repos/owner/repo/issues/7/comments") == 3
+
+def test_rate_limit_gives_up_after_retries(github_server, mock_config):
+    github_server.rate_limited = 5
+    client = AsyncGitHubClient(
+        mock_config, base_url=github_server.url, etag_cache=ETagCache(),
+        rate_bucket=TokenBucket(rate=100, capacity=100), max_rate_limit_retries=1,
+    )
+    with pytest.raises(GitHubAPIError) as exc:
+        run(client, lambda c: c.post_comment(7, "hi"))
+    assert exc.value.status_code == 429
+
+def test_bucket_follows_rate_limit_headers(github_server, mock_config):
+    github_server.rate_headers = {"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "3"}
+    bucket = TokenBucket(rate=1, capacity=100)
+    client = AsyncGitHubClient(mock_config, base_url=github_server.url, etag_cache=ETagCache(), rate_bucket=bucket)
+
+    run(client, lambda c: c.get_pr_details(7))
+
+    assert bucket.capacity == 5000
+    assert bucket.tokens <= 3.5
@@ -0,0 +1,61 @@
+import os
+import time
+from pr_assistant.cache import ResponseCache, cache_key
+
+def test_cache_key_depends_on_all_inputs():
+    base = cache_key("model", "prompt", "persona")
+    assert base == cache_key("model", "prompt", "persona")
+    assert base != cache_key("other", "prompt", "persona")
+    assert base != cache_key("model", "prompt!", "persona")
+    assert base != cache_key("model", "prompt", "Security Expert")
+
+def test_cache_set_and_get(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path)
+    assert cache.get("k") is None
+
+    cache.set("k", "response")
+    assert cache.get("k") == "response"
+    assert ResponseCache(cache_dir=tmp_path).get("k") == "response"
+
+def test_cache_ttl_expiry(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path, ttl_seconds=60)
+    cache.set("k", "response")
+
+    cache.ttl_seconds = -1
+    assert cache.get("k") is None
+    assert not (tmp_path / "k.json").exists()
+
+def test_cache_ttl_counts_from_last_use(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path, ttl_seconds=60)
+    cache.set("used", "response")
+    cache.set("unused", "response")
+    past = time.time() - 80
+    for key in ("used", "unused"):
+        os.utime(tmp_path / f"{key}.json", (past, past))
+    os.utime(tmp_path / "used.json")  # read a moment ago
+
+    # get and eviction agree on which entry expired.
+    cache._evict()
+    assert not (tmp_path / "unused.json").exists()
+    assert cache.get("used") == "response"
+
+def test_cache_lru_eviction(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path, max_bytes=10_000)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.set(key, "x" * 3000)
+        past = time.time() - 100 + i
+        os.utime(tmp_path / f"{key}.json", (past, past))
+
+    cache.get("a")  # "a" becomes the most recently used entry
+    cache.set("d", "x" * 3000)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.get("d") is not None
+
+def test_cache_clear(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path)
+    cache.set("k", "response")
+    cache.clear()
+    assert cache.get("k") is None
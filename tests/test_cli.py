@@ -1,3 +1,4 @@
+import json
 import pytest
 from typer.testing import CliRunner
 from unittest.mock import MagicMock
@@ -5,6 +6,12 @@ from pr_assistant.main import app
 
 runner = CliRunner()
 
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    # Keeps the job queue and caches out of the real home directory.
+    monkeypatch.setattr("pathlib.Path.home", lambda: tmp_path)
+    return tmp_path
+
 @pytest.fixture
 def mock_deps(monkeypatch):
     # Mock everything main.py uses
@@ -13,10 +20,13 @@ def mock_deps(monkeypatch):
     monkeypatch.setattr("pr_assistant.main.ConfigManager", lambda: mock_conf)
     
     mock_agent = MagicMock()
-    monkeypatch.setattr("pr_assistant.main.Agent", lambda *args: mock_agent)
+    monkeypatch.setattr("pr_assistant.main.Agent", lambda *args, **kwargs: mock_agent)
     
     mock_gh = MagicMock()
-    monkeypatch.setattr("pr_assistant.main.GitHubClient", lambda *args: mock_gh)
+    mock_gh.default_branch = "main"
+    mock_gh.repo_name = "owner/repo"
+    mock_gh.commit_files.return_value = "c0ffee"
+    monkeypatch.setattr("pr_assistant.main.GitHubClient", lambda *args, **kwargs: mock_gh)
     
     return mock_conf, mock_agent, mock_gh
 
@@ -51,16 +61,29 @@ def test_create_command(mock_deps):
     assert result.exit_code == 0
     assert "PR Created: http://url" in result.stdout
     mock_agent.propose_prs.assert_called_with("Improve code quality", 1)
-    mock_gh.create_branch.assert_called()
-    mock_gh.create_file.assert_called()
+    mock_gh.commit_files.assert_called_with(
+        "branch", [{"path": "f.py", "content": "c"}], "feat: Test PR", source_branch="main"
+    )
     mock_gh.create_pr.assert_called()
 
+def test_create_command_local(mock_deps, monkeypatch):
+    _, mock_agent, mock_gh = mock_deps
+    clients = []
+    monkeypatch.setattr("pr_assistant.main.GitHubClient", lambda *args, **kwargs: clients.append(kwargs) or mock_gh)
+    monkeypatch.setattr("pr_assistant.main.LocalRepo", lambda: "local-clone")
+    mock_agent.propose_prs.return_value = []
+
+    result = runner.invoke(app, ["create", "1", "--local"])
+
+    assert result.exit_code == 0
+    assert clients == [{"local_repo": "local-clone"}]
+
 def test_list_prs_command(mock_deps):
     _, _, mock_gh = mock_deps
     
-    mock_gh.list_prs.return_value = [
+    mock_gh.iter_prs.return_value = iter([
         {"number": 1, "title": "PR 1", "user": "user", "url": "url"}
-    ]
+    ])
     
     result = runner.invoke(app, ["list-prs"])
     
@@ -68,13 +91,26 @@ def test_list_prs_command(mock_deps):
     assert "PR 1" in result.stdout
     assert "Listing open PRs" in result.stdout
 
+def test_list_prs_json_with_filters(mock_deps):
+    import json
+    from datetime import datetime
+    _, _, mock_gh = mock_deps
+    prs = [{"number": n, "title": f"PR {n}", "user": "u", "url": "url", "labels": [], "created_at": "2024-01-02T00:00:00+00:00"} for n in (2, 1)]
+    mock_gh.iter_prs.return_value = iter(prs)
+
+    result = runner.invoke(app, ["list-prs", "--state", "closed", "--limit", "2", "--since", "2024-01-01", "--json"])
+
+    assert result.exit_code == 0
+    assert [json.loads(line) for line in result.stdout.splitlines()] == prs
+    mock_gh.iter_prs.assert_called_with("closed", since=datetime(2024, 1, 1), limit=2)
+
 def test_review_pr_command(mock_deps):
     _, mock_agent, mock_gh = mock_deps
     
     mock_gh.get_pr_details.return_value = {"title": "Test PR", "body": "Description"}
-    mock_gh.get_pr_diff.return_value = "diff content"
+    mock_gh.get_pr_files.return_value = [{"filename": "a.py", "status": "modified", "additions": 1, "deletions": 0, "patch": "+x"}]
     
-    mock_agent.review_pr.return_value = "LGTM"
+    mock_agent.review_pr_files.return_value = "LGTM"
     
     result = runner.invoke(app, ["review-pr", "123"])
     
@@ -85,6 +121,246 @@ def test_review_pr_command(mock_deps):
     assert "Review posted successfully" in result.stdout
     
     mock_gh.get_pr_details.assert_called_with(123)
-    mock_gh.get_pr_diff.assert_called_with(123)
-    mock_agent.review_pr.assert_called()
+    mock_gh.get_pr_files.assert_called_with(123)
+    mock_agent.review_pr_files.assert_called()
+    assert mock_agent.review_pr_files.call_args.kwargs["concurrency"] == 4
     mock_gh.post_comment.assert_called()
+
+def test_no_cache_flag(mock_deps, monkeypatch):
+    _, mock_agent, mock_gh = mock_deps
+    mock_agent_cls = MagicMock(return_value=mock_agent)
+    monkeypatch.setattr("pr_assistant.main.Agent", mock_agent_cls)
+    mock_gh.get_pr_details.return_value = {"title": "Test PR", "body": "Description"}
+    mock_agent.review_pr_files.return_value = "LGTM"
+
+    result = runner.invoke(app, ["review-pr", "123", "--no-cache"])
+    assert result.exit_code == 0
+    assert mock_agent_cls.call_args.kwargs["use_cache"] is False
+
+    runner.invoke(app, ["review-pr", "123"])
+    assert mock_agent_cls.call_args.kwargs["use_cache"] is True
+
+def test_review_batch_command(mock_deps):
+    _, mock_agent, mock_gh = mock_deps
+
+    mock_gh.list_prs.return_value = [
+        {"number": 1, "title": "PR 1", "user": "alice", "url": "url", "labels": ["bug"]},
+        {"number": 2, "title": "PR 2", "user": "bob", "url": "url", "labels": []},
+    ]
+    mock_gh.get_pr_details.side_effect = lambda n: {"title": f"PR {n}", "body": ""}
+    mock_agent.review_pr_files.return_value = "LGTM"
+
+    result = runner.invoke(app, ["review-batch", "--label", "bug"])
+
+    assert result.exit_code == 0
+    assert "Reviewing 1 PRs" in result.stdout
+    assert "1 succeeded, 0 failed" in result.stdout
+    mock_gh.post_comment.assert_called_once()
+    assert mock_gh.post_comment.call_args[0][0] == 1
+
+def test_review_batch_explicit_numbers(mock_deps):
+    _, mock_agent, mock_gh = mock_deps
+    mock_gh.get_pr_details.side_effect = lambda n: {"title": f"PR {n}", "body": ""}
+    mock_agent.review_pr_files.return_value = "LGTM"
+
+    result = runner.invoke(app, ["review-batch", "5", "6", "--dry-run"])
+
+    assert result.exit_code == 0
+    assert "Reviewed 2 PRs" in result.stdout
+    mock_gh.list_prs.assert_not_called()
+    mock_gh.post_comment.assert_not_called()
+
+def test_create_command_report(mock_deps, tmp_path):
+    _, mock_agent, mock_gh = mock_deps
+    mock_agent.propose_prs.return_value = [
+        {"title": "Good", "body": "", "branch": "good", "files": []},
+        {"title": "Bad", "body": "", "branch": "bad", "files": []},
+    ]
+    mock_gh.commit_files.side_effect = lambda branch, *a, **k: (_ for _ in ()).throw(ValueError("nope")) if branch == "bad" else None
+    mock_gh.create_pr.return_value = "http://url"
+    report = tmp_path / "report.json"
+
+    result = runner.invoke(app, ["create", "2", "--concurrency", "2", "--report", str(report)])
+
+    assert result.exit_code == 0
+    assert "PR Creation Results" in result.stdout
+    assert "Failed to create PR bad: nope" in result.stdout
+    data = json.loads(report.read_text())
+    assert [(r["branch"], r["status"]) for r in data] == [("good", "created"), ("bad", "failed")]
+
+def test_create_command_stream(mock_deps):
+    _, mock_agent, mock_gh = mock_deps
+    mock_agent.stream_prs.return_value = iter([{"title": "Streamed", "body": "", "branch": "s", "files": []}])
+    mock_gh.create_pr.return_value = "http://url"
+
+    result = runner.invoke(app, ["create", "1", "--stream"])
+
+    assert result.exit_code == 0
+    assert "Preparing PR: Streamed" in result.stdout
+    assert "PR Created: http://url" in result.stdout
+    mock_agent.stream_prs.assert_called_with("Improve code quality", 1)
+    mock_agent.propose_prs.assert_not_called()
+
+def test_review_pr_incremental(mock_deps):
+    _, mock_agent, mock_gh = mock_deps
+    mock_gh.get_pr_details.return_value = {"title": "Test PR", "body": "", "head_sha": "b" * 40}
+    mock_gh.find_comment.return_value = {"id": 5, "body": "## AI Review (X)\n\nold\n\n<!-- pr-assistant:head=" + "a" * 40 + " -->"}
+    mock_gh.compare_files.return_value = [{"filename": "a.py", "status": "modified", "additions": 1, "deletions": 0, "patch": "+x"}]
+    mock_agent.review_pr_files.return_value = "Follow-up"
+
+    result = runner.invoke(app, ["review-pr", "123"])
+
+    assert result.exit_code == 0
+    assert "Reviewing changes since aaaaaaa" in result.stdout
+    assert "Review comment updated successfully" in result.stdout
+    mock_gh.get_pr_files.assert_not_called()
+    mock_gh.post_comment.assert_not_called()
+    mock_gh.update_comment.assert_called_once()
+
+def test_review_pr_up_to_date(mock_deps):
+    _, mock_agent, mock_gh = mock_deps
+    mock_gh.get_pr_details.return_value = {"title": "Test PR", "body": "", "head_sha": "a" * 40}
+    mock_gh.find_comment.return_value = {"id": 5, "body": "<!-- pr-assistant:head=" + "a" * 40 + " -->"}
+
+    result = runner.invoke(app, ["review-pr", "123"])
+
+    assert result.exit_code == 0
+    assert "no new commits" in result.stdout
+    mock_agent.review_pr_files.assert_not_called()
+
+def test_triage_command(mock_deps):
+    _, mock_agent, mock_gh = mock_deps
+    mock_gh.iter_prs.return_value = iter([
+        {"number": 1, "title": "Typo fix", "user": "alice", "url": "url", "head_sha": None},
+        {"number": 2, "title": "Auth rewrite", "user": "bob", "url": "url", "head_sha": None},
+    ])
+    mock_gh.get_pr_details.side_effect = lambda n: {"title": f"PR {n}", "body": ""}
+    mock_gh.get_pr_files.return_value = []
+    mock_agent.triage_prs.return_value = [
+        {"number": 1, "summary": "Fixes a typo", "focus_score": 2, "reason": "trivial"},
+        {"number": 2, "summary": "Rewrites login", "focus_score": 9, "reason": "security"},
+    ]
+
+    result = runner.invoke(app, ["triage", "--json", "--no-cache"])
+
+    assert result.exit_code == 0
+    rows = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(r["number"], r["focus_score"]) for r in rows] == [(2, 9), (1, 2)]
+    mock_gh.iter_prs.assert_called_with("open", limit=None)
+
+def test_serve_requires_a_secret(mock_deps, monkeypatch):
+    mock_conf, _, _ = mock_deps
+    mock_conf.get.return_value = None
+    monkeypatch.delenv("GITHUB_WEBHOOK_SECRET", raising=False)
+
+    result = runner.invoke(app, ["serve"])
+
+    assert "GITHUB_WEBHOOK_SECRET" in result.stdout
+
+def test_serve_reuses_one_agent_and_client(mock_deps, monkeypatch):
+    mock_conf, mock_agent, mock_gh = mock_deps
+    mock_conf.get.return_value = None
+    monkeypatch.setenv("GITHUB_WEBHOOK_SECRET", "s3cret")
+    mock_agent_cls = MagicMock(return_value=mock_agent)
+    monkeypatch.setattr("pr_assistant.main.Agent", mock_agent_cls)
+    mock_gh.repo_name = "owner/repo"
+    mock_gh.get_pr_details.return_value = {"title": "Test PR", "body": ""}
+    mock_gh.get_pr_files.return_value = [{"filename": "a.py", "status": "modified", "additions": 1, "deletions": 0, "patch": "+x"}]
+    mock_agent.review_pr_files.return_value = "LGTM"
+    statuses = []
+
+    def fake_run(server, host, port, on_start=None):
+        assert (server.secret, server.repo_name, server.workers) == ("s3cret", "owner/repo", 2)
+        statuses.extend(server.review(n) for n in (1, 2))
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr("pr_assistant.webhook.WebhookServer.run", fake_run)
+
+    result = runner.invoke(app, ["serve", "--workers", "2"])
+
+    assert result.exit_code == 0
+    assert "Stopped after" in result.stdout
+    assert statuses == ["posted", "posted"]
+    mock_agent_cls.assert_called_once()
+    assert mock_gh.post_comment.call_count == 2
+
+def test_replay_webhook_command(mock_deps, monkeypatch, tmp_path):
+    mock_conf, _, _ = mock_deps
+    mock_conf.get.return_value = "s3cret"
+    payload = tmp_path / "event.json"
+    payload.write_text('{"action": "opened"}')
+    replay = MagicMock(return_value=(202, {"status": "queued"}))
+    monkeypatch.setattr("pr_assistant.webhook.replay_webhook", replay)
+
+    result = runner.invoke(app, ["replay-webhook", str(payload), "--delivery", "d-1"])
+
+    assert "202 queued" in result.stdout
+    replay.assert_called_once_with(
+        "http://127.0.0.1:8080/webhook", b'{"action": "opened"}', "s3cret", "pull_request", "d-1"
+    )
+
+def test_failed_review_is_listed_and_resumed(mock_deps):
+    mock_conf, mock_agent, mock_gh = mock_deps
+    mock_conf.get.side_effect = lambda key, default=None: "owner/repo" if key == "repo_name" else default
+    mock_gh.get_pr_details.return_value = {"title": "Test PR", "body": ""}
+    mock_gh.get_pr_files.return_value = []
+    mock_agent.review_pr_files.return_value = "LGTM"
+    mock_gh.post_comment.side_effect = [ValueError("comments are locked"), None]
+
+    result = runner.invoke(app, ["review-pr", "7", "--retries", "0"])
+    assert "comments are locked" in result.stdout
+    assert "pr-assistant jobs --resume" in result.stdout
+
+    result = runner.invoke(app, ["jobs"])
+    assert result.exit_code == 0
+    assert "PR #7" in result.stdout
+    assert "failed" in result.stdout
+    assert "review" in result.stdout
+
+    result = runner.invoke(app, ["jobs", "--resume"])
+    assert result.exit_code == 0
+    assert "Resuming 1 jobs (1 previously failed)" in result.stdout
+    assert "done" in result.stdout
+    # The stored review is posted without asking the model again.
+    assert mock_agent.review_pr_files.call_count == 1
+    assert mock_gh.post_comment.call_count == 2
+
+    result = runner.invoke(app, ["jobs", "--resume"])
+    assert "No unfinished jobs." in result.stdout
+
+def test_review_pr_full_after_failure_reviews_again(mock_deps):
+    _, mock_agent, mock_gh = mock_deps
+    mock_gh.get_pr_details.return_value = {"title": "Test PR", "body": ""}
+    mock_gh.get_pr_files.return_value = []
+    mock_agent.review_pr_files.side_effect = ["first", "second"]
+    mock_gh.post_comment.side_effect = [ValueError("comments are locked"), None]
+
+    runner.invoke(app, ["review-pr", "7", "--retries", "0"])
+    result = runner.invoke(app, ["review-pr", "7", "--full"])
+
+    assert result.exit_code == 0
+    # Different options make a fresh start instead of posting the recorded review.
+    assert "second" in result.stdout
+    assert mock_agent.review_pr_files.call_count == 2
+
+def test_jobs_resume_keeps_each_jobs_options(mock_deps, monkeypatch):
+    _, mock_agent, mock_gh = mock_deps
+    clients = []
+    monkeypatch.setattr("pr_assistant.main.GitHubClient", lambda *args, **kwargs: clients.append(kwargs) or mock_gh)
+    monkeypatch.setattr("pr_assistant.main.LocalRepo", lambda: "local-clone")
+    mock_agent_cls = MagicMock(return_value=mock_agent)
+    monkeypatch.setattr("pr_assistant.main.Agent", mock_agent_cls)
+    mock_gh.get_pr_details.return_value = {"title": "Test PR", "body": ""}
+    mock_gh.get_pr_files.return_value = []
+    mock_agent.review_pr_files.side_effect = [ConnectionError("reset"), "LGTM"]
+
+    runner.invoke(app, ["review-pr", "7", "--local", "--no-cache", "--concurrency", "2", "--retries", "0"])
+    clients.clear()
+    mock_agent_cls.reset_mock()
+
+    result = runner.invoke(app, ["jobs", "--resume"])
+
+    assert result.exit_code == 0
+    assert {"local_repo": "local-clone"} in clients
+    assert mock_agent_cls.call_args.kwargs["use_cache"] is False
+    assert mock_agent.review_pr_files.call_args.kwargs["concurrency"] == 2
@@ -55,3 +55,112 @@ def test_codebase_reader_content(mock_repo):
     
     assert "test.log" not in content
     assert "ignored_dir/secret.py" not in content
+
+def _age_tree(root, seconds=60):
+    """Backdates every directory so the snapshot treats listings as stable."""
+    past = os.stat(root).st_mtime - seconds
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (past, past))
+
+def test_snapshot_persisted(mock_repo):
+    reader = CodebaseReader(root_dir=str(mock_repo))
+    reader.get_file_structure()
+
+    assert (mock_repo / ".pr_assistant" / "snapshot.json").exists()
+    assert ".pr_assistant/" not in reader.get_file_structure()
+
+def test_snapshot_reuses_unchanged_dirs(mock_repo, monkeypatch):
+    first = CodebaseReader(root_dir=str(mock_repo)).get_file_structure()
+    _age_tree(mock_repo)
+    CodebaseReader(root_dir=str(mock_repo)).get_file_structure()
+
+    reader = CodebaseReader(root_dir=str(mock_repo))
+    listed = []
+    original = reader._list_dir
+    monkeypatch.setattr(reader, "_list_dir", lambda full_dir, rel_dir="": listed.append(full_dir) or original(full_dir, rel_dir))
+
+    assert reader.get_file_structure() == first
+    assert listed == []
+
+    # Only the changed directory is listed again.
+    (mock_repo / "src" / "new.py").write_text("new")
+    reader = CodebaseReader(root_dir=str(mock_repo))
+    monkeypatch.setattr(reader, "_list_dir", lambda full_dir, rel_dir="": listed.append(full_dir) or original(full_dir, rel_dir))
+    assert "new.py" in reader.get_file_structure()
+    assert listed == [str(mock_repo / "src")]
+
+def test_snapshot_detects_changes(mock_repo):
+    _age_tree(mock_repo)
+    CodebaseReader(root_dir=str(mock_repo)).get_file_structure()
+
+    (mock_repo / "src" / "new.py").write_text("new")
+    (mock_repo / "utils.py").unlink()
+
+    structure = CodebaseReader(root_dir=str(mock_repo)).get_file_structure()
+    assert "new.py" in structure
+    assert "utils.py" not in structure
+
+def test_snapshot_records_hashes(mock_repo):
+    reader = CodebaseReader(root_dir=str(mock_repo))
+    reader.read_files()
+
+    reloaded = CodebaseReader(root_dir=str(mock_repo))
+    assert "main.py" in reloaded.snapshot.files
+    assert reloaded.file_hash("main.py") == reloaded.snapshot.files["main.py"][2]
+
+def test_codebase_reader_without_snapshot(mock_repo):
+    reader = CodebaseReader(root_dir=str(mock_repo), use_snapshot=False)
+    assert "main.py" in reader.read_files()
+    assert not (mock_repo / ".pr_assistant").exists()
+
+def test_codebase_reader_nested_gitignore(mock_repo):
+    (mock_repo / "src" / ".gitignore").write_text("*.gen.py\n")
+    (mock_repo / "src" / "model.gen.py").write_text("generated")
+    (mock_repo / ".gitignore").write_text("*.log\nignored_dir/\n!keep.log\n")
+    (mock_repo / "keep.log").write_text("kept")
+
+    content = CodebaseReader(root_dir=str(mock_repo)).read_files()
+    assert "src/model.gen.py" not in content
+    assert "keep.log" in content
+    assert "test.log" not in content
+
+def test_snapshot_invalidated_by_gitignore_change(mock_repo):
+    (mock_repo / "src" / ".gitignore").write_text("# nothing yet\n")
+    CodebaseReader(root_dir=str(mock_repo)).get_file_structure()
+    _age_tree(mock_repo)
+    CodebaseReader(root_dir=str(mock_repo)).get_file_structure()
+
+    # Editing in place leaves the directory mtime untouched.
+    (mock_repo / "src" / ".gitignore").write_text("app.py\n")
+
+    structure = CodebaseReader(root_dir=str(mock_repo)).get_file_structure()
+    assert "app.py" not in structure
+
+def test_iter_files_streams_text_files(mock_repo):
+    reader = CodebaseReader(root_dir=str(mock_repo))
+    results = dict(reader.iter_files(extensions=[".py"], max_workers=2))
+
+    assert results == {"main.py": "print('hello')", "utils.py": "def util(): pass", "src/app.py": "app code"}
+
+def test_iter_files_skips_binary_and_large(mock_repo):
+    (mock_repo / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00binary")
+    (mock_repo / "big.txt").write_text("x" * 2048)
+
+    reader = CodebaseReader(root_dir=str(mock_repo))
+    content = dict(reader.iter_files(max_file_size=1024))
+
+    assert "image.png" not in content
+    assert "big.txt" not in content
+    assert "main.py" in content
+    assert "big.txt" in reader.read_files(max_file_size=None)
+
+def test_iter_files_can_stop_early(mock_repo):
+    for i in range(50):
+        (mock_repo / f"file{i}.txt").write_text(str(i))
+
+    reader = CodebaseReader(root_dir=str(mock_repo))
+    stream = reader.iter_files(max_workers=2)
+    first = next(stream)
+    stream.close()
+
+    assert len(first) == 2
@@ -34,3 +34,48 @@ def test_config_persistence(mock_config_manager):
     # Reload from disk
     new_manager = ConfigManager()
     assert new_manager.get("persistent") is True
+
+def test_config_parsed_once_per_process(mock_config_manager, monkeypatch):
+    import json
+    mock_config_manager.save({"a": 1, "b": 2})
+    calls = []
+    real_load = json.load
+    monkeypatch.setattr("pr_assistant.config.json.load", lambda f: calls.append(f.name) or real_load(f))
+
+    for _ in range(10):
+        assert mock_config_manager.get("a") == 1
+        assert ConfigManager().get("b") == 2
+
+    # Saving already primed the cache with what was written.
+    assert calls == []
+
+def test_config_cache_invalidated_by_external_write(mock_config_manager):
+    import json
+    mock_config_manager.save({"key": "old"})
+    assert mock_config_manager.get("key") == "old"
+
+    # Another process rewrites the file in place.
+    with open(mock_config_manager.global_config_path, "w") as f:
+        json.dump({"key": "new", "extra": True}, f)
+
+    assert mock_config_manager.get("key") == "new"
+
+def test_config_load_returns_a_copy(mock_config_manager):
+    mock_config_manager.save({"key": "value"})
+    mock_config_manager.load()["key"] = "changed"
+    assert mock_config_manager.get("key") == "value"
+
+def test_config_write_is_atomic(mock_config_manager, monkeypatch):
+    mock_config_manager.save({"key": "value"})
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("crash mid-write")
+
+    with monkeypatch.context() as m:
+        m.setattr("pr_assistant.config.json.dump", crash)
+        with pytest.raises(RuntimeError):
+            mock_config_manager.set("other", 1)
+
+    assert ConfigManager().load() == {"key": "value"}
+    leftovers = [p.name for p in mock_config_manager.global_config_dir.iterdir() if p.name.endswith(".tmp")]
+    assert leftovers == []
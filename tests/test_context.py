@@ -0,0 +1,72 @@
+import pytest
+from pr_assistant.codebase import CodebaseReader
+from pr_assistant.context import ContextPacker, estimate_tokens, extract_terms
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "db").mkdir()
+    (tmp_path / "db" / "database.py").write_text("class Database:\n    def query(self, sql): pass\n")
+    (tmp_path / "db" / "models.py").write_text("# rows loaded from the database\nclass User: pass\n")
+    (tmp_path / "cli.py").write_text("import sys\nprint(sys.argv)\n")
+    (tmp_path / "README.md").write_text("# Project\n")
+    return tmp_path
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+def test_extract_terms():
+    assert extract_terms("Optimize the DatabaseLayer and query_cache") == [
+        "optimize", "database", "layer", "query", "cache"
+    ]
+
+def test_rank_files_by_relevance(repo):
+    packer = ContextPacker(CodebaseReader(str(repo)))
+    ranked = [path for path, _, _ in packer.rank_files("optimize the database layer")]
+
+    assert ranked[0] == "db/database.py"
+    assert ranked[1] == "db/models.py"
+    assert set(ranked) == {"db/database.py", "db/models.py", "cli.py", "README.md"}
+
+def test_rank_files_reads_only_changed_files(repo, monkeypatch):
+    ContextPacker(CodebaseReader(str(repo))).rank_files("database")
+
+    codebase = CodebaseReader(str(repo))
+    reads = []
+    read_file = codebase.read_file
+    monkeypatch.setattr(codebase, "read_file", lambda path, *args: reads.append(path) or read_file(path, *args))
+    packer = ContextPacker(codebase)
+    assert packer.rank_files("database")[0][0] == "db/database.py"
+    assert reads == []
+
+    (repo / "cli.py").write_text("from db.database import Database\ndatabase = Database()\n" * 3)
+    ranked = [path for path, _, _ in packer.rank_files("database")]
+    assert reads == ["cli.py"]
+    assert ranked.index("cli.py") < ranked.index("README.md")
+
+def test_pack_includes_tree_and_contents(repo):
+    packer = ContextPacker(CodebaseReader(str(repo)), token_budget=10_000)
+    context = packer.pack("optimize the database layer")
+
+    assert context.startswith("Codebase Structure:")
+    assert "--- db/database.py ---\nclass Database:" in context
+    assert "--- cli.py ---" in context
+
+def test_pack_respects_budget(repo):
+    (repo / "db" / "huge.py").write_text("database = 1\n" * 2000)
+    packer = ContextPacker(CodebaseReader(str(repo)), token_budget=200)
+    context = packer.pack("database")
+
+    assert estimate_tokens(context) <= 200
+    assert "--- db/database.py ---" in context
+    assert "db/huge.py ---" not in context
+
+def test_pack_truncates_large_tree(repo):
+    for i in range(200):
+        (repo / f"module_{i}.py").write_text("")
+    packer = ContextPacker(CodebaseReader(str(repo)), token_budget=400)
+    context = packer.pack("anything")
+
+    assert "more entries)" in context
+    assert estimate_tokens(context) <= 400
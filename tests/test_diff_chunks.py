@@ -0,0 +1,52 @@
+from pr_assistant.context import estimate_tokens
+from pr_assistant.diff_chunks import chunk_diff, file_sections, split_hunks
+from pr_assistant.github_client import FILE_SEPARATOR, format_file_patch
+
+def make_file(name, patch):
+    return {"filename": name, "status": "modified", "additions": 1, "deletions": 1, "patch": patch}
+
+def make_hunk(start, lines):
+    return f"@@ -{start},{lines} +{start},{lines} @@\n" + "\n".join(f"+line {start + i} " + "x" * 60 for i in range(lines))
+
+def test_split_hunks():
+    patch = "@@ -1 +1 @@\n-a\n+b\n@@ -10 +10 @@\n-c\n+d\n"
+    assert split_hunks(patch) == ["@@ -1 +1 @@\n-a\n+b", "@@ -10 +10 @@\n-c\n+d"]
+
+def test_small_diff_is_one_chunk_in_the_usual_format():
+    files = [make_file("a.py", "@@ -1 +1 @@\n+a"), make_file("b.py", "@@ -1 +1 @@\n+b")]
+
+    chunks = chunk_diff(files, max_tokens=1000)
+
+    assert chunks == [FILE_SEPARATOR.join(format_file_patch(**f) for f in files)]
+
+def test_files_are_packed_within_budget():
+    files = [make_file(f"f{i}.py", make_hunk(1, 10)) for i in range(10)]
+
+    chunks = chunk_diff(files, max_tokens=500)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c) <= 500 for c in chunks)
+    joined = "".join(chunks)
+    assert all(f"File: f{i}.py\n" in joined for i in range(10))
+
+def test_large_file_is_split_between_hunks():
+    patch = "\n".join(make_hunk(i * 100, 10) for i in range(6))
+    sections = file_sections(make_file("big.py", patch), max_tokens=400)
+
+    assert len(sections) > 1
+    assert sections[0].startswith(f"File: big.py (part 1 of {len(sections)})")
+    assert all(estimate_tokens(s) <= 400 for s in sections)
+    # Every hunk survives intact in exactly one part.
+    for i in range(6):
+        assert sum(f"@@ -{i * 100},10" in s for s in sections) == 1
+
+def test_oversized_hunk_is_split_between_lines():
+    sections = file_sections(make_file("huge.py", make_hunk(1, 200)), max_tokens=500)
+
+    assert len(sections) > 1
+    assert all(estimate_tokens(s) <= 500 for s in sections)
+
+def test_missing_patch_is_kept_whole():
+    sections = file_sections(make_file("logo.png", None), max_tokens=10)
+    assert len(sections) == 1
+    assert "binary file or diff too large" in sections[0]
@@ -1,6 +1,16 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
 import pytest
 from unittest.mock import MagicMock, patch
 from pr_assistant.github_client import GitHubClient
+from pr_assistant.rate_limiter import TokenBucket
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    # Keeps the repository metadata cache out of the real home directory.
+    monkeypatch.setattr("pathlib.Path.home", lambda: tmp_path)
+    return tmp_path
 
 @pytest.fixture
 def mock_github(monkeypatch):
@@ -9,19 +19,23 @@ def mock_github(monkeypatch):
     
     monkeypatch.setattr("pr_assistant.github_client.Github", mock_gh)
     monkeypatch.setattr("pr_assistant.github_client.Auth.Token", mock_auth)
+    repo = mock_gh.return_value.get_repo.return_value
+    repo.id = 1
+    repo.default_branch = "main"
     
     return mock_gh
 
 @pytest.fixture
 def mock_config(monkeypatch):
     mock_conf = MagicMock()
-    mock_conf.get.side_effect = lambda k: "dummy_token" if k == "github_token" else "owner/repo"
+    mock_conf.get.side_effect = lambda k, default=None: "dummy_token" if k == "github_token" else ("owner/repo" if k == "repo_name" else default)
     monkeypatch.setattr("pr_assistant.github_client.ConfigManager", lambda: mock_conf)
     return mock_conf
 
 def test_github_client_init(mock_github, mock_config):
     client = GitHubClient()
     mock_github.assert_called_once()
+    assert mock_github.call_args.kwargs["lazy"] is True
     mock_github.return_value.get_repo.assert_called_with("owner/repo")
 
 def test_create_pr(mock_github, mock_config):
@@ -46,6 +60,44 @@ def test_create_branch(mock_github, mock_config):
     repo.get_branch.assert_called_with("main")
     repo.create_git_ref.assert_called_with(ref="refs/heads/new-branch", sha="sha123")
 
+def test_default_branch_detected_once(mock_github, mock_config):
+    repo = mock_github.return_value.get_repo.return_value
+    repo.default_branch = "develop"
+    repo.get_branch.return_value.commit.sha = "sha123"
+
+    client = GitHubClient()
+    client.create_branch("one")
+    client.create_branch("two")
+    client.create_pr("Title", "Body", "one")
+
+    repo.get_branch.assert_called_once_with("develop")
+    assert repo.create_pull.call_args.kwargs["base"] == "develop"
+
+    # A later command reads the detected branch and base SHA from disk.
+    repo.default_branch = "renamed"
+    GitHubClient().create_branch("three")
+    repo.get_branch.assert_called_once_with("develop")
+    assert repo.create_git_ref.call_args.kwargs["sha"] == "sha123"
+
+def test_local_repo_handles_commits_and_diffs(mock_github, mock_config):
+    repo = mock_github.return_value.get_repo.return_value
+    repo.get_pull.return_value.base.ref = "release"
+    repo.get_pull.return_value.head.sha = "abc"
+    local = MagicMock()
+    client = GitHubClient(mock_config, local_repo=local)
+    client.use_graphql = False
+
+    client.commit_files("feature", [{"path": "a.py", "content": "A"}], "msg", source_branch="main")
+    client.get_pr_details(3)
+    files = client.get_pr_files(3)
+
+    local.commit_files.assert_called_once_with("feature", [{"path": "a.py", "content": "A"}], "msg", "main")
+    local.fetch_pull.assert_called_once_with(3, "release", "abc")
+    local.pr_files.assert_called_once_with(3, "release", "abc")
+    assert files is local.pr_files.return_value
+    repo.create_git_blob.assert_not_called()
+    repo.get_pull.return_value.get_files.assert_not_called()
+
 def test_create_file_new(mock_github, mock_config):
     client = GitHubClient()
     repo = mock_github.return_value.get_repo.return_value
@@ -66,3 +118,287 @@ def test_create_file_update(mock_github, mock_config):
     client.create_file("path/file.txt", "msg", "content", "branch")
     
     repo.update_file.assert_called_with("path/file.txt", "msg", "content", "old_sha", branch="branch")
+
+def test_commit_files_new_branch(mock_github, mock_config):
+    client = GitHubClient()
+    repo = mock_github.return_value.get_repo.return_value
+    repo.get_branch.return_value.commit.sha = "base_sha"
+    repo.create_git_blob.side_effect = lambda content, encoding: MagicMock(sha=f"blob-{content}")
+    repo.create_git_commit.return_value.sha = "new_sha"
+
+    files = [{"path": "a.py", "content": "A"}, {"path": "b/c.py", "content": "C"}]
+    sha = client.commit_files("feature", files, "feat: change", source_branch="main")
+
+    assert sha == "new_sha"
+    repo.get_git_commit.assert_called_with("base_sha")
+    parent = repo.get_git_commit.return_value
+    elements, base_tree = repo.create_git_tree.call_args[0]
+    assert [(e._identity["path"], e._identity["sha"]) for e in elements] == [
+        ("a.py", "blob-A"), ("b/c.py", "blob-C")
+    ]
+    assert base_tree is parent.tree
+    repo.create_git_commit.assert_called_once_with("feat: change", repo.create_git_tree.return_value, [parent])
+    repo.create_git_ref.assert_called_once_with(ref="refs/heads/feature", sha="new_sha")
+    repo.create_file.assert_not_called()
+
+def test_commit_files_existing_branch(mock_github, mock_config):
+    client = GitHubClient()
+    repo = mock_github.return_value.get_repo.return_value
+    ref = repo.get_git_ref.return_value
+    ref.object.sha = "head_sha"
+    repo.create_git_blob.return_value.sha = "blob_sha"
+    repo.create_git_commit.return_value.sha = "new_sha"
+
+    client.commit_files("feature", [{"path": "a.py", "content": "A"}], "msg")
+
+    repo.get_git_ref.assert_called_with("heads/feature")
+    repo.get_git_commit.assert_called_with("head_sha")
+    ref.edit.assert_called_once_with("new_sha")
+    repo.create_git_ref.assert_not_called()
+
+def test_get_pr_diff_marks_missing_patches(mock_github, mock_config):
+    client = GitHubClient()
+    repo = mock_github.return_value.get_repo.return_value
+    text_file = MagicMock(filename="a.py", status="modified", additions=1, deletions=0, patch="@@ -1 +1 @@")
+    binary_file = MagicMock(filename="logo.png", status="added", additions=0, deletions=0, patch=None)
+    repo.get_pull.return_value.get_files.return_value = [text_file, binary_file]
+
+    files = client.get_pr_files(1)
+    diff = client.get_pr_diff(1)
+
+    assert files[1] == {"filename": "logo.png", "status": "added", "additions": 0, "deletions": 0, "patch": None}
+    assert "File: a.py" in diff and "@@ -1 +1 @@" in diff
+    assert "None" not in diff
+    assert "binary file or diff too large" in diff
+
+def test_compare_files(mock_github, mock_config):
+    from github import GithubException
+    client = GitHubClient()
+    repo = mock_github.return_value.get_repo.return_value
+    changed = MagicMock(filename="a.py", status="modified", additions=2, deletions=1, patch="@@")
+    repo.compare.return_value = MagicMock(status="ahead", files=[changed])
+
+    assert client.compare_files("old", "new") == [
+        {"filename": "a.py", "status": "modified", "additions": 2, "deletions": 1, "patch": "@@"}
+    ]
+    repo.compare.assert_called_with("old", "new")
+
+    repo.compare.return_value = MagicMock(status="diverged", files=[changed])
+    assert client.compare_files("old", "new") is None
+
+    repo.compare.side_effect = GithubException(404, {"message": "Not Found"})
+    assert client.compare_files("gone", "new") is None
+
+def test_find_and_update_comment(mock_github, mock_config):
+    from github import GithubException
+    mock_github.return_value.get_user.return_value.login = "bot"
+    client = GitHubClient()
+    pr = mock_github.return_value.get_repo.return_value.get_pull.return_value
+
+    def comment(id, body, login="bot"):
+        c = MagicMock(id=id, body=body)
+        c.user.login = login
+        return c
+
+    pr.get_issue_comments.return_value = [
+        comment(1, "## A\nmarker one"),
+        comment(2, "unrelated"),
+        comment(3, "## A\nmarker two"),
+        comment(4, "## B\nmarker three"),
+        comment(5, "## A\nmarker quoted by a human", login="octocat"),
+    ]
+
+    assert client.find_comment(9, "marker") == {"id": 4, "body": "## B\nmarker three"}
+    # Every text must match, and only the bot's own comments count.
+    assert client.find_comment(9, "## A", "marker") == {"id": 3, "body": "## A\nmarker two"}
+    assert client.find_comment(9, "missing") is None
+
+    client.update_comment(9, 3, "new body")
+    pr.get_issue_comment.assert_called_with(3)
+    pr.get_issue_comment.return_value.edit.assert_called_with("new body")
+
+    # Tokens that cannot look up their user (e.g. app tokens) match any author.
+    mock_github.return_value.get_user.side_effect = GithubException(403, {"message": "Forbidden"})
+    assert GitHubClient().find_comment(9, "## A", "marker")["id"] == 5
+
+def test_find_pr_and_branch_commit(mock_github, mock_config):
+    from github import GithubException
+    client = GitHubClient()
+    repo = mock_github.return_value.get_repo.return_value
+    repo.get_pulls.return_value = [MagicMock(html_url="http://pr/1")]
+    assert client.find_pr("feature") == "http://pr/1"
+    repo.get_pulls.assert_called_with(state="open", head="owner:feature")
+    repo.get_pulls.return_value = []
+    assert client.find_pr("feature") is None
+
+    repo.get_git_ref.return_value.object.sha = "abc"
+    repo.get_git_commit.return_value = MagicMock(sha="abc", message="Add feature")
+    assert client.find_branch_commit("feature", "Add feature") == "abc"
+    assert client.find_branch_commit("feature", "Other change") is None
+    repo.get_git_ref.side_effect = GithubException(404, {"message": "Not Found"})
+    assert client.find_branch_commit("gone", "Add feature") is None
+
+def make_pull(number, created_at):
+    return {
+        "number": number, "title": f"PR {number}", "html_url": f"https://github.com/o/r/pull/{number}",
+        "user": {"login": "octocat"}, "labels": [{"name": "bug"}], "created_at": created_at,
+        "head": {"sha": f"sha{number}"},
+    }
+
+def test_iter_prs_pages_and_projects(mock_github, mock_config):
+    client = GitHubClient()
+    requester = mock_github.return_value.requester
+    first = [make_pull(300 - i, "2024-03-01T00:00:00Z") for i in range(100)]
+    second = [make_pull(200 - i, "2024-02-01T00:00:00Z") for i in range(40)]
+    requester.requestJsonAndCheck.side_effect = [({}, first), ({}, second)]
+
+    prs = list(client.iter_prs("closed"))
+
+    assert len(prs) == 140
+    assert prs[0] == {
+        "number": 300, "title": "PR 300", "url": "https://github.com/o/r/pull/300",
+        "user": "octocat", "labels": ["bug"], "created_at": "2024-03-01T00:00:00+00:00",
+        "head_sha": "sha300",
+    }
+    pages = [c.kwargs["parameters"] for c in requester.requestJsonAndCheck.call_args_list]
+    assert [(p["page"], p["per_page"], p["state"]) for p in pages] == [(1, 100, "closed"), (2, 100, "closed")]
+
+def test_iter_prs_stops_early(mock_github, mock_config):
+    from datetime import datetime
+    client = GitHubClient()
+    requester = mock_github.return_value.requester
+    page = [make_pull(100 - i, f"2024-01-{30 - i // 4:02d}T00:00:00Z") for i in range(100)]
+    requester.requestJsonAndCheck.return_value = ({}, page)
+
+    assert len(list(client.iter_prs(limit=5))) == 5
+    recent = list(client.iter_prs(since=datetime(2024, 1, 29)))
+    assert len(recent) == 8
+    # The first page already went past since, so no second page was requested.
+    assert requester.requestJsonAndCheck.call_count == 2
+
+
+FIXTURES = Path(__file__).parent / "fixtures" / "pr_42"
+
+
+class RecordedGitHub:
+    """Serves responses recorded from the GitHub API for PR #42 and counts requests."""
+    def __init__(self):
+        self.requests = []
+        self.diff_name = "pull.diff"
+        self.rate_headers = {}
+
+    def handle(self, handler):
+        path, _, query = handler.path.partition("?")
+        length = int(handler.headers.get("Content-Length") or 0)
+        handler.rfile.read(length)
+        self.requests.append((handler.command, path))
+
+        headers = {"Content-Type": "application/json", **self.rate_headers}
+        if handler.command == "POST" and path == "/graphql":
+            status, name = 200, "graphql.json"
+        elif path == "/repos/owner/repo":
+            status, name = 200, "repo.json"
+        elif path == "/repos/owner/repo/pulls/42" and "diff" in handler.headers.get("Accept", ""):
+            status, name = 200, self.diff_name
+            headers["Content-Type"] = "text/plain; charset=utf-8"
+        elif path == "/repos/owner/repo/pulls/42":
+            status, name = 200, "pull.json"
+        elif path == "/repos/owner/repo/pulls/42/files" and "page=2" in query:
+            status, name = 200, "files_page2.json"
+        elif path == "/repos/owner/repo/pulls/42/files":
+            status, name = 200, "files_page1.json"
+            headers["Link"] = f'<{self.url}/repos/owner/repo/pulls/42/files?page=2>; rel="next"'
+        else:
+            status, name = 404, None
+
+        data = (FIXTURES / name).read_bytes() if name else b'{"message": "Not Found"}'
+        # API links in the recordings point at GitHub; follow them back to this server.
+        data = data.replace(b"https://api.github.com", self.url.encode())
+        handler.send_response(status)
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def count(self):
+        return len(self.requests)
+
+
+@pytest.fixture
+def recorded_github():
+    api = RecordedGitHub()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        do_GET = do_POST = lambda self: api.handle(self)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    api.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield api
+    server.shutdown()
+    server.server_close()
+
+
+def fixture_client(server, api, **kwargs):
+    settings = {"github_token": "dummy_token", "repo_name": "owner/repo", "github_base_url": server.url, "github_api": api}
+    config = MagicMock()
+    config.get.side_effect = lambda k, default=None: settings.get(k, default)
+    return GitHubClient(config, **kwargs)
+
+
+def fetch_review(server, api):
+    client = fixture_client(server, api)
+    server.requests.clear()
+    return client.get_pr_details(42), client.get_pr_files(42), server.count()
+
+
+def test_graphql_fetch_matches_rest(recorded_github):
+    rest_details, rest_files, rest_calls = fetch_review(recorded_github, "rest")
+    graphql_details, graphql_files, graphql_calls = fetch_review(recorded_github, "graphql")
+
+    assert graphql_details == rest_details
+    assert graphql_files == rest_files
+    assert [f["patch"] is None for f in graphql_files] == [False, False, False, True, False]
+    # REST: the pull, then each page of files. GraphQL: one query and one diff
+    # download, however many files there are.
+    assert rest_calls == 3
+    assert graphql_calls == 2
+    assert recorded_github.requests[-2:] == [("POST", "/graphql"), ("GET", "/repos/owner/repo/pulls/42")]
+
+
+def test_graphql_files_fall_back_to_rest_when_diff_lacks_a_patch(recorded_github, tmp_path):
+    rest_files = fetch_review(recorded_github, "rest")[1]
+    # A diff in which the splitter finds no patch for src/app.py.
+    diff = tmp_path / "pull.diff"
+    diff.write_text((FIXTURES / "pull.diff").read_text().replace("src/app.py", "src/other.py"))
+    recorded_github.diff_name = diff
+
+    _, files, calls = fetch_review(recorded_github, "graphql")
+
+    assert files == rest_files
+    assert calls == 4  # the query, the diff, then both pages of files
+
+def test_graphql_files_fall_back_to_rest_without_details(recorded_github):
+    client = fixture_client(recorded_github, "graphql")
+    files = client.get_pr_files(42)
+
+    assert [f["filename"] for f in files][-1] == "src/helpers.py"
+    assert ("POST", "/graphql") not in recorded_github.requests
+
+def test_requests_are_paced_by_rate_limit_headers(recorded_github):
+    recorded_github.rate_headers = {"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "3"}
+    bucket = TokenBucket(rate=1, capacity=100)
+    client = fixture_client(recorded_github, "graphql", rate_bucket=bucket)
+
+    client.get_pr_details(42)
+    client.get_pr_files(42)
+
+    assert recorded_github.count() == 2
+    assert bucket.capacity == 5000
+    assert bucket.tokens <= 3.5
@@ -0,0 +1,61 @@
+import pytest
+from pr_assistant.ignore import GitIgnoreMatcher, IgnoreRules
+
+@pytest.mark.parametrize("pattern,path,is_dir,expected", [
+    ("*.log", "debug.log", False, True),
+    ("*.log", "deep/nested/debug.log", False, True),
+    ("/build", "build", True, True),
+    ("/build", "src/build", True, None),
+    ("doc/*.txt", "doc/notes.txt", False, True),
+    ("doc/*.txt", "doc/server/arch.txt", False, None),
+    ("**/logs", "a/b/logs", True, True),
+    ("logs/**", "logs/a/b.txt", False, True),
+    ("a/**/b", "a/b", False, True),
+    ("a/**/b", "a/x/y/b", False, True),
+    ("out/", "out", True, True),
+    ("out/", "out", False, None),
+    ("file[0-9].py", "file1.py", False, True),
+    ("file[!0-9].py", "file1.py", False, None),
+    ("\\#hash", "#hash", False, True),
+    ("# comment", "# comment", False, None),
+])
+def test_rules_match(pattern, path, is_dir, expected):
+    assert IgnoreRules([pattern]).match(path, is_dir) is expected
+
+def test_negation_last_match_wins():
+    rules = IgnoreRules(["*.log", "!keep.log", "keep.log.bak"])
+    assert rules.match("debug.log", False) is True
+    assert rules.match("keep.log", False) is False
+
+    rules = IgnoreRules(["!keep.log", "*.log"])
+    assert rules.match("keep.log", False) is True
+
+def test_matcher_nested_gitignore(tmp_path):
+    (tmp_path / ".gitignore").write_text("*.tmp\n")
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    (pkg / ".gitignore").write_text("/generated\n!important.tmp\n")
+
+    matcher = GitIgnoreMatcher(str(tmp_path), defaults=[])
+    assert matcher.match("a.tmp") is True
+    assert matcher.match("pkg/a.tmp") is True
+    assert matcher.match("pkg/important.tmp") is False
+    assert matcher.match("important.tmp") is True
+    assert matcher.match("pkg/generated", is_dir=True) is True
+    assert matcher.match("generated", is_dir=True) is False
+
+def test_matcher_info_exclude(tmp_path):
+    info = tmp_path / ".git" / "info"
+    info.mkdir(parents=True)
+    (info / "exclude").write_text("scratch/\n")
+    (tmp_path / ".gitignore").write_text("!scratch/keep/\n")
+
+    matcher = GitIgnoreMatcher(str(tmp_path))
+    assert matcher.match("scratch", is_dir=True) is True
+    assert matcher.match(".git", is_dir=True) is True
+
+def test_matcher_is_ignored_checks_parents(tmp_path):
+    (tmp_path / ".gitignore").write_text("build/\n")
+    matcher = GitIgnoreMatcher(str(tmp_path))
+    assert matcher.is_ignored("build/lib/module.py") is True
+    assert matcher.is_ignored("src/module.py") is False
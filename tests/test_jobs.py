@@ -0,0 +1,197 @@
+import threading
+import pytest
+from pr_assistant.jobs import DONE, FAILED, PENDING, RUNNING, JobQueue, JobRunner
+
+
+class TransientError(Exception):
+    status = 503
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(tmp_path / "jobs.db", clock=clock)
+
+
+def test_steps_run_once_and_keep_their_results(queue):
+    job = queue.claim(queue.enqueue("create", {"branch": "b"}).id)
+    calls = []
+
+    def commit(resumed):
+        calls.append(resumed)
+        return "sha1"
+
+    assert queue.step(job, "commit", commit) == "sha1"
+    assert queue.step(job, "commit", commit) == "sha1"
+    assert calls == [False]
+    assert queue.steps(job.id) == {"commit": DONE}
+
+
+def test_step_interrupted_before_recording_is_resumed(queue):
+    job = queue.claim(queue.enqueue("create", {}).id)
+
+    def crash(resumed):
+        raise RuntimeError("crash")
+
+    with pytest.raises(RuntimeError):
+        queue.step(job, "open PR", crash)
+
+    assert queue.step(job, "open PR", lambda resumed: resumed) is True
+
+
+def test_enqueue_is_idempotent_per_key(queue):
+    first = queue.enqueue("create", {"branch": "b"}, key="create:o/r:b")
+    assert queue.enqueue("create", {"branch": "b"}, key="create:o/r:b").id == first.id
+
+    job = queue.claim(first.id)
+    queue.fail(job, "boom")
+    # A failed job is queued again rather than duplicated, keeping its finished steps.
+    again = queue.enqueue("create", {"branch": "b"}, key="create:o/r:b")
+    assert (again.id, again.state, again.attempts) == (first.id, PENDING, 0)
+
+    queue.complete(queue.claim(first.id), {"url": "u"})
+    assert queue.enqueue("create", {}, key="create:o/r:b").state == DONE
+    assert queue.enqueue("review", {}, key="create:o/r:b", rerun_done=True).id != first.id
+
+
+def test_enqueue_with_new_payload_starts_over(queue):
+    job = queue.claim(queue.enqueue("create", {"branch": "b", "title": "old"}, key="k").id)
+    queue.step(job, "commit", lambda resumed: "old-sha")
+
+    # Held by a live worker: the new input is refused rather than mixed into its steps.
+    with pytest.raises(RuntimeError):
+        queue.enqueue("create", {"branch": "b", "title": "new"}, key="k")
+
+    queue.fail(job, "boom")
+    again = queue.enqueue("create", {"branch": "b", "title": "new"}, key="k")
+    assert (again.id, again.state, again.payload, again.error) == (job.id, PENDING, {"branch": "b", "title": "new"}, None)
+    assert queue.steps(job.id) == {}
+
+    # The same payload keeps the recorded steps.
+    job = queue.claim(job.id)
+    queue.step(job, "commit", lambda resumed: "new-sha")
+    queue.fail(job, "boom")
+    assert queue.enqueue("create", {"title": "new", "branch": "b"}, key="k").id == job.id
+    assert queue.steps(job.id) == {"commit": DONE}
+
+
+def test_claim_respects_live_workers_and_takes_over_dead_ones(queue, clock):
+    job = queue.enqueue("create", {})
+    assert queue.claim(job.id).attempts == 1
+    # Held by this (live) process.
+    assert queue.claim(job.id) is None
+
+    conn = queue._connect()
+    conn.execute("UPDATE jobs SET owner = ? WHERE id = ?", (f"{queue.owner.rsplit(':', 1)[0]}:99999999", job.id))
+    assert queue.claim(job.id).attempts == 2
+
+    # A worker on another host is trusted until its lease runs out.
+    conn.execute("UPDATE jobs SET owner = 'elsewhere:1' WHERE id = ?", (job.id,))
+    assert queue.claim(job.id) is None
+    clock.now += queue.lease_seconds + 1
+    assert queue.claim(job.id).state == RUNNING
+
+
+def test_runner_retries_transient_failures_from_the_failed_step(queue, clock):
+    commits, opens = [], []
+
+    def handler(ctx):
+        sha = ctx.step("commit", lambda resumed: commits.append(1) or "sha")
+        def open_pr(resumed):
+            opens.append(resumed)
+            if len(opens) < 3:
+                raise TransientError("unavailable")
+            return "http://pr/1"
+        return {"sha": sha, "url": ctx.step("open PR", open_pr)}
+
+    delays = []
+    def sleep(seconds):
+        delays.append(seconds)
+        clock.sleep(seconds)
+
+    runner = JobRunner(queue, {"create": handler}, max_attempts=4, base_delay=1.0, sleep=sleep)
+    job = runner.run_job(queue.enqueue("create", {}).id)
+
+    assert job.state == DONE
+    assert job.result == {"sha": "sha", "url": "http://pr/1"}
+    assert job.attempts == 3
+    assert len(commits) == 1
+    # Failed attempts raised before recording, so later attempts are told they resume.
+    assert opens == [False, True, True]
+    assert len(delays) == 2
+    assert 0 <= delays[0] <= 1.0 and 0 <= delays[1] <= 2.0
+
+
+def test_runner_fails_permanent_errors_and_exhausted_retries(queue, clock):
+    def permanent(ctx):
+        raise ValueError("bad input")
+
+    def flaky(ctx):
+        raise TransientError("unavailable")
+
+    runner = JobRunner(queue, {"create": permanent, "review": flaky}, max_attempts=3, sleep=clock.sleep)
+    job = runner.run_job(queue.enqueue("create", {}).id)
+    assert (job.state, job.attempts, job.error) == (FAILED, 1, "bad input")
+
+    job = runner.run_job(queue.enqueue("review", {}).id)
+    assert (job.state, job.attempts) == (FAILED, 3)
+
+    assert queue.retry_failed() == 2
+    assert {j.state for j in queue.list_jobs()} == {PENDING}
+
+
+def test_runner_runs_jobs_concurrently(queue):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def handler(ctx):
+        barrier.wait()
+        return ctx.payload["n"]
+
+    ids = [queue.enqueue("review", {"n": n}).id for n in range(3)]
+    jobs = JobRunner(queue, {"review": handler}).run(ids, workers=3)
+
+    assert [job.result for job in jobs] == [0, 1, 2]
+
+
+def _drain(storage_path, ids, results):
+    queue = JobQueue(storage_path)
+    runner = JobRunner(queue, {"review": lambda ctx: ctx.step("work", lambda resumed: queue.owner)})
+    for job_id in ids:
+        runner.run_job(job_id)
+    results.put(True)
+
+
+def test_each_job_runs_once_across_processes(tmp_path):
+    import multiprocessing
+
+    storage_path = tmp_path / "jobs.db"
+    queue = JobQueue(storage_path)
+    ids = [queue.enqueue("review", {"n": n}).id for n in range(40)]
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_drain, args=(storage_path, ids, results)) for _ in range(4)]
+    for w in workers:
+        w.start()
+    for _ in workers:
+        results.get(timeout=60)
+    for w in workers:
+        w.join()
+
+    jobs = [queue.get(job_id) for job_id in ids]
+    # One claim per job: no job was run by two workers.
+    assert all(job.state == DONE and job.attempts == 1 for job in jobs)
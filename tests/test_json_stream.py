@@ -0,0 +1,51 @@
+from pr_assistant.json_stream import IncrementalArrayParser, iter_array_elements
+
+RESPONSE = '''```json
+{
+    "prs": [
+        {"title": "Fix {braces} in \\"strings\\"", "files": [{"path": "a.py", "content": "x = [1, 2]"}]},
+        {"title": "Second", "files": []}
+    ]
+}
+```'''
+
+def test_parses_all_elements():
+    parser = IncrementalArrayParser("prs")
+    elements = parser.feed(RESPONSE)
+
+    assert [e["title"] for e in elements] == ['Fix {braces} in "strings"', "Second"]
+    assert elements[0]["files"][0]["content"] == "x = [1, 2]"
+    assert parser.done
+
+def test_emits_each_element_as_soon_as_it_closes():
+    parser = IncrementalArrayParser("prs")
+    first_close = RESPONSE.index("]}") + 2
+    emitted_at = []
+    for i, ch in enumerate(RESPONSE):
+        for element in parser.feed(ch):
+            emitted_at.append((i, element["title"]))
+
+    assert emitted_at[0][0] == first_close - 1
+    assert [title for _, title in emitted_at] == ['Fix {braces} in "strings"', "Second"]
+
+def test_keeps_elements_before_malformed_tail():
+    truncated = '{"prs": [{"title": "Complete"}, {"title": "Broken", "files": [{"pa'
+    assert IncrementalArrayParser("prs").feed(truncated) == [{"title": "Complete"}]
+
+def test_skips_malformed_element():
+    text = '{"prs": [{"title": "A"}, {"title": oops}, {"title": "C"}]}'
+    assert [e["title"] for e in IncrementalArrayParser("prs").feed(text)] == ["A", "C"]
+
+def test_no_array_yields_nothing():
+    assert IncrementalArrayParser("prs").feed("Not JSON") == []
+
+def test_iter_array_elements_consumes_all_chunks():
+    consumed = []
+
+    def chunks():
+        for chunk in ['{"prs": [{"a"', ': 1}]}', "\n```", " trailing"]:
+            consumed.append(chunk)
+            yield chunk
+
+    assert list(iter_array_elements(chunks(), "prs")) == [{"a": 1}]
+    assert len(consumed) == 4
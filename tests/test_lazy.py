@@ -0,0 +1,16 @@
+import sys
+from pr_assistant.lazy import LazyImport
+
+def test_lazy_module_imports_on_first_use(monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    colorsys = LazyImport("colorsys")
+    assert "colorsys" not in sys.modules
+
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert "colorsys" in sys.modules
+
+def test_lazy_attribute_is_callable():
+    ordered_dict = LazyImport("collections", "OrderedDict")
+    assert ordered_dict(a=1) == {"a": 1}
+    assert ordered_dict.fromkeys(["b"]) == {"b": None}
+    assert repr(ordered_dict) == "<lazy collections.OrderedDict>"
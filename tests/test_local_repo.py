@@ -0,0 +1,195 @@
+import subprocess
+import threading
+import pytest
+from pr_assistant.local_repo import LocalRepo
+
+
+def run_git(cwd, *args):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def commit_all(cwd, message):
+    run_git(cwd, "add", "-A")
+    run_git(cwd, "commit", "-q", "-m", message)
+    return run_git(cwd, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """A bare "GitHub" repo with one commit on its default branch "trunk", plus a clone of it."""
+    bare = tmp_path / "remote.git"
+    run_git(tmp_path, "init", "-q", "--bare", "-b", "trunk", str(bare))
+    clone = tmp_path / "clone"
+    run_git(tmp_path, "clone", "-q", str(bare), str(clone))
+    run_git(clone, "config", "user.name", "Test")
+    run_git(clone, "config", "user.email", "test@example.com")
+    run_git(clone, "checkout", "-q", "-b", "trunk")
+    (clone / "app.py").write_text("print('hello')\n")
+    (clone / "old.py").write_text("def old():\n    pass\n")
+    (clone / "util.py").write_text("def util():\n    return 1\n\n\n# padding\n# padding\n")
+    commit_all(clone, "initial")
+    run_git(clone, "push", "-q", "origin", "trunk")
+    return bare, clone
+
+
+def test_commit_files_pushes_one_commit(remote):
+    bare, clone = remote
+    repo = LocalRepo(str(clone))
+    files = [{"path": "app.py", "content": "print('bye')\n"}, {"path": "pkg/new.py", "content": "x = 1\n"}]
+
+    sha = repo.commit_files("feature", files, "feat: change", source_branch="trunk")
+
+    assert run_git(bare, "rev-parse", "refs/heads/feature") == sha
+    assert run_git(bare, "rev-parse", f"{sha}^") == run_git(bare, "rev-parse", "trunk")
+    assert run_git(bare, "show", f"{sha}:pkg/new.py") == "x = 1"
+    assert run_git(bare, "log", "--format=%s", "-1", sha) == "feat: change"
+    # The user's checkout and worktree list are left untouched.
+    assert (clone / "app.py").read_text() == "print('hello')\n"
+    assert run_git(clone, "worktree", "list").count("\n") == 0
+
+
+def test_commit_files_extends_existing_branch(remote):
+    bare, clone = remote
+    repo = LocalRepo(str(clone))
+    first = repo.commit_files("feature", [{"path": "a.py", "content": "1\n"}], "one", source_branch="trunk")
+    second = repo.commit_files("feature", [{"path": "a.py", "content": "2\n"}], "two")
+
+    assert run_git(bare, "rev-parse", f"{second}^") == first
+    assert run_git(bare, "rev-parse", "refs/heads/feature") == second
+
+
+def test_commit_files_extends_branch_moved_by_others(remote, tmp_path):
+    bare, clone = remote
+    repo = LocalRepo(str(clone))
+    repo.commit_files("feature", [{"path": "a.py", "content": "1\n"}], "one", source_branch="trunk")
+    repo.commit_files("feature", [{"path": "a.py", "content": "2\n"}], "two")
+    # Someone else pushes to the branch between two runs of a long-lived process.
+    other = tmp_path / "other"
+    run_git(tmp_path, "clone", "-q", "-b", "feature", str(bare), str(other))
+    run_git(other, "config", "user.name", "Other")
+    run_git(other, "config", "user.email", "other@example.com")
+    (other / "b.py").write_text("b\n")
+    theirs = commit_all(other, "theirs")
+    run_git(other, "push", "-q", "origin", "feature")
+
+    ours = repo.commit_files("feature", [{"path": "a.py", "content": "3\n"}], "three")
+
+    assert run_git(bare, "rev-parse", f"{ours}^") == theirs
+    assert run_git(bare, "rev-parse", "refs/heads/feature") == ours
+
+def test_commit_files_without_changes_makes_no_commit(remote):
+    bare, clone = remote
+    repo = LocalRepo(str(clone))
+    first = repo.commit_files("feature", [{"path": "a.py", "content": "1\n"}], "one", source_branch="trunk")
+
+    assert repo.commit_files("feature", [{"path": "a.py", "content": "1\n"}], "again") == first
+    assert run_git(bare, "rev-parse", "refs/heads/feature") == first
+
+def test_commit_ignores_hooks_and_identity_config(remote):
+    bare, clone = remote
+    run_git(clone, "config", "--unset", "user.name")
+    run_git(clone, "config", "--unset", "user.email")
+    run_git(clone, "config", "commit.gpgsign", "true")
+    hooks = clone / ".git" / "hooks"
+    for name in ("pre-commit", "commit-msg", "pre-push"):
+        (hooks / name).write_text("#!/bin/sh\nexit 1\n")
+        (hooks / name).chmod(0o755)
+
+    sha = LocalRepo(str(clone)).commit_files("feature", [{"path": "a.py", "content": "1\n"}], "one", source_branch="trunk")
+
+    assert run_git(bare, "rev-parse", "refs/heads/feature") == sha
+    assert run_git(bare, "log", "--format=%an", "-1", sha) == "PR Assistant"
+
+def test_commit_files_in_parallel(remote):
+    bare, clone = remote
+    repo = LocalRepo(str(clone))
+    errors = []
+
+    def create(i):
+        try:
+            repo.commit_files(f"branch-{i}", [{"path": f"f{i}.py", "content": f"{i}\n"}], f"PR {i}", source_branch="trunk")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=create, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert sorted(run_git(bare, "branch", "--format=%(refname:short)").split()) == [
+        "branch-0", "branch-1", "branch-2", "branch-3", "trunk"
+    ]
+
+
+def test_commit_files_rejects_paths_outside_repo(remote):
+    _, clone = remote
+    with pytest.raises(ValueError):
+        LocalRepo(str(clone)).commit_files("evil", [{"path": "../escape.py", "content": ""}], "msg", source_branch="trunk")
+    assert not (clone.parent / "escape.py").exists()
+
+
+@pytest.fixture
+def pull(remote, tmp_path):
+    """Publishes PR #5 as refs/pull/5/head on the bare repo, the way GitHub does."""
+    bare, _ = remote
+    author = tmp_path / "author"
+    run_git(tmp_path, "clone", "-q", str(bare), str(author))
+    run_git(author, "config", "user.name", "Author")
+    run_git(author, "config", "user.email", "author@example.com")
+    (author / "app.py").write_text("import sys\nprint('hello')\n")
+    (author / "old.py").unlink()
+    (author / "notes.md").write_text("# Notes\n")
+    (author / "logo.png").write_bytes(b"\x89PNG\x00\x01\x02")
+    run_git(author, "mv", "util.py", "helpers.py")
+    first = commit_all(author, "first")
+    (author / "notes.md").write_text("# Notes\nMore\n")
+    second = commit_all(author, "second")
+    run_git(author, "push", "-q", "origin", "HEAD:refs/pull/5/head")
+    return first, second
+
+
+def test_pr_files_match_files_api_shape(remote, pull):
+    _, clone = remote
+    files = {f["filename"]: f for f in LocalRepo(str(clone)).pr_files(5, "trunk")}
+
+    assert files["app.py"] == {
+        "filename": "app.py", "status": "modified", "additions": 1, "deletions": 0,
+        "patch": "@@ -1 +1,2 @@\n+import sys\n print('hello')",
+    }
+    assert files["old.py"]["status"] == "removed"
+    assert files["old.py"]["deletions"] == 2
+    assert files["notes.md"]["status"] == "added"
+    assert files["helpers.py"]["status"] == "renamed"
+    assert files["helpers.py"]["patch"] is None
+    assert files["logo.png"]["status"] == "added"
+    assert files["logo.png"]["patch"] is None
+
+
+def test_compare_files(remote, pull):
+    _, clone = remote
+    first, second = pull
+    repo = LocalRepo(str(clone))
+    repo.fetch_pull(5, "trunk")
+
+    files = repo.compare_files(first, second)
+    assert [(f["filename"], f["additions"]) for f in files] == [("notes.md", 1)]
+    assert repo.compare_files(second, first) is None
+
+
+def test_pull_is_fetched_again_after_new_pushes(remote, pull, tmp_path):
+    _, clone = remote
+    _, second = pull
+    repo = LocalRepo(str(clone))
+    assert "later.py" not in {f["filename"] for f in repo.pr_files(5, "trunk")}
+
+    # The author pushes again while a long-running server keeps the same LocalRepo.
+    author = tmp_path / "author"
+    (author / "later.py").write_text("x = 1\n")
+    third = commit_all(author, "third")
+    run_git(author, "push", "-q", "origin", "HEAD:refs/pull/5/head")
+
+    repo.fetch_pull(5, "trunk", third)
+    assert [f["filename"] for f in repo.compare_files(second, third)] == ["later.py"]
+    assert "later.py" in {f["filename"] for f in repo.pr_files(5, "trunk", third)}
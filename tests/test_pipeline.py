@@ -0,0 +1,152 @@
+import threading
+import time
+from unittest.mock import MagicMock
+from github import GithubException
+from pr_assistant.jobs import JobQueue
+from pr_assistant.pipeline import PRPipeline
+
+def make_prs(n):
+    return [
+        {"title": f"PR {i}", "body": "Body", "branch": f"branch-{i}", "files": [{"path": "f.py", "content": str(i)}]}
+        for i in range(n)
+    ]
+
+def test_pipeline_creates_all_prs_in_order():
+    gh = MagicMock()
+    gh.default_branch = "develop"
+    gh.create_pr.side_effect = lambda title, body, branch, base: f"http://pr/{branch}"
+
+    results = PRPipeline(gh, concurrency=3).run(make_prs(5))
+
+    assert [r.branch for r in results] == [f"branch-{i}" for i in range(5)]
+    assert all(r.status == "created" for r in results)
+    assert results[2].url == "http://pr/branch-2"
+    gh.commit_files.assert_any_call("branch-1", [{"path": "f.py", "content": "1"}], "feat: PR 1", source_branch="develop")
+    gh.create_pr.assert_any_call("PR 1", "Body", "branch-1", base="develop")
+
+def test_pipeline_runs_prs_in_parallel():
+    gh = MagicMock()
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+
+    def slow_commit(*args, **kwargs):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.02)
+        with lock:
+            active["now"] -= 1
+
+    gh.commit_files.side_effect = slow_commit
+    PRPipeline(gh, concurrency=4).run(make_prs(8))
+
+    assert active["max"] == 4
+
+def test_pipeline_retries_transient_failures():
+    gh = MagicMock()
+    failures = iter([GithubException(502, {"message": "Bad Gateway"})])
+
+    def flaky_pr(title, body, branch, base):
+        error = next(failures, None)
+        if error:
+            raise error
+        return "http://pr/1"
+
+    gh.create_pr.side_effect = flaky_pr
+    result = PRPipeline(gh, sleep=lambda d: None).run(make_prs(1))[0]
+
+    assert result.status == "created"
+    assert result.attempts == 3  # one commit, two PR attempts
+    gh.commit_files.assert_called_once()
+
+def test_pipeline_isolates_failures():
+    gh = MagicMock()
+
+    def commit(branch, *args, **kwargs):
+        if branch == "branch-1":
+            raise GithubException(422, {"message": "Reference already exists"})
+
+    gh.commit_files.side_effect = commit
+    gh.create_pr.return_value = "http://pr"
+    seen = []
+
+    results = PRPipeline(gh, sleep=lambda d: None).run(make_prs(3), on_result=seen.append)
+
+    assert [r.status for r in results] == ["created", "failed", "created"]
+    assert "Reference already exists" in results[1].error
+    assert results[1].attempts == 1
+    assert len(seen) == 3
+
+def test_pipeline_accepts_generator():
+    gh = MagicMock()
+    gh.create_pr.return_value = "http://pr"
+
+    results = PRPipeline(gh).run(pr for pr in make_prs(2))
+
+    assert len(results) == 2
+    assert results[0].to_dict()["status"] == "created"
+
+def make_queued_gh():
+    gh = MagicMock()
+    gh.repo_name = "owner/repo"
+    gh.default_branch = "main"
+    gh.commit_files.return_value = "sha1"
+    return gh
+
+def test_queued_pipeline_resumes_after_failure(tmp_path):
+    gh = make_queued_gh()
+    gh.create_pr.side_effect = GithubException(422, {"message": "Validation Failed"})
+    queue = JobQueue(tmp_path / "jobs.db")
+
+    failed = PRPipeline(gh, job_queue=queue, sleep=lambda d: None).run(make_prs(1))[0]
+    assert failed.status == "failed"
+    assert queue.get(failed.job_id).state == "failed"
+
+    # A second run reuses the job: the commit is not made again.
+    gh.create_pr.side_effect = None
+    gh.create_pr.return_value = "http://pr/0"
+    gh.find_pr.return_value = None
+    result = PRPipeline(gh, job_queue=queue, sleep=lambda d: None).run(make_prs(1))[0]
+
+    assert (result.status, result.url, result.job_id) == ("created", "http://pr/0", failed.job_id)
+    gh.commit_files.assert_called_once()
+    # The interrupted PR step first checks whether the PR was opened after all.
+    gh.find_pr.assert_called_once_with("branch-0")
+    assert queue.steps(result.job_id) == {"commit": "done", "open PR": "done"}
+
+    # Once done, the same branch is not reported as created again.
+    again = PRPipeline(gh, job_queue=queue).run(make_prs(1))[0]
+    assert again.status == "failed"
+    assert "already used by job" in again.error and "http://pr/0" in again.error
+    assert gh.create_pr.call_count == 2  # the rejected attempt and the successful one
+
+def test_queued_pipeline_runs_new_proposal_for_failed_branch(tmp_path):
+    gh = make_queued_gh()
+    gh.create_pr.side_effect = GithubException(422, {"message": "Validation Failed"})
+    queue = JobQueue(tmp_path / "jobs.db")
+    failed = PRPipeline(gh, job_queue=queue, sleep=lambda d: None).run(make_prs(1))[0]
+
+    gh.create_pr.side_effect = None
+    gh.create_pr.return_value = "http://pr/0"
+    proposal = dict(make_prs(1)[0], title="Other change", files=[{"path": "g.py", "content": "g"}])
+    result = PRPipeline(gh, job_queue=queue, sleep=lambda d: None).run([proposal])[0]
+
+    assert (result.status, result.job_id) == ("created", failed.job_id)
+    # The new title and files are committed from the first step, not the recorded ones.
+    assert gh.commit_files.call_count == 2
+    gh.commit_files.assert_called_with("branch-0", [{"path": "g.py", "content": "g"}], "feat: Other change", source_branch="main")
+    gh.create_pr.assert_called_with("Other change", "Body", "branch-0", base="main")
+    gh.find_pr.assert_not_called()
+
+def test_queued_pipeline_adopts_commit_from_interrupted_attempt(tmp_path):
+    gh = make_queued_gh()
+    gh.commit_files.side_effect = GithubException(502, {"message": "Bad Gateway"})
+    gh.find_branch_commit.return_value = "pushed-sha"
+    gh.create_pr.return_value = "http://pr/0"
+
+    result = PRPipeline(gh, job_queue=JobQueue(tmp_path / "jobs.db"), sleep=lambda d: None).run(make_prs(1))[0]
+
+    assert result.status == "created"
+    assert result.attempts == 2
+    gh.commit_files.assert_called_once()
+    gh.find_branch_commit.assert_called_once_with("branch-0", "feat: PR 0")
@@ -1,6 +1,12 @@
 import pytest
 import time
-from pr_assistant.rate_limiter import RateLimiter
+from pr_assistant.rate_limiter import RateLimiter, TokenBucket, observe_rate_limit_headers, retry_after_seconds
+
+def set_usage(limiter, *timestamps):
+    """Replaces the recorded requests with the given timestamps."""
+    with limiter._connect() as conn:
+        conn.execute("DELETE FROM requests")
+        conn.executemany("INSERT INTO requests (ts) VALUES (?)", [(ts,) for ts in timestamps])
 
 def test_rate_limiter_initialization(mock_rate_limiter):
     assert mock_rate_limiter.max_requests == 50
@@ -18,14 +24,117 @@ def test_rate_limiter_cleanup(mock_rate_limiter):
     mock_rate_limiter.max_requests = 5
     
     # Simulate old requests
-    old_usage = {
-        "req1": time.time() - 4000, # Older than 1 hour
-        "req2": time.time() - 3700
-    }
-    mock_rate_limiter._save_usage(old_usage)
+    set_usage(mock_rate_limiter, time.time() - 4000, time.time() - 3700) # Older than 1 hour
     
     assert mock_rate_limiter.get_remaining() == 5 # Should be cleared
     
     # Add a fresh request
     mock_rate_limiter.check_limit()
     assert mock_rate_limiter.get_remaining() == 4
+
+def test_rate_limiter_storage_path(tmp_path):
+    limiter = RateLimiter(max_requests_per_hour=3, storage_path=tmp_path / "usage.db")
+    assert limiter.check_limit() is True
+    # A second limiter on the same file sees the recorded request.
+    assert RateLimiter(max_requests_per_hour=3, storage_path=tmp_path / "usage.db").get_remaining() == 2
+
+def test_rate_limiter_migrates_json_usage(tmp_path):
+    import json
+    legacy = tmp_path / "usage.json"
+    legacy.write_text(json.dumps({"1": time.time() - 10, "2": time.time() - 4000}))
+
+    limiter = RateLimiter(max_requests_per_hour=5, storage_path=tmp_path / "usage.db")
+
+    assert limiter.get_remaining() == 4
+    assert not legacy.exists()
+
+def _hammer(storage_path, max_requests, attempts, results):
+    limiter = RateLimiter(max_requests_per_hour=max_requests, storage_path=storage_path)
+    results.put(sum(limiter.check_limit() for _ in range(attempts)))
+
+def test_rate_limiter_across_processes(tmp_path):
+    import multiprocessing
+
+    storage_path = tmp_path / "usage.db"
+    RateLimiter(storage_path=storage_path)
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_hammer, args=(storage_path, 100, 20, results)) for _ in range(16)]
+    for w in workers:
+        w.start()
+    allowed = sum(results.get(timeout=60) for _ in workers)
+    for w in workers:
+        w.join()
+
+    # 320 attempts against a limit of 100: exactly 100 may succeed.
+    assert allowed == 100
+    assert RateLimiter(max_requests_per_hour=100, storage_path=storage_path).get_remaining() == 0
+
+def test_rate_limiter_acquire_waits_for_oldest_request(tmp_path):
+    limiter = RateLimiter(max_requests_per_hour=1, storage_path=tmp_path / "usage.db")
+    set_usage(limiter, time.time() - 3000)
+    waits = []
+
+    def fake_sleep(seconds):
+        waits.append(seconds)
+        set_usage(limiter)  # The old request expires while we sleep.
+
+    limiter.acquire(sleep=fake_sleep)
+
+    assert len(waits) == 1
+    assert 590 < waits[0] <= 600
+    assert limiter.get_remaining() == 0
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_token_bucket_blocks_for_exact_deficit():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=4, clock=clock, sleep=clock.sleep)
+
+    assert bucket.acquire(4) == 0
+    assert bucket.acquire(1) == pytest.approx(0.5)
+    # Reservations queue up behind each other.
+    assert bucket.reserve(1) == pytest.approx(0.5)
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+def test_token_bucket_adjust_and_pause():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=10, clock=clock, sleep=clock.sleep)
+
+    bucket.adjust(12)
+    assert bucket.reserve(0) == pytest.approx(2)
+    bucket.adjust(-2)
+    bucket.pause(30)
+    assert bucket.reserve(0) == pytest.approx(30)
+
+def test_observe_rate_limit_headers():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=100, clock=clock, sleep=clock.sleep)
+
+    observe_rate_limit_headers(bucket, {
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": str(time.time() + 60),
+    })
+
+    assert bucket.capacity == 5000
+    assert 59 < bucket.reserve(0) <= 60
+
+def test_retry_after_seconds():
+    class HTTPError(Exception):
+        def __init__(self, message, headers=None):
+            super().__init__(message)
+            self.headers = headers
+
+    assert retry_after_seconds(HTTPError("slow down", {"Retry-After": "7"})) == 7
+    assert retry_after_seconds(HTTPError("Please retry in 3.5s.")) == 3.5
+    assert retry_after_seconds(HTTPError("retry_delay { seconds: 42 }")) == 42
+    assert retry_after_seconds(HTTPError("forbidden", {"X-RateLimit-Remaining": "10"})) is None
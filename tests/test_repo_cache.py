@@ -0,0 +1,55 @@
+from pr_assistant.repo_cache import RepoMetadataCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_repo_and_sha_expire(tmp_path):
+    clock = FakeClock()
+    cache = RepoMetadataCache(tmp_path / "repos.json", repo_ttl_seconds=3600, sha_ttl_seconds=60, clock=clock)
+    cache.set_repo("owner/repo", 1, "develop")
+    cache.set_sha("owner/repo", "develop", "abc")
+
+    clock.now += 30
+    assert cache.get_repo("owner/repo") == {"id": 1, "default_branch": "develop"}
+    assert cache.get_sha("owner/repo", "develop") == "abc"
+
+    clock.now += 60
+    assert cache.get_sha("owner/repo", "develop") is None
+    assert cache.get_repo("owner/repo")["default_branch"] == "develop"
+
+    clock.now += 3600
+    assert cache.get_repo("owner/repo") is None
+
+
+def test_entries_shared_through_file(tmp_path):
+    path = tmp_path / "repos.json"
+    first = RepoMetadataCache(path)
+    second = RepoMetadataCache(path)
+    first.set_repo("owner/a", 1, "main")
+    second.set_repo("owner/b", 2, "trunk")
+
+    reader = RepoMetadataCache(path)
+    assert reader.get_repo("owner/a")["default_branch"] == "main"
+    assert reader.get_repo("owner/b")["default_branch"] == "trunk"
+
+
+def test_set_sha_none_forgets(tmp_path):
+    cache = RepoMetadataCache(tmp_path / "repos.json")
+    cache.set_sha("owner/repo", "main", "abc")
+    cache.set_sha("owner/repo", "main", None)
+    assert cache.get_sha("owner/repo", "main") is None
+
+
+def test_corrupt_file_ignored(tmp_path):
+    path = tmp_path / "repos.json"
+    path.write_text("{not json")
+    cache = RepoMetadataCache(path)
+    assert cache.get_repo("owner/repo") is None
+    cache.set_repo("owner/repo", 1, "main")
+    assert RepoMetadataCache(path).get_repo("owner/repo")["default_branch"] == "main"
@@ -0,0 +1,120 @@
+import pytest
+from pr_assistant import repo_map as repo_map_module
+from pr_assistant.codebase import CodebaseReader
+from pr_assistant.context import ContextPacker, estimate_tokens
+from pr_assistant.repo_map import RepoMap, parse_file, python_symbols, regex_symbols
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "db").mkdir()
+    (tmp_path / "db" / "database.py").write_text(
+        "import os\n\n"
+        "class Database(Base):\n"
+        "    def connect(self, url: str, timeout=30) -> 'Connection':\n"
+        "        def helper(): pass\n"
+        "        return helper()\n\n"
+        "    async def close(self): pass\n\n"
+        "def open_database(path):\n    return Database()\n"
+    )
+    (tmp_path / "app.py").write_text("from db.database import open_database\n\ndef main(): pass\n")
+    (tmp_path / "web").mkdir()
+    (tmp_path / "web" / "button.ts").write_text(
+        "export class Button extends Widget {\n"
+        "  render() {}\n"
+        "}\n"
+        "export async function renderButton(label: string) {\n}\n"
+        "export const onClick = (event) => {\n};\n"
+    )
+    (tmp_path / "README.md").write_text("# Project\n")
+    return tmp_path
+
+
+def test_python_symbols_lists_signatures():
+    source = ("class A(B, metaclass=M):\n    def f(self, x=1) -> int: pass\n"
+              "async def g(*args, **kwargs): pass\nimport json\nfrom a.b import c\n")
+    lines, defines, imports = python_symbols(source)
+    assert lines == [
+        "class A(B, metaclass=M)",
+        "  def f(self, x=1) -> int",
+        "async def g(*args, **kwargs)",
+    ]
+    assert defines == ["A", "g"]
+    assert imports == ["json", "b", "c"]
+
+
+def test_regex_symbols_for_other_languages():
+    go = "package main\n\nfunc (s *Server) Serve(addr string) error {\n}\ntype Server struct {\n}\n"
+    assert regex_symbols(go, ".go") == ["func (s *Server) Serve(addr string) error", "type Server struct"]
+    rust = "pub struct Cache {}\nimpl Cache {\n    pub fn get(&self, key: &str) -> Option<String> {\n"
+    assert regex_symbols(rust, ".rs") == [
+        "pub struct Cache", "impl Cache", "  pub fn get(&self, key: &str) -> Option<String>",
+    ]
+    assert regex_symbols("anything", ".md") == []
+
+
+def test_parse_file_falls_back_to_regex_on_syntax_errors(tmp_path):
+    path = tmp_path / "broken.py"
+    path.write_text("def ok(a, b):\n    return a +\nclass Later:\n")
+    assert parse_file(str(path))["symbols"] == ["def ok(a, b)", "class Later"]
+    (tmp_path / "blob.py").write_bytes(b"\x00\x01")
+    assert parse_file(str(tmp_path / "blob.py")) is None
+
+
+def test_render_ranks_relevant_files_first(repo):
+    repo_map = RepoMap(CodebaseReader(str(repo)))
+    rendered = repo_map.render("speed up the database connection")
+
+    assert rendered.startswith(
+        "db/database.py:\n"
+        "  class Database(Base)\n"
+        "    def connect(self, url: str, timeout=30) -> 'Connection'\n"
+        "    async def close(self)\n"
+        "  def open_database(path)\n"
+    )
+    assert "web/button.ts:\n  export class Button extends Widget\n" in rendered
+    assert "  export const onClick = (event) =>" in rendered
+    assert rendered.endswith("README.md")
+
+
+def test_render_ranks_imported_files_without_an_instruction(repo):
+    assert RepoMap(CodebaseReader(str(repo))).rank()[0] == "db/database.py"
+
+
+def test_render_fits_the_budget(repo):
+    repo_map = RepoMap(CodebaseReader(str(repo)))
+    rendered = repo_map.render("database", max_tokens=44)
+
+    # app.py's symbols no longer fit, so it and the files after it are listed by path.
+    assert rendered.endswith("  def open_database(path)\napp.py\n... (2 more files)")
+    assert estimate_tokens(rendered) <= 45
+
+
+def test_update_parses_only_changed_files(repo, monkeypatch):
+    parsed = []
+    real_parse = repo_map_module.parse_file
+    monkeypatch.setattr(repo_map_module, "parse_file", lambda path: parsed.append(path) or real_parse(path))
+
+    assert RepoMap(CodebaseReader(str(repo))).update() == 3
+    # A new process loads the cached symbols and parses nothing.
+    assert RepoMap(CodebaseReader(str(repo))).update() == 0
+
+    (repo / "app.py").write_text("def main(argv): pass\n")
+    repo_map = RepoMap(CodebaseReader(str(repo)))
+    assert repo_map.update() == 1
+    assert repo_map.entries["app.py"]["symbols"] == ["def main(argv)"]
+    assert len(parsed) == 4
+
+
+def test_update_parses_on_a_process_pool(repo):
+    repo_map = RepoMap(CodebaseReader(str(repo)), max_workers=2, parallel_threshold=1)
+    assert repo_map.update() == 3
+    assert repo_map.entries["db/database.py"]["defines"] == ["Database", "open_database"]
+
+
+def test_packer_uses_repo_map(repo):
+    codebase = CodebaseReader(str(repo))
+    packer = ContextPacker(codebase, token_budget=10_000, repo_map=RepoMap(codebase))
+    context = packer.pack("optimize the database layer")
+
+    assert context.startswith("Codebase Structure:\ndb/database.py:\n  class Database(Base)")
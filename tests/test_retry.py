@@ -0,0 +1,69 @@
+import pytest
+from github import GithubException
+from pr_assistant.retry import backoff_delay, is_transient_error, retry_call
+
+def test_is_transient_error():
+    assert is_transient_error(GithubException(502, {"message": "Bad Gateway"}))
+    assert is_transient_error(GithubException(403, {"message": "You have exceeded a secondary rate limit"}))
+    assert is_transient_error(ConnectionResetError())
+    assert not is_transient_error(GithubException(422, {"message": "Reference already exists"}))
+    assert not is_transient_error(GithubException(403, {"message": "Resource not accessible"}))
+    assert not is_transient_error(ValueError("bad input"))
+
+    class ResourceExhausted(Exception):
+        code = 429
+    assert is_transient_error(ResourceExhausted("quota"))
+
+def test_backoff_delay_bounds():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base_delay=1.0, max_delay=8.0) <= min(8.0, 2 ** attempt)
+
+def test_retry_call_retries_transient():
+    calls = []
+    delays = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise GithubException(503, {"message": "unavailable"})
+        return "ok"
+
+    assert retry_call(flaky, max_attempts=4, sleep=delays.append) == "ok"
+    assert len(calls) == 3
+    assert len(delays) == 2
+
+def test_retry_call_gives_up():
+    calls = []
+
+    def always_down():
+        calls.append(1)
+        raise GithubException(500, {"message": "error"})
+
+    with pytest.raises(GithubException):
+        retry_call(always_down, max_attempts=3, sleep=lambda d: None)
+    assert len(calls) == 3
+
+def test_retry_call_does_not_retry_permanent_errors():
+    calls = []
+
+    def invalid():
+        calls.append(1)
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        retry_call(invalid, sleep=lambda d: None)
+    assert len(calls) == 1
+
+def test_retry_call_uses_server_delay():
+    calls = []
+    delays = []
+
+    def limited():
+        calls.append(1)
+        if len(calls) == 1:
+            raise GithubException(429, {"message": "slow down"}, headers={"Retry-After": "9"})
+        return "ok"
+
+    retry_after = lambda e: float(e.headers["Retry-After"])
+    assert retry_call(limited, sleep=delays.append, retry_after=retry_after) == "ok"
+    assert delays == [9.0]
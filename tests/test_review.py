@@ -0,0 +1,233 @@
+import threading
+import time
+from unittest.mock import MagicMock
+from pr_assistant.jobs import JobQueue, JobRunner
+from pr_assistant.review import (
+    BatchReviewer,
+    append_review_update,
+    fetch_review_target,
+    format_review_comment,
+    parse_review_marker,
+    post_review,
+    review_header,
+    review_marker,
+    run_review_job,
+)
+
+def make_gh():
+    gh = MagicMock()
+    gh.get_pr_details.side_effect = lambda n: {"title": f"PR {n}", "body": ""}
+    gh.get_pr_files.side_effect = lambda n: [{"filename": f"f{n}.py"}]
+    return gh
+
+def test_format_review_comment():
+    assert format_review_comment("Tester", "LGTM") == "## AI Review (Tester)\n\nLGTM"
+
+def test_batch_reviews_and_posts_all():
+    gh = make_gh()
+    agent = MagicMock()
+    agent.review_pr_files.side_effect = lambda details, files, persona, concurrency: f"review of {files[0]['filename']}"
+
+    seen = []
+    summary = BatchReviewer(agent, gh, "Tester").run([1, 2, 3], on_result=seen.append)
+
+    assert sorted(r.pr_number for r in seen) == [1, 2, 3]
+    assert summary.posted == 3
+    assert summary.failed == 0
+    gh.post_comment.assert_any_call(2, format_review_comment("Tester", "review of f2.py"))
+
+def test_batch_limits_model_concurrency():
+    gh = make_gh()
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+
+    def slow_review(details, files, persona, concurrency):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.02)
+        with lock:
+            active["now"] -= 1
+        return "ok"
+
+    agent = MagicMock()
+    agent.review_pr_files.side_effect = slow_review
+
+    summary = BatchReviewer(agent, gh, fetch_workers=8, model_concurrency=2).run(range(10))
+
+    assert summary.posted == 10
+    assert active["max"] == 2
+
+def test_batch_records_failures():
+    gh = make_gh()
+    gh.get_pr_files.side_effect = lambda n: (_ for _ in ()).throw(RuntimeError("boom")) if n == 2 else []
+    agent = MagicMock()
+    agent.review_pr_files.return_value = "ok"
+
+    summary = BatchReviewer(agent, gh).run([1, 2, 3])
+
+    failed = [r for r in summary.results if r.status == "failed"]
+    assert [r.pr_number for r in failed] == [2]
+    assert failed[0].error == "boom"
+    assert summary.posted == 2
+
+def test_batch_dry_run_does_not_post():
+    gh = make_gh()
+    agent = MagicMock()
+    agent.review_pr_files.return_value = "ok"
+
+    summary = BatchReviewer(agent, gh, post_comments=False).run([1])
+
+    assert summary.results[0].status == "reviewed"
+    gh.post_comment.assert_not_called()
+
+def make_reviewed_gh(previous_sha, head_sha="b" * 40):
+    gh = MagicMock()
+    gh.get_pr_details.return_value = {"title": "PR", "body": "", "head_sha": head_sha}
+    gh.find_comment.return_value = {"id": 5, "body": format_review_comment("Tester", "old review", previous_sha)}
+    gh.compare_files.return_value = [{"filename": "new.py"}]
+    gh.get_pr_files.return_value = [{"filename": "all.py"}]
+    return gh
+
+def test_review_marker_round_trip():
+    body = format_review_comment("Tester", "LGTM", "abc123")
+    assert parse_review_marker(body) == "abc123"
+    assert parse_review_marker("## AI Review (Tester)\n\nLGTM") is None
+
+def test_append_review_update_moves_marker():
+    body = append_review_update(format_review_comment("Tester", "old", "a" * 40), "new", "a" * 40, "b" * 40)
+
+    assert body.startswith("## AI Review (Tester)\n\nold")
+    assert "### Update (aaaaaaa..bbbbbbb)\n\nnew" in body
+    assert body.count("pr-assistant:head=") == 1
+    assert parse_review_marker(body) == "b" * 40
+
+def test_fetch_review_target_only_new_commits():
+    gh = make_reviewed_gh("a" * 40)
+
+    target = fetch_review_target(gh, 7)
+
+    gh.compare_files.assert_called_once_with("a" * 40, "b" * 40)
+    gh.get_pr_files.assert_not_called()
+    assert target.files == [{"filename": "new.py"}]
+    assert target.base_sha == "a" * 40
+
+def test_fetch_review_target_looks_for_own_persona():
+    gh = make_reviewed_gh("a" * 40)
+    gh.find_comment.return_value = None
+
+    target = fetch_review_target(gh, 7, persona="Security Auditor")
+
+    gh.find_comment.assert_called_once_with(7, "## AI Review (Security Auditor)\n", "<!-- pr-assistant:head=")
+    assert target.previous is None
+    assert target.files == [{"filename": "all.py"}]
+
+def test_fetch_review_target_up_to_date():
+    gh = make_reviewed_gh("b" * 40)
+
+    target = fetch_review_target(gh, 7)
+
+    assert target.up_to_date
+    gh.compare_files.assert_not_called()
+
+def test_fetch_review_target_after_force_push():
+    gh = make_reviewed_gh("a" * 40)
+    gh.compare_files.return_value = None
+
+    target = fetch_review_target(gh, 7)
+
+    assert target.files == [{"filename": "all.py"}]
+    assert target.base_sha is None
+    # The old comment is replaced rather than extended.
+    assert post_review(gh, 7, target, "Tester", "fresh") == "updated"
+    gh.update_comment.assert_called_once_with(7, 5, format_review_comment("Tester", "fresh", "b" * 40))
+
+def test_fetch_review_target_full():
+    gh = make_reviewed_gh("a" * 40)
+
+    target = fetch_review_target(gh, 7, incremental=False)
+
+    gh.find_comment.assert_not_called()
+    assert target.previous is None
+
+def test_post_review_extends_previous_comment():
+    gh = make_reviewed_gh("a" * 40)
+    target = fetch_review_target(gh, 7)
+
+    assert post_review(gh, 7, target, "Tester", "new findings") == "updated"
+
+    gh.post_comment.assert_not_called()
+    (_, comment_id, body), _ = gh.update_comment.call_args
+    assert comment_id == 5
+    assert "old review" in body and "new findings" in body
+
+def test_batch_skips_up_to_date_prs():
+    gh = make_reviewed_gh("b" * 40)
+    agent = MagicMock()
+
+    summary = BatchReviewer(agent, gh).run([7])
+
+    assert summary.results[0].status == "up to date"
+    agent.review_pr_files.assert_not_called()
+    gh.update_comment.assert_not_called()
+
+def test_review_job_retries_post_without_reviewing_again(tmp_path):
+    gh = make_gh()
+    gh.get_pr_details.side_effect = lambda n: {"title": f"PR {n}", "body": "", "head_sha": "c" * 40}
+    gh.find_comment.return_value = None
+    gh.post_comment.side_effect = [ConnectionError("reset"), None]
+    agent = MagicMock()
+    agent.review_pr_files.return_value = "LGTM"
+    queue = JobQueue(tmp_path / "jobs.db")
+    runner = JobRunner(queue, {"review": lambda ctx: run_review_job(agent, gh, ctx)}, sleep=lambda d: None)
+
+    job = runner.run_job(queue.enqueue("review", {"pr_number": 3, "persona": "Tester"}).id)
+
+    assert job.result["status"] == "posted"
+    assert job.result["review"] == "LGTM"
+    agent.review_pr_files.assert_called_once()
+    assert gh.post_comment.call_count == 2
+    # Before posting again, the retry looked for a comment from the failed attempt.
+    gh.find_comment.assert_called_with(3, review_header("Tester"), review_marker("c" * 40))
+
+def test_review_job_does_not_post_twice_after_interrupted_post(tmp_path):
+    gh = make_gh()
+    gh.get_pr_details.side_effect = lambda n: {"title": f"PR {n}", "body": "", "head_sha": "c" * 40}
+    gh.find_comment.return_value = None
+    agent = MagicMock()
+    agent.review_pr_files.return_value = "LGTM"
+    queue = JobQueue(tmp_path / "jobs.db")
+
+    def posted_then_lost(*args):
+        # The comment was created, but the response never arrived.
+        gh.find_comment.return_value = {"id": 9, "body": review_marker("c" * 40)}
+        raise ConnectionError("reset")
+
+    gh.post_comment.side_effect = posted_then_lost
+    runner = JobRunner(queue, {"review": lambda ctx: run_review_job(agent, gh, ctx)}, sleep=lambda d: None)
+    job = runner.run_job(queue.enqueue("review", {"pr_number": 3, "persona": "Tester"}).id)
+
+    assert job.result["status"] == "posted"
+    gh.post_comment.assert_called_once()
+
+def test_review_job_does_not_post_review_of_an_old_head(tmp_path):
+    gh = make_gh()
+    head = {"sha": "a" * 40}
+    gh.get_pr_details.side_effect = lambda n: {"title": f"PR {n}", "body": "", "head_sha": head["sha"]}
+    gh.find_comment.return_value = None
+    gh.post_comment.side_effect = [ValueError("locked"), None]
+    agent = MagicMock()
+    agent.review_pr_files.side_effect = ["review of a", "review of b"]
+    queue = JobQueue(tmp_path / "jobs.db")
+    runner = JobRunner(queue, {"review": lambda ctx: run_review_job(agent, gh, ctx)}, sleep=lambda d: None)
+    payload = {"pr_number": 3, "persona": "Tester"}
+
+    job = runner.run_job(queue.enqueue("review", payload, key="r").id)
+    assert job.state == "failed"
+
+    # New commits were pushed before the job was resumed.
+    head["sha"] = "b" * 40
+    job = runner.run_job(queue.enqueue("review", payload, key="r").id)
+
+    assert (job.result["head_sha"], job.result["review"]) == ("b" * 40, "review of b")
+    assert review_marker("b" * 40) in gh.post_comment.call_args.args[1]
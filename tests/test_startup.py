@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+# Import cost of our own modules when the CLI starts, in milliseconds.
+# Typer and Rich are excluded: they are the CLI framework and load either way.
+STARTUP_BUDGET_MS = 150
+FRAMEWORK_PACKAGES = ("typer", "rich", "click")
+HEAVY_MODULES = ("google.generativeai", "github", "httpx", "git")
+
+
+def import_tree(args):
+    """Runs the CLI under -X importtime and returns the top-level import nodes as (name, cumulative_us, children)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from pr_assistant.main import app; app()", *args],
+        capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    # importtime prints children before their parent, indented two spaces per level.
+    pending = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        node = (name.strip(), int(cumulative), pending.pop(depth + 1, []))
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+def iter_names(nodes):
+    for name, _, children in nodes:
+        yield name
+        yield from iter_names(children)
+
+
+def framework_us(node):
+    return sum(
+        cumulative if name.split(".")[0] in FRAMEWORK_PACKAGES else framework_us((name, cumulative, children))
+        for name, cumulative, children in node[2]
+    )
+
+
+def test_help_does_not_import_sdks():
+    loaded = set(iter_names(import_tree(["--help"])))
+    assert "pr_assistant.main" in loaded
+    for module in HEAVY_MODULES:
+        assert module not in loaded, f"{module} imported at startup"
+
+def test_startup_import_budget():
+    main = next(node for node in import_tree(["--help"]) if node[0] == "pr_assistant.main")
+    own_ms = (main[1] - framework_us(main)) / 1000
+    assert own_ms < STARTUP_BUDGET_MS, f"pr_assistant imports took {own_ms:.0f} ms"
@@ -0,0 +1,99 @@
+import json
+import re
+from unittest.mock import MagicMock
+import pytest
+from pr_assistant.cache import ResponseCache
+from pr_assistant.triage import Triager, pack_batches, result_row, score_key
+
+
+def make_prs(n):
+    return [
+        {"number": i, "title": f"PR {i}", "url": f"https://github.com/o/r/pull/{i}", "user": "octocat", "head_sha": f"sha{i}"}
+        for i in range(1, n + 1)
+    ]
+
+
+@pytest.fixture
+def gh():
+    client = MagicMock()
+    client.repo_name = "owner/repo"
+    client.get_pr_details.side_effect = lambda n: {"title": f"PR {n}", "body": "Body", "user": "octocat", "head_sha": f"sha{n}"}
+    client.get_pr_files.side_effect = lambda n: [
+        {"filename": f"f{n}.py", "status": "modified", "additions": 1, "deletions": 0, "patch": "@@ -1 +1 @@\n+x"}
+    ]
+    return client
+
+
+@pytest.fixture
+def agent():
+    def score(sections):
+        numbers = [int(re.search(r"PR #(\d+)", s).group(1)) for s in sections]
+        return [{"number": n, "summary": f"Summary {n}", "focus_score": n % 10 + 1, "reason": "r"} for n in numbers]
+
+    mock_agent = MagicMock()
+    mock_agent.triage_prs.side_effect = score
+    return mock_agent
+
+
+def test_pack_batches_respects_budget_and_cap():
+    sections = ["x" * 400] * 10  # about 100 tokens each
+    assert pack_batches(sections, max_tokens=350) == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+    assert pack_batches(sections, max_tokens=10_000, max_items=4) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    # A section larger than the budget still gets a batch of its own.
+    assert pack_batches(["x" * 4000, "y"], max_tokens=100) == [[0], [1]]
+
+
+def test_many_small_prs_scored_in_few_calls(gh, agent, tmp_path):
+    summary = Triager(agent, gh, ResponseCache(tmp_path)).run(make_prs(200))
+
+    assert len(summary.results) == 200
+    assert summary.failed == 0
+    assert summary.model_calls == agent.triage_prs.call_count == 10
+    scores = [r.focus_score for r in summary.results]
+    assert scores == sorted(scores, reverse=True)
+    top = summary.results[0]
+    assert (top.number, top.focus_score, top.summary) == (9, 10, "Summary 9")
+
+
+def test_scores_cached_per_head_sha(gh, agent, tmp_path):
+    cache = ResponseCache(tmp_path)
+    Triager(agent, gh, cache).run(make_prs(3))
+    gh.get_pr_files.reset_mock()
+    agent.triage_prs.reset_mock()
+
+    prs = make_prs(3)
+    prs[1]["head_sha"] = "pushed"
+    summary = Triager(agent, gh, cache).run(prs)
+
+    assert summary.cached == 2
+    assert summary.model_calls == 1
+    gh.get_pr_files.assert_called_once_with(2)
+    assert json.loads(cache.get(score_key("owner/repo", 2, "pushed")))["focus_score"] == 3
+
+
+def test_large_diffs_truncated(gh, agent):
+    gh.get_pr_files.side_effect = lambda n: [
+        {"filename": "big.py", "status": "modified", "additions": 5000, "deletions": 0,
+         "patch": "@@ -1 +1 @@\n" + "\n".join("+line %d" % i for i in range(5000))}
+    ]
+    triager = Triager(agent, gh, pr_tokens=500)
+    triager.run(make_prs(1))
+
+    section = agent.triage_prs.call_args[0][0][0]
+    assert len(section) < 500 * 4 + 300
+    assert "diff truncated" in section
+
+
+def test_failures_reported(gh, agent):
+    gh.get_pr_details.side_effect = lambda n: (_ for _ in ()).throw(RuntimeError("gone")) if n == 2 else {"title": "t"}
+    agent.triage_prs.side_effect = lambda sections: [{"number": 1, "focus_score": 5, "summary": "s"}]
+
+    summary = Triager(agent, gh, batch_tokens=10_000).run(make_prs(3))
+    by_number = {r.number: r for r in summary.results}
+
+    assert by_number[1].focus_score == 5
+    assert by_number[2].error == "gone"
+    assert by_number[3].error == "not scored by the model"
+    assert summary.failed == 2
+    assert [r.number for r in summary.results][0] == 1
+    assert "section" not in result_row(by_number[1])
@@ -0,0 +1,33 @@
+from pathlib import Path
+from pr_assistant.unified_diff import split_file_patches
+
+DIFF = (Path(__file__).parent / "fixtures" / "pr_42" / "pull.diff").read_text()
+
+
+def test_split_file_patches_paths():
+    patches = split_file_patches(DIFF)
+    assert list(patches) == ["src/app.py", "docs/new guide.md", "legacy.py", "assets/logo.png", "src/helpers.py"]
+
+
+def test_split_file_patches_starts_at_first_hunk():
+    patches = split_file_patches(DIFF)
+    assert patches["docs/new guide.md"] == "@@ -0,0 +1,2 @@\n+# Guide\n+Hello"
+    assert patches["legacy.py"].startswith("@@ -1,2 +0,0 @@")
+    assert patches["src/app.py"].count("\n@@") == 1
+
+
+def test_split_file_patches_binary_and_empty():
+    assert split_file_patches(DIFF)["assets/logo.png"] is None
+    assert split_file_patches("") == {}
+
+
+def test_split_file_patches_unquotes_paths():
+    # Real `git show` output: paths with spaces get a trailing tab, non-ASCII paths are C-quoted.
+    patches = split_file_patches((Path(__file__).parent / "fixtures" / "diffs" / "quoted_paths.diff").read_text())
+
+    assert set(patches) == {"café.py", "new name.py", "old name.py", "sp ace.py", "sp logo.png", "ïcon.png"}
+    assert patches["sp ace.py"] == "@@ -1 +1,2 @@\n x\n+y"
+    assert patches["café.py"] == "@@ -1 +1,2 @@\n x\n+y"
+    assert patches["old name.py"] == "@@ -1 +0,0 @@\n-x"
+    assert patches["new name.py"] is None
+    assert patches["ïcon.png"] is None
@@ -0,0 +1,125 @@
+import os
+import pytest
+from pr_assistant.codebase import CodebaseReader
+from pr_assistant.context import ContextPacker
+from pr_assistant.vector_index import HashingEmbedder, VectorIndex, chunk_lines
+
+np = pytest.importorskip("numpy")
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts.extend(texts)
+        return super().embed(texts)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "db").mkdir()
+    (tmp_path / "db" / "database.py").write_text(
+        "class Database:\n    def connect(self):\n        return connection_pool.acquire()\n"
+    )
+    (tmp_path / "ui.py").write_text("def render_button(label):\n    return widget(label)\n")
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG\x00\x00")
+    return tmp_path
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    a = HashingEmbedder().embed(["database connection pool", ""])
+    b = HashingEmbedder().embed(["database connection pool"])
+    assert a.dtype == np.float32
+    assert np.allclose(a[0], b[0])
+    assert np.isclose(np.linalg.norm(a[0]), 1.0)
+    assert not a[1].any()
+
+
+def test_chunk_lines():
+    content = "\n".join(f"line {i}" for i in range(1, 91))
+    assert [(a, b) for a, b, _ in chunk_lines(content, 40)] == [(1, 40), (41, 80), (81, 90)]
+    assert chunk_lines("\n\n") == []
+
+
+def test_search_finds_relevant_chunk(repo):
+    index = VectorIndex(str(repo), CountingEmbedder())
+    index.update(CodebaseReader(str(repo)))
+
+    hits = index.search("speed up the database connection", k=2)
+    assert hits[0].path == "db/database.py"
+    assert (hits[0].start_line, hits[0].end_line) == (1, 3)
+    assert hits[0].score > 0.3
+
+
+def test_update_is_incremental_and_persistent(repo):
+    embedder = CountingEmbedder()
+    assert VectorIndex(str(repo), embedder).update(CodebaseReader(str(repo))) == 3
+
+    # A fresh process maps the saved index and embeds nothing.
+    embedder.texts.clear()
+    index = VectorIndex(str(repo), embedder)
+    assert index.update(CodebaseReader(str(repo))) == 0
+    assert embedder.texts == []
+    assert isinstance(index._load_vectors(), np.memmap)
+
+    (repo / "ui.py").write_text("def render_table(rows):\n    return grid(rows)\n")
+    (repo / "db" / "database.py").unlink()
+    assert index.update(CodebaseReader(str(repo))) == 1
+    assert len(embedder.texts) == 1 and embedder.texts[0].startswith("ui.py\n")
+    assert set(index.files) == {"ui.py", "logo.png"}
+    assert index.search("render table grid")[0].path == "ui.py"
+    assert index.search("database connection") == []
+
+
+def test_changed_files_are_appended_and_replaced_rows_compacted(repo):
+    index = VectorIndex(str(repo), CountingEmbedder())
+    index.update(CodebaseReader(str(repo)))
+    row_bytes = index.embedder.dim * 4
+    database = index.files["db/database.py"]
+
+    (repo / "ui.py").write_text("def render_table(rows):\n    return grid(rows)\n")
+    index.update(CodebaseReader(str(repo)))
+    # The new ui.py row is appended; database.py keeps its row and the old ui.py row is unused.
+    assert index.rows == 3 and len(index) == 2
+    assert index.files["db/database.py"] == database
+    assert os.path.getsize(index.vectors_path) == 3 * row_bytes
+    assert index.search("button widget label") == []
+    assert index.search("render table grid")[0].path == "ui.py"
+
+    # A fresh process appends to the same matrix.
+    index = VectorIndex(str(repo), CountingEmbedder())
+    (repo / "ui.py").write_text("def render_list(items):\n    return rows(items)\n")
+    index.update(CodebaseReader(str(repo)))
+    assert index.rows == 4
+    (repo / "ui.py").write_text("def render_chart(points):\n    return plot(points)\n")
+    index.update(CodebaseReader(str(repo)))
+    # Three unused rows outnumber the two live ones, so the matrix is rewritten.
+    assert index.rows == 2
+    assert os.path.getsize(index.vectors_path) == 2 * row_bytes
+    assert index.search("render chart plot")[0].path == "ui.py"
+    assert index.search("database connection")[0].path == "db/database.py"
+
+def test_embedder_change_rebuilds(repo):
+    VectorIndex(str(repo), HashingEmbedder(dim=128)).update(CodebaseReader(str(repo)))
+    index = VectorIndex(str(repo), HashingEmbedder(dim=256))
+    assert index.files == {}
+    assert index.update(CodebaseReader(str(repo))) == 3
+
+
+def test_out_of_step_files_rebuilt(repo):
+    VectorIndex(str(repo)).update(CodebaseReader(str(repo)))
+    index = VectorIndex(str(repo))
+    # The vectors file lost a row the metadata refers to.
+    np.zeros((1, index.embedder.dim), dtype=np.float32).tofile(index.vectors_path)
+    assert index.search("database") == []
+    assert index.update(CodebaseReader(str(repo))) == 3
+
+
+def test_context_includes_relevant_chunks(repo):
+    codebase = CodebaseReader(str(repo))
+    packer = ContextPacker(codebase, 10_000, index=VectorIndex(str(repo)))
+
+    context = packer.pack("optimize the database connection")
+    assert "Relevant Code:\n--- db/database.py (lines 1-3) ---\nclass Database:" in context
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+import pytest
+from pr_assistant.webhook import WebhookServer, replay_webhook, sign_payload, verify_signature
+
+SECRET = "It's a Secret to Everybody"
+PAYLOAD = (Path(__file__).parent / "fixtures" / "webhooks" / "pull_request_synchronize.json").read_bytes()
+
+
+def payload(number=42, action="synchronize", draft=False, repo="octo-org/octo-repo") -> bytes:
+    data = json.loads(PAYLOAD)
+    data["action"] = action
+    data["pull_request"].update(number=number, draft=draft)
+    data["repository"]["full_name"] = repo
+    return json.dumps(data).encode()
+
+
+def run_server(scenario, review=None, **kwargs):
+    """Runs scenario(server, send) against a server on a free port; send replays a delivery from a thread."""
+    reviewed = []
+
+    def default_review(pr_number):
+        reviewed.append(pr_number)
+        return "posted"
+
+    async def main():
+        server = WebhookServer(review or default_review, SECRET, repo_name="octo-org/octo-repo", **kwargs)
+        await server.start("127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.port}/webhook"
+
+        async def send(body=PAYLOAD, secret=SECRET, **options):
+            return await asyncio.to_thread(replay_webhook, url, body, secret, **options)
+
+        try:
+            await scenario(server, send)
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+    return reviewed
+
+
+def test_signature_matches_github_example():
+    # Example from GitHub's "Validating webhook deliveries" documentation.
+    signature = "sha256=757107ea0eb2509fc211221cce984b8a37570b6d7586c22c46f4379c8b043e17"
+    assert sign_payload(SECRET, b"Hello, World!") == signature
+    assert verify_signature(SECRET, b"Hello, World!", signature)
+    assert not verify_signature(SECRET, b"Hello, World?", signature)
+    assert not verify_signature(SECRET, b"Hello, World!", None)
+
+
+def test_replayed_delivery_is_reviewed_once():
+    async def scenario(server, send):
+        assert await send(delivery="d-1") == (202, {"status": "queued"})
+        # GitHub redelivers with the same delivery ID.
+        assert await send(delivery="d-1") == (200, {"status": "duplicate delivery"})
+        await server.join()
+        assert server.stats.duplicates == 1
+
+    assert run_server(scenario) == [42]
+
+
+def test_rejects_bad_signatures_and_requests():
+    async def scenario(server, send):
+        assert await send(secret="wrong") == (401, {"status": "invalid signature"})
+        assert await send(body=b"not json") == (400, {"status": "malformed pull_request payload"})
+        status, _ = await asyncio.to_thread(
+            replay_webhook, f"http://127.0.0.1:{server.port}/other", PAYLOAD, SECRET
+        )
+        assert status == 404
+        assert server.stats.received == 1
+
+    assert run_server(scenario) == []
+
+
+def test_ignores_events_that_need_no_review():
+    async def scenario(server, send):
+        assert await send(event="ping") == (200, {"status": "pong"})
+        assert await send(event="issues") == (200, {"status": "ignored issues event"})
+        assert await send(body=payload(action="closed")) == (200, {"status": "ignored closed action"})
+        assert await send(body=payload(draft=True)) == (200, {"status": "ignored draft"})
+        assert (await send(body=payload(repo="someone/else")))[0] == 200
+
+    assert run_server(scenario) == []
+
+
+def test_queued_events_for_one_pr_are_coalesced_and_queue_is_bounded():
+    started, release = threading.Event(), threading.Event()
+    reviewed = []
+
+    def review(pr_number):
+        started.set()
+        release.wait(5)
+        reviewed.append(pr_number)
+        return "posted"
+
+    async def scenario(server, send):
+        assert (await send(body=payload(1)))[0] == 202
+        await asyncio.to_thread(started.wait, 5)
+        # PR 1 is being reviewed; PR 2 waits for the only worker.
+        assert (await send(body=payload(2))) == (202, {"status": "queued"})
+        assert (await send(body=payload(2))) == (200, {"status": "already queued"})
+        assert (await send(body=payload(3), delivery="d-3")) == (503, {"status": "queue full"})
+        release.set()
+        await server.join()
+        # Refused deliveries are not remembered, so GitHub's redelivery is accepted.
+        assert (await send(body=payload(3), delivery="d-3"))[0] == 202
+        await server.join()
+        assert server.stats.coalesced == 1
+
+    run_server(scenario, review=review, workers=1, queue_size=1)
+    assert reviewed == [1, 2, 3]
+
+
+def test_pr_under_review_is_reviewed_again_afterwards_not_concurrently():
+    started, release = threading.Event(), threading.Event()
+    lock = threading.Lock()
+    active, reviewed = [], []
+
+    def review(pr_number):
+        with lock:
+            assert pr_number not in active, "PR reviewed twice at once"
+            active.append(pr_number)
+        started.set()
+        release.wait(5)
+        with lock:
+            active.remove(pr_number)
+            reviewed.append(pr_number)
+        return "posted"
+
+    async def scenario(server, send):
+        assert (await send(body=payload(1)))[0] == 202
+        await asyncio.to_thread(started.wait, 5)
+        # A push while PR 1 is being reviewed; a free worker must not pick it up.
+        assert await send(body=payload(1)) == (202, {"status": "queued after current review"})
+        assert await send(body=payload(1)) == (200, {"status": "already queued"})
+        release.set()
+        await server.join()
+
+    run_server(scenario, review=review, workers=2)
+    assert reviewed == [1, 1]
+
+
+def test_failed_review_does_not_stop_the_worker():
+    def review(pr_number):
+        if pr_number == 1:
+            raise RuntimeError("boom")
+        return "posted"
+
+    async def scenario(server, send):
+        await send(body=payload(1))
+        await send(body=payload(2))
+        await server.join()
+        assert (server.stats.failed, server.stats.reviewed) == (1, 1)
+
+    run_server(scenario, review=review, workers=1)
+
+
+def test_stalled_request_times_out():
+    async def scenario(server, send):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        # Headers promise a body that never arrives.
+        writer.write(b"POST /webhook HTTP/1.1\r\nContent-Length: 100\r\n\r\n{")
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), 5)
+        writer.close()
+        assert status_line.startswith(b"HTTP/1.1 408 ")
+        # The server still answers other deliveries.
+        assert await send() == (202, {"status": "queued"})
+
+    assert run_server(scenario, read_timeout=0.1) == [42]
+
+def test_secret_is_required():
+    with pytest.raises(ValueError):
+        WebhookServer(lambda n: "posted", "")